@@ -0,0 +1,3 @@
+"""
+Módulo de procesamiento masivo de hogares
+"""
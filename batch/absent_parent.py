@@ -0,0 +1,137 @@
+"""
+Flags de ingresos del padre o madre no presente en el hogar
+
+Uso:
+    python -m batch.absent_parent ingresos_nacionales.csv --ausentes ausentes.csv \\
+        --hogares hogares.jsonl --salida hogares_medios.jsonl --procesos 8
+
+Los percentiles 78 y 90 se calculan en una sola pasada sobre el archivo de
+ingresos nacionales, que puede no caber en memoria: el archivo se divide
+en rangos de bytes, cada proceso resume su rango en un sketch KLL y los
+sketches se combinan. Luego se cruzan los ingresos de padres/madres
+ausentes (CSV hogar_id, ingreso) con los hogares que tienen hijos menores
+de 21 años o de 21 a 24 años que estudian.
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+from batch.quantiles import SketchKLL
+from batch.records import leer_hogares_jsonl, leer_rango, rangos_lineas
+
+# Alto valor: ingreso entre los percentiles 78 y 90; muy alto valor: sobre el percentil 90
+CUANTIL_ALTO = 0.78
+CUANTIL_MUY_ALTO = 0.90
+
+
+def _sketch_rango(args):
+    """Resume un rango del archivo en un sketch (función de nivel superior para multiprocessing)."""
+    ruta, encabezado, columna, desde, hasta, k, semilla = args
+    indice = next(csv.reader([encabezado])).index(columna)
+    sketch = SketchKLL(k, semilla)
+    for texto in leer_rango(ruta, desde, hasta):
+        for fila in csv.reader(io.StringIO(texto)):
+            if fila and fila[indice]:
+                sketch.agregar(float(fila[indice]))
+    return sketch
+
+
+def calcular_umbrales(ruta, columna="ingreso", procesos=1, k=400):
+    """
+    Calcula los percentiles 78 y 90 de una columna de un CSV de ingresos.
+
+    Returns:
+        tuple: (umbral_alto, umbral_muy_alto)
+    """
+    encabezado, rangos = rangos_lineas(ruta, max(1, procesos))
+    tareas = [(ruta, encabezado, columna, desde, hasta, k, i) for i, (desde, hasta) in enumerate(rangos)]
+    if procesos <= 1:
+        sketches = [_sketch_rango(t) for t in tareas]
+    else:
+        with Pool(procesos) as pool:
+            sketches = pool.map(_sketch_rango, tareas)
+
+    sketch = sketches[0]
+    for otro in sketches[1:]:
+        sketch.combinar(otro)
+    return sketch.cuantil(CUANTIL_ALTO), sketch.cuantil(CUANTIL_MUY_ALTO)
+
+
+def leer_ausentes(ruta):
+    """
+    Lee ingresos de padres/madres ausentes (CSV hogar_id, ingreso).
+
+    Returns:
+        dict: {hogar_id: mayor ingreso de un padre o madre ausente}
+    """
+    ingresos = {}
+    with open(ruta, encoding="utf-8", newline="") as f:
+        for fila in csv.DictReader(f):
+            ingreso = float(fila["ingreso"] or 0)
+            hogar_id = fila["hogar_id"]
+            if ingreso > ingresos.get(hogar_id, float("-inf")):
+                ingresos[hogar_id] = ingreso
+    return ingresos
+
+
+def tiene_hijos_elegibles(integrantes):
+    """Hay integrantes menores de 21 años, o de 21 a 24 años que estudian."""
+    for integ in integrantes:
+        edad = integ["edad"]
+        if edad < 21 or (edad <= 24 and integ.get("estudia", False)):
+            return True
+    return False
+
+
+def asignar_medios(hogares, ingresos_ausentes, umbral_alto, umbral_muy_alto):
+    """
+    Sobrescribe los flags padre_madre_alto_valor y padre_madre_muy_alto_valor.
+
+    Yields:
+        dict: El mismo hogar con datos_medios actualizado
+    """
+    for hogar in hogares:
+        datos_medios = hogar.setdefault("datos_medios", {})
+        ingreso = ingresos_ausentes.get(str(hogar["id"]))
+        alto = muy_alto = False
+        if ingreso is not None and tiene_hijos_elegibles(hogar["integrantes"]):
+            muy_alto = ingreso > umbral_muy_alto
+            alto = not muy_alto and ingreso >= umbral_alto
+        datos_medios["padre_madre_alto_valor"] = alto
+        datos_medios["padre_madre_muy_alto_valor"] = muy_alto
+        yield hogar
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Asigna los flags de ingresos del padre/madre no presente.")
+    parser.add_argument("ingresos", help="CSV de ingresos nacionales")
+    parser.add_argument("--columna", default="ingreso", help="Columna de ingreso del CSV nacional")
+    parser.add_argument("--ausentes", required=True, help="CSV hogar_id, ingreso de padres/madres ausentes")
+    parser.add_argument("--hogares", required=True, help="JSONL de hogares")
+    parser.add_argument("--salida", help="JSONL de salida (por defecto, salida estándar)")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--k", type=int, default=400, help="Precisión del sketch KLL")
+    args = parser.parse_args(argv)
+
+    umbral_alto, umbral_muy_alto = calcular_umbrales(args.ingresos, args.columna, args.procesos, args.k)
+    print(f"  P78: {umbral_alto:,.0f} | P90: {umbral_muy_alto:,.0f}", file=sys.stderr)
+    ausentes = leer_ausentes(args.ausentes)
+
+    salida = open(args.salida, "w", encoding="utf-8") if args.salida else sys.stdout
+    try:
+        hogares = asignar_medios(leer_hogares_jsonl(args.hogares), ausentes, umbral_alto, umbral_muy_alto)
+        for hogar in hogares:
+            salida.write(json.dumps(hogar, ensure_ascii=False) + "\n")
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Edades y tramos de edad a partir de fechas de nacimiento
+
+Uso:
+    python -m batch.ages personas.csv --desde 2024-06-01 --hasta 2025-06-01
+    python -m batch.ingest personas.csv --fecha-referencia 2025-06-01 --salida hogares.jsonl
+
+El registro trae fechas de nacimiento y la CSE se calcula a una fecha de
+referencia. Las fechas se guardan como enteros AAAAMMDD en arreglos
+compactos, y la edad en años cumplidos es (referencia - nacimiento) // 10000.
+Los nacidos un 29 de febrero cumplen años el 1 de marzo en los años no
+bisiestos.
+
+Los códigos de edad separan los rangos de la Tabla N°1 y además los 18 a 24
+años, por la regla de estudiantes del ingreso equivalente. Los límites son
+5/6, 14/15, 17/18, 24/25, 59/60 y 74/75. La conversión de edades a códigos
+es una traducción de bytes con una tabla de 256 entradas.
+
+Quien nace después de la fecha de referencia tiene la edad EDAD_SIN_NACER y
+el código CODIGO_SIN_NACER. Así, al recalcular entre dos fechas, un recién
+nacido en ese intervalo aparece como un cambio de código. La ingesta, en
+cambio, rechaza esas fechas: a la fecha de cálculo esa persona no existe.
+"""
+
+import argparse
+import bisect
+import csv
+import datetime
+import sys
+from array import array
+
+# Edad máxima de cada código, y nombre de cada código
+EDADES_MAXIMAS = (5, 14, 17, 24, 59, 74)
+CODIGOS_EDAD = ("0-5", "6-14", "15-17", "18-24", "25-59", "60-74", "75+")
+# Rango de la Tabla N°1 que corresponde a cada código
+RANGO_COEFICIENTES = ("0-5", "6-14", "15-17", "18-59", "18-59", "60-74", "75+")
+
+# Edades en un byte: 0 a EDAD_MAXIMA, y EDAD_SIN_NACER para nacimientos posteriores a la referencia
+EDAD_MAXIMA = 254
+EDAD_SIN_NACER = 255
+CODIGO_SIN_NACER = len(CODIGOS_EDAD)
+TAMANO_LOTE = 65536
+_TRAMO_COMPARACION = 256
+
+_TABLA_CODIGOS = bytes(bisect.bisect_left(EDADES_MAXIMAS, edad) for edad in range(EDAD_MAXIMA + 1)) + bytes(
+    [CODIGO_SIN_NACER])
+
+
+def fecha_a_entero(fecha):
+    """Convierte una fecha (date, 'AAAA-MM-DD' o 'AAAAMMDD') en el entero AAAAMMDD."""
+    if isinstance(fecha, (datetime.date, datetime.datetime)):
+        return fecha.year * 10000 + fecha.month * 100 + fecha.day
+    if isinstance(fecha, int):
+        return fecha
+    txt = fecha.strip().replace("-", "")
+    if len(txt) != 8 or not txt.isdigit():
+        raise ValueError(f"Fecha inválida: {fecha!r}")
+    return int(txt)
+
+
+def leer_fechas(valores):
+    """Convierte un iterable de fechas en un arreglo de enteros AAAAMMDD."""
+    return array("l", map(fecha_a_entero, valores))
+
+
+def edades(nacimientos, fecha_referencia):
+    """
+    Calcula edades en años cumplidos a una fecha de referencia.
+
+    Args:
+        nacimientos: Arreglo de fechas AAAAMMDD (ver leer_fechas)
+        fecha_referencia: Fecha de cálculo
+
+    Returns:
+        array('B'): Edades, acotadas a EDAD_MAXIMA; EDAD_SIN_NACER para
+            quienes nacen después de la referencia
+    """
+    referencia = fecha_a_entero(fecha_referencia)
+    valores = [(referencia - n) // 10000 for n in nacimientos]
+    if valores and not 0 <= min(valores) <= max(valores) <= EDAD_MAXIMA:
+        valores = [EDAD_SIN_NACER if v < 0 else min(EDAD_MAXIMA, v) for v in valores]
+    return array("B", valores)
+
+
+def codigos_edad(edades_):
+    """
+    Convierte edades en códigos de edad (índices de CODIGOS_EDAD).
+
+    Args:
+        edades_: array('B') de edades, como el que retorna edades()
+
+    Returns:
+        bytes: Un código por persona (CODIGO_SIN_NACER para EDAD_SIN_NACER)
+    """
+    return edades_.tobytes().translate(_TABLA_CODIGOS)
+
+
+def codigos_a_fecha(nacimientos, fecha_referencia):
+    """Códigos de edad de cada persona a una fecha de referencia."""
+    return codigos_edad(edades(nacimientos, fecha_referencia))
+
+
+def cambios_de_codigo(nacimientos, desde, hasta):
+    """
+    Indica qué personas cambian de código de edad entre dos fechas.
+
+    Quienes nacen entre desde y hasta cambian de CODIGO_SIN_NACER a un código
+    de edad, por lo que también se reportan.
+
+    Returns:
+        list: Índices de las personas cuyo código es distinto en ambas fechas
+    """
+    antes = codigos_a_fecha(nacimientos, desde)
+    despues = codigos_a_fecha(nacimientos, hasta)
+    # Los cambios suelen ser escasos: se comparan tramos de bytes y solo se
+    # recorren los que difieren
+    indices = []
+    for inicio in range(0, len(antes), _TRAMO_COMPARACION):
+        fin = inicio + _TRAMO_COMPARACION
+        if antes[inicio:fin] != despues[inicio:fin]:
+            indices.extend(i for i in range(inicio, min(fin, len(antes))) if antes[i] != despues[i])
+    return indices
+
+
+def hogares_con_cambios(hogar_ids, nacimientos, desde, hasta):
+    """
+    Hogares con al menos un integrante que cruza un límite de edad entre dos fechas.
+
+    Args:
+        hogar_ids: Secuencia con el id de hogar de cada persona
+        nacimientos: Arreglo de fechas AAAAMMDD alineado con hogar_ids
+
+    Returns:
+        set: Ids de los hogares que hay que recalcular
+    """
+    return {hogar_ids[i] for i in cambios_de_codigo(nacimientos, desde, hasta)}
+
+
+def asignar_edades(filas, fecha_referencia, columna="fecha_nacimiento", tamano_lote=TAMANO_LOTE):
+    """
+    Etapa de ingesta: completa la columna edad de filas de persona a partir
+    de su fecha de nacimiento, por lotes.
+
+    Yields:
+        dict: La misma fila con "edad" y "codigo_edad"
+    """
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano_lote:
+            yield from _asignar_lote(lote, fecha_referencia, columna)
+            lote = []
+    if lote:
+        yield from _asignar_lote(lote, fecha_referencia, columna)
+
+
+def _asignar_lote(lote, fecha_referencia, columna):
+    edades_lote = edades(leer_fechas(f[columna] for f in lote), fecha_referencia)
+    if EDAD_SIN_NACER in edades_lote:
+        raise ValueError(f"Hay fechas de nacimiento posteriores a {fecha_referencia}")
+    codigos = codigos_edad(edades_lote)
+    for fila, edad, codigo in zip(lote, edades_lote, codigos):
+        fila["edad"] = edad
+        fila["codigo_edad"] = CODIGOS_EDAD[codigo]
+    return lote
+
+
+def leer_nacimientos_csv(ruta, columna="fecha_nacimiento", columna_hogar="hogar_id"):
+    """
+    Lee las columnas de hogar y fecha de nacimiento de un CSV de personas.
+
+    Returns:
+        tuple: (lista de ids de hogar, arreglo de fechas AAAAMMDD)
+    """
+    hogar_ids = []
+    nacimientos = array("l")
+    with open(ruta, encoding="utf-8", newline="") as f:
+        for fila in csv.DictReader(f):
+            hogar_ids.append(fila[columna_hogar])
+            nacimientos.append(fecha_a_entero(fila[columna]))
+    return hogar_ids, nacimientos
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Lista los hogares con integrantes que cambian de tramo de edad entre dos fechas.")
+    parser.add_argument("personas", help="CSV con hogar_id y fecha_nacimiento")
+    parser.add_argument("--desde", required=True, help="Fecha del cálculo anterior (AAAA-MM-DD)")
+    parser.add_argument("--hasta", required=True, help="Fecha del nuevo cálculo (AAAA-MM-DD)")
+    parser.add_argument("--columna", default="fecha_nacimiento")
+    args = parser.parse_args(argv)
+
+    hogar_ids, nacimientos = leer_nacimientos_csv(args.personas, args.columna)
+    hogares = hogares_con_cambios(hogar_ids, nacimientos, args.desde, args.hasta)
+    for hogar_id in sorted(hogares):
+        print(hogar_id)
+    print(f"Personas: {len(nacimientos):,} | Hogares a recalcular: {len(hogares):,}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Hogares cuyo ingreso y test de medios son poco consistentes
+
+Uso:
+    python -m batch.anomalies hogares.jsonl --por comuna --top 20 --salida anomalias.csv
+    python -m batch.anomalies hogares.jsonl --resultados resultados.jsonl --por tramo --salida anomalias.csv
+
+El test de medios aplica reglas fijas; esta etapa busca, además, hogares
+atípicos respecto de los demás hogares de su tramo por ingreso. Se hacen
+dos pasadas sobre la entrada:
+
+1. Estadísticas por tramo por ingreso: mediana y MAD del ingreso corregido
+   (con un sketch KLL, en memoria acotada) y frecuencia de cada flag del
+   test de medios y de cada par de flags.
+2. Puntaje de cada hogar:
+
+       sorpresa = Σ -ln p(flag) + Σ max(0, ln(p(a) p(b) / p(a, b)))
+       z = (ingreso corregido - mediana) / (1.4826 · MAD)
+       puntaje = sorpresa · (1 + max(0, -z))
+
+   es decir, flags raros en el tramo (y combinaciones de flags que rara vez
+   aparecen juntas), más aún si el ingreso está bajo la mediana del tramo.
+   Un hogar sin flags tiene puntaje 0. Como la sorpresa solo depende del
+   tramo y de los flags activos, se calcula una vez por combinación.
+
+Se conservan los top-k hogares de cada grupo (comuna o tramo) en un
+montículo por grupo, por lo que la memoria no depende del número de hogares.
+"""
+
+import argparse
+import heapq
+import itertools
+import math
+import sys
+
+from batch.quantiles import SketchKLL
+from batch.records import FLAGS_MEDIOS, leer_hogares_jsonl
+from batch.scoring import emparejar_resultados
+from batch.writers import crear_escritor, leer_resultados
+
+TOP = 20
+# MAD de una normal = 0.6745 σ
+ESCALA_MAD = 1.4826
+COLUMNAS_ANOMALIA = ("grupo", "posicion", "id", "tramo_ingreso", "tramo_final", "ingreso_corregido",
+                     "z_ingreso", "sorpresa_medios", "puntaje", "flags")
+TIPOS_ANOMALIA = {"grupo": "s", "posicion": "q", "flags": "s"}
+
+
+def mascara_flags(hogar):
+    """Flags activos de un hogar como entero (bit j = FLAGS_MEDIOS[j])."""
+    datos = hogar.get("datos_medios", {})
+    mascara = 0
+    for j, flag in enumerate(FLAGS_MEDIOS):
+        if datos.get(flag):
+            mascara |= 1 << j
+    return mascara
+
+
+def _bits(mascara):
+    return [j for j in range(len(FLAGS_MEDIOS)) if mascara >> j & 1]
+
+
+class EstadisticasTramo:
+    """Estadísticas combinables de los hogares de un tramo."""
+
+    def __init__(self, k=200, semilla=0):
+        self.n = 0
+        self.ingresos = SketchKLL(k, semilla)
+        # Hogares por combinación de flags; de ahí salen flags y pares
+        self.combinaciones = {}
+
+    def agregar(self, ingreso_corregido, mascara):
+        self.n += 1
+        self.ingresos.agregar(ingreso_corregido)
+        self.combinaciones[mascara] = self.combinaciones.get(mascara, 0) + 1
+
+    def combinar(self, otra):
+        self.n += otra.n
+        self.ingresos.combinar(otra.ingresos)
+        for mascara, n in otra.combinaciones.items():
+            self.combinaciones[mascara] = self.combinaciones.get(mascara, 0) + n
+        return self
+
+
+class PerfilTramo:
+    """Estadísticas robustas de un tramo y puntaje de sus hogares."""
+
+    def __init__(self, estadisticas):
+        n = estadisticas.n
+        self.n = n
+        self.mediana = estadisticas.ingresos.cuantil(0.5)
+        self.mad = estadisticas.ingresos.desviacion_absoluta(self.mediana)
+        conteo = [0] * len(FLAGS_MEDIOS)
+        pares = {}
+        for mascara, c in estadisticas.combinaciones.items():
+            activos = _bits(mascara)
+            for j in activos:
+                conteo[j] += c
+            for par in itertools.combinations(activos, 2):
+                pares[par] = pares.get(par, 0) + c
+        # Frecuencias con suavizado de Laplace, para no dividir por cero
+        self.p_flag = [(c + 1) / (n + 2) for c in conteo]
+        self.p_par = {par: (c + 1) / (n + 2) for par, c in pares.items()}
+        self._p_par_vacio = 1 / (n + 2)
+        self._sorpresas = {0: 0.0}
+
+    def sorpresa(self, mascara):
+        """Sorpresa de los flags activos en este tramo (memorizada por combinación)."""
+        valor = self._sorpresas.get(mascara)
+        if valor is None:
+            activos = _bits(mascara)
+            valor = sum(-math.log(self.p_flag[j]) for j in activos)
+            for a, b in itertools.combinations(activos, 2):
+                p_ab = self.p_par.get((a, b), self._p_par_vacio)
+                valor += max(0.0, math.log(self.p_flag[a] * self.p_flag[b] / p_ab))
+            self._sorpresas[mascara] = valor
+        return valor
+
+    def z(self, ingreso_corregido):
+        if self.mad == 0:
+            return 0.0
+        return (ingreso_corregido - self.mediana) / (ESCALA_MAD * self.mad)
+
+    def puntaje(self, ingreso_corregido, mascara):
+        """
+        Returns:
+            tuple: (puntaje, z del ingreso, sorpresa de los flags)
+        """
+        sorpresa = self.sorpresa(mascara)
+        if not sorpresa:
+            return 0.0, self.z(ingreso_corregido), 0.0
+        z = self.z(ingreso_corregido)
+        return sorpresa * (1 + max(0.0, -z)), z, sorpresa
+
+
+def perfilar(pares, k=200, semilla=0):
+    """
+    Primera pasada: estadísticas por tramo por ingreso.
+
+    Args:
+        pares: Iterable de (hogar, resultado)
+
+    Returns:
+        dict: {tramo_ingreso: PerfilTramo}
+    """
+    por_tramo = {}
+    for hogar, resultado in pares:
+        tramo = resultado["tramo_ingreso"]
+        estadisticas = por_tramo.get(tramo)
+        if estadisticas is None:
+            estadisticas = por_tramo[tramo] = EstadisticasTramo(k, f"{semilla}:{tramo}")
+        estadisticas.agregar(resultado["ingreso_corregido"], mascara_flags(hogar))
+    return {tramo: PerfilTramo(e) for tramo, e in por_tramo.items()}
+
+
+def anomalias(pares, perfiles, por="tramo", top=TOP):
+    """
+    Segunda pasada: puntaje de cada hogar y top-k por grupo.
+
+    Args:
+        pares: Iterable de (hogar, resultado)
+        perfiles: Resultado de perfilar()
+        por: "tramo" (tramo por ingreso) o "comuna"
+        top: Hogares por grupo
+
+    Returns:
+        dict: {grupo: lista de filas con COLUMNAS_ANOMALIA, de mayor a menor puntaje}
+    """
+    montones = {}
+    for orden, (hogar, resultado) in enumerate(pares):
+        mascara = mascara_flags(hogar)
+        if not mascara:
+            continue
+        tramo = resultado["tramo_ingreso"]
+        puntaje, z, sorpresa = perfiles[tramo].puntaje(resultado["ingreso_corregido"], mascara)
+        if por == "comuna":
+            grupo = str(resultado.get("comuna") or hogar.get("comuna", ""))
+        else:
+            grupo = str(tramo)
+        monton = montones.setdefault(grupo, [])
+        # orden desempata sin comparar los diccionarios
+        entrada = (puntaje, -orden, z, sorpresa, mascara, resultado)
+        if len(monton) < top:
+            heapq.heappush(monton, entrada)
+        elif puntaje > monton[0][0]:
+            heapq.heapreplace(monton, entrada)
+
+    salida = {}
+    for grupo, monton in montones.items():
+        filas = []
+        for posicion, (puntaje, _, z, sorpresa, mascara, resultado) in enumerate(sorted(monton, reverse=True), 1):
+            filas.append({
+                "grupo": grupo,
+                "posicion": posicion,
+                "id": resultado["id"],
+                "tramo_ingreso": resultado["tramo_ingreso"],
+                "tramo_final": resultado["tramo_final"],
+                "ingreso_corregido": resultado["ingreso_corregido"],
+                "z_ingreso": z,
+                "sorpresa_medios": sorpresa,
+                "puntaje": puntaje,
+                "flags": " ".join(FLAGS_MEDIOS[j] for j in _bits(mascara)),
+            })
+        salida[grupo] = filas
+    return salida
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca hogares con ingreso y test de medios poco consistentes.")
+    parser.add_argument("hogares", help="JSONL de hogares")
+    parser.add_argument("--resultados", help="Resultados de batch.score en el mismo orden (por defecto se calculan)")
+    parser.add_argument("--por", choices=("tramo", "comuna"), default="tramo", help="Grupo del top-k")
+    parser.add_argument("--top", type=int, default=TOP, help="Hogares por grupo")
+    parser.add_argument("--k", type=int, default=200, help="Precisión del sketch KLL")
+    parser.add_argument("--salida", required=True, help="Anomalías: .csv, .jsonl o .col, con .gz opcional")
+    args = parser.parse_args(argv)
+
+    def pares():
+        resultados = leer_resultados(args.resultados) if args.resultados else None
+        return emparejar_resultados(leer_hogares_jsonl(args.hogares), resultados)
+
+    perfiles = perfilar(pares(), args.k)
+    print("Tramo  hogares   mediana        MAD", file=sys.stderr)
+    for tramo in sorted(perfiles):
+        p = perfiles[tramo]
+        print(f"{tramo:>5}  {p.n:>7,}  {p.mediana:>10,.0f}  {p.mad:>10,.0f}", file=sys.stderr)
+
+    por_grupo = anomalias(pares(), perfiles, args.por, args.top)
+    with crear_escritor(args.salida, COLUMNAS_ANOMALIA, tipos=TIPOS_ANOMALIA) as escritor:
+        for grupo in sorted(por_grupo):
+            escritor.escribir_muchos(por_grupo[grupo])
+    print(f"Grupos: {len(por_grupo):,} | Anomalías: {sum(len(f) for f in por_grupo.values()):,}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Flags del test de medios derivados de avalúos y planes de salud
+
+Uso:
+    python -m batch.asset_flags activos.csv --hogares hogares.jsonl --salida hogares_medios.jsonl
+
+El archivo de activos es un CSV con columnas hogar_id, tipo y valor, donde
+tipo es uno de TIPOS_ACTIVO. Se lee una sola vez: mientras se acumulan los
+cuantiles de la población completa (exactos o sketch KLL) se guarda, por
+hogar, el mayor valor de cada tipo de activo y su cantidad de naves menores.
+Un flag depende solo de ese máximo, por lo que al terminar la pasada los
+flags se asignan sin volver a leer el archivo.
+"""
+
+import argparse
+import csv
+import json
+import sys
+
+from batch.quantiles import crear_acumulador
+from batch.records import leer_hogares_jsonl
+
+TIPOS_ACTIVO = ("vehiculo", "bien_raiz", "plan_salud", "nave_mayor", "nave_menor")
+
+# Flags por percentil: (tipo de activo, flag de alto valor, cuantil, flag de muy alto valor, cuantil).
+# Un activo sobre el corte de muy alto valor activa solo ese flag, no ambos.
+#
+# Vehículos y bienes raíces: "el 20% / 5% más costoso" son los percentiles 80 y 95.
+# Salud: TestMediosFrame dice "sobre el 30% / 65% de los planes más costosos".
+# Leído como en vehículos (el 30% / 65% más costoso) daría los percentiles 70
+# y 35, con el corte de muy alto valor por debajo del de alto valor, lo que
+# contradice la metodología (muy alto valor lleva al tramo 90, alto valor al
+# 50). La lectura consistente es "sobre el percentil 30 / 65" de los valores
+# de planes, que es la que se usa aquí.
+CORTES_POR_DEFECTO = (
+    ("vehiculo", "vehiculos_alto_valor", 0.80, "vehiculos_muy_alto_valor", 0.95),
+    ("bien_raiz", "bienes_raices_alto_valor", 0.80, "bienes_raices_muy_alto_valor", 0.95),
+    ("plan_salud", "salud_alto_valor", 0.30, "salud_muy_alto_valor", 0.65),
+)
+
+# Cantidad de naves menores que activa tres_naves_menores
+MINIMO_NAVES_MENORES = 3
+
+FLAGS_DERIVADOS = tuple(
+    flag for _, alto, _, muy_alto, _ in CORTES_POR_DEFECTO for flag in (alto, muy_alto)
+) + ("nave_mayor", "tres_naves_menores")
+
+
+def leer_activos(ruta):
+    """Lee filas (hogar_id, tipo, valor) del CSV de activos."""
+    with open(ruta, encoding="utf-8", newline="") as f:
+        for fila in csv.DictReader(f):
+            tipo = fila["tipo"]
+            if tipo not in TIPOS_ACTIVO:
+                raise ValueError(f"Tipo de activo desconocido: {tipo}")
+            yield fila["hogar_id"], tipo, float(fila["valor"] or 0)
+
+
+def _validar_cortes(cortes):
+    for tipo, _, q_alto, _, q_muy_alto in cortes:
+        if not 0 <= q_alto < q_muy_alto <= 1:
+            raise ValueError(f"Cuantiles inválidos para {tipo}: "
+                             "el de muy alto valor debe superar al de alto valor")
+
+
+def _resumir(activos, cortes, acumuladores=None):
+    """
+    Una pasada sobre los activos: mayor valor por (hogar, tipo) y cantidad de
+    naves por hogar. Si se entregan acumuladores, agrega además cada valor al
+    de su tipo.
+    """
+    maximos = {}
+    naves = {}
+    con_corte = {tipo for tipo, _, _, _, _ in cortes}
+    for hogar_id, tipo, valor in activos:
+        if tipo in con_corte:
+            if acumuladores is not None:
+                acumuladores[tipo].agregar(valor)
+            clave = (hogar_id, tipo)
+            if valor > maximos.get(clave, float("-inf")):
+                maximos[clave] = valor
+        elif tipo in ("nave_mayor", "nave_menor"):
+            mayores, menores = naves.get(hogar_id, (0, 0))
+            naves[hogar_id] = (mayores + 1, menores) if tipo == "nave_mayor" else (mayores, menores + 1)
+    return maximos, naves
+
+
+def _cortes_desde(acumuladores, cortes):
+    valores_corte = {}
+    for tipo, alto, q_alto, muy_alto, q_muy_alto in cortes:
+        acumulador = acumuladores[tipo]
+        if not len(acumulador):
+            continue
+        valores_corte[alto] = acumulador.cuantil(q_alto)
+        valores_corte[muy_alto] = acumulador.cuantil(q_muy_alto)
+    return valores_corte
+
+
+def _flags_desde(maximos, naves, valores_corte, cortes):
+    # Un mismo medio no cuenta dos veces: con muy alto valor no se marca el alto
+    por_tipo = {tipo: (alto, muy_alto) for tipo, alto, _, muy_alto, _ in cortes}
+    flags = {}
+    for (hogar_id, tipo), valor in maximos.items():
+        alto, muy_alto = por_tipo[tipo]
+        if muy_alto in valores_corte and valor >= valores_corte[muy_alto]:
+            flags.setdefault(hogar_id, set()).add(muy_alto)
+        elif alto in valores_corte and valor >= valores_corte[alto]:
+            flags.setdefault(hogar_id, set()).add(alto)
+    for hogar_id, (mayores, menores) in naves.items():
+        if mayores:
+            flags.setdefault(hogar_id, set()).add("nave_mayor")
+        if menores >= MINIMO_NAVES_MENORES:
+            flags.setdefault(hogar_id, set()).add("tres_naves_menores")
+    return flags
+
+
+def calcular_cortes(activos, cortes=CORTES_POR_DEFECTO, exacto=False, k=400):
+    """
+    Calcula los puntos de corte en una pasada sobre los activos.
+
+    Args:
+        activos: Iterable de (hogar_id, tipo, valor)
+        cortes: Definición de cortes como CORTES_POR_DEFECTO
+        exacto: Si es True guarda todos los valores; si no, usa un sketch KLL
+        k: Parámetro de precisión del sketch
+
+    Returns:
+        dict: {flag: valor mínimo para activarlo}
+    """
+    _validar_cortes(cortes)
+    acumuladores = {tipo: crear_acumulador(exacto, k) for tipo, _, _, _, _ in cortes}
+    for _, tipo, valor in activos:
+        acumulador = acumuladores.get(tipo)
+        if acumulador is not None:
+            acumulador.agregar(valor)
+    return _cortes_desde(acumuladores, cortes)
+
+
+def flags_por_hogar(activos, valores_corte, cortes=CORTES_POR_DEFECTO):
+    """
+    Asigna flags a cada hogar con activos, con puntos de corte ya calculados.
+
+    Returns:
+        dict: {hogar_id: set de flags activos}
+    """
+    _validar_cortes(cortes)
+    maximos, naves = _resumir(activos, cortes)
+    return _flags_desde(maximos, naves, valores_corte, cortes)
+
+
+def derivar_flags(activos, cortes=CORTES_POR_DEFECTO, exacto=False, k=400):
+    """
+    Calcula los puntos de corte y asigna los flags en una sola pasada.
+
+    Args:
+        activos: Iterable de (hogar_id, tipo, valor); se recorre una vez
+        cortes, exacto, k: Como en calcular_cortes
+
+    Returns:
+        tuple: ({flag: valor mínimo para activarlo}, {hogar_id: set de flags activos})
+    """
+    _validar_cortes(cortes)
+    acumuladores = {tipo: crear_acumulador(exacto, k) for tipo, _, _, _, _ in cortes}
+    maximos, naves = _resumir(activos, cortes, acumuladores)
+    valores_corte = _cortes_desde(acumuladores, cortes)
+    return valores_corte, _flags_desde(maximos, naves, valores_corte, cortes)
+
+
+def asignar_medios(hogares, flags):
+    """
+    Sobrescribe en cada hogar los flags derivados de activos.
+
+    Yields:
+        dict: El mismo hogar con datos_medios actualizado
+    """
+    vacio = frozenset()
+    for hogar in hogares:
+        activos_hogar = flags.get(str(hogar["id"]), vacio)
+        datos_medios = hogar.setdefault("datos_medios", {})
+        for flag in FLAGS_DERIVADOS:
+            datos_medios[flag] = flag in activos_hogar
+        yield hogar
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Deriva flags del test de medios desde avalúos y planes de salud.")
+    parser.add_argument("activos", help="CSV con columnas hogar_id, tipo y valor")
+    parser.add_argument("--hogares", required=True, help="JSONL de hogares")
+    parser.add_argument("--salida", help="JSONL de salida (por defecto, salida estándar)")
+    parser.add_argument("--exacto", action="store_true", help="Cuantiles exactos en vez de sketch")
+    parser.add_argument("--k", type=int, default=400, help="Precisión del sketch KLL")
+    args = parser.parse_args(argv)
+
+    valores_corte, flags = derivar_flags(leer_activos(args.activos), exacto=args.exacto, k=args.k)
+    for flag, valor in sorted(valores_corte.items()):
+        print(f"  {flag}: >= {valor:,.0f}", file=sys.stderr)
+
+    salida = open(args.salida, "w", encoding="utf-8") if args.salida else sys.stdout
+    try:
+        for hogar in asignar_medios(leer_hogares_jsonl(args.hogares), flags):
+            salida.write(json.dumps(hogar, ensure_ascii=False) + "\n")
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+
+if __name__ == "__main__":
+    main()
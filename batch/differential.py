@@ -0,0 +1,283 @@
+"""
+Pruebas diferenciales entre la implementación original y calculator/
+
+Uso:
+    python -m batch.differential 1000000 --semilla 0 --procesos 8 --salida divergencias.jsonl
+    python -m batch.differential --entrada hogares.jsonl --procesos 8
+
+Las funciones de cálculo del monolito original (.old/) se cargan desde su
+código fuente sin ejecutar la parte de Tkinter, y se comparan paso a paso
+con los módulos de calculator/ sobre hogares sintéticos o leídos de archivo.
+Cada divergencia se reporta con un hogar reducido al mínimo que la reproduce.
+"""
+
+import argparse
+import ast
+import collections
+import copy
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from calculator.income import calcular_ingreso_equivalente, determinar_tramo_por_ingreso
+from calculator.needs_index import calcular_indice_necesidades, calcular_ingreso_corregido
+from calculator.means_test import evaluar_test_medios
+from batch.records import FLAGS_MEDIOS, leer_hogares_jsonl
+from batch.synthetic import generar_hogares
+
+RUTA_LEGADO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           ".old", "calificacion_socioeconomica.py")
+
+# Nombres de nivel superior del monolito que se cargan (funciones y tablas de cálculo)
+NOMBRES_LEGADO = (
+    "COEFICIENTES", "FACTOR_ESCALA", "obtener_rango_edad", "calcular_ingreso_equivalente",
+    "calcular_indice_necesidades", "calcular_ingreso_corregido", "evaluar_test_medios",
+    "determinar_tramo_por_ingreso",
+)
+
+PASOS = ("ingreso_equivalente", "indice_necesidades", "tramo_ingreso", "test_medios")
+
+SIN_DISCAPACIDAD = "Sin discapacidad, dependencia o NEE"
+
+
+def cargar_legado(ruta=RUTA_LEGADO):
+    """
+    Carga las funciones de cálculo del monolito sin importar tkinter.
+
+    Se analiza el archivo con ast y se compilan solo las definiciones de
+    NOMBRES_LEGADO, de modo que las clases de la interfaz nunca se ejecutan.
+
+    Returns:
+        dict: Espacio de nombres con las funciones y tablas cargadas
+    """
+    with open(ruta, encoding="utf-8") as f:
+        arbol = ast.parse(f.read(), filename=ruta)
+
+    cuerpo = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.FunctionDef) and nodo.name in NOMBRES_LEGADO:
+            cuerpo.append(nodo)
+        elif isinstance(nodo, ast.Assign) and any(
+                isinstance(t, ast.Name) and t.id in NOMBRES_LEGADO for t in nodo.targets):
+            cuerpo.append(nodo)
+
+    modulo = ast.Module(body=cuerpo, type_ignores=[])
+    espacio = {"math": math, "__name__": "legado"}
+    exec(compile(modulo, ruta, "exec"), espacio)
+
+    faltantes = [n for n in NOMBRES_LEGADO if n not in espacio]
+    if faltantes:
+        raise ImportError(f"No se encontraron en {ruta}: {', '.join(faltantes)}")
+    return espacio
+
+
+def _resultados_legado(legado, hogar):
+    integrantes = hogar["integrantes"]
+    ingreso_equiv = legado["calcular_ingreso_equivalente"](integrantes)
+    indice_nec = legado["calcular_indice_necesidades"](integrantes)
+    corregido = legado["calcular_ingreso_corregido"](ingreso_equiv, indice_nec)
+    tramo_medios, num_medios, _ = legado["evaluar_test_medios"](hogar["datos_medios"])
+    return {
+        "ingreso_equivalente": ingreso_equiv,
+        "indice_necesidades": indice_nec,
+        "tramo_ingreso": legado["determinar_tramo_por_ingreso"](corregido),
+        "test_medios": (tramo_medios, num_medios),
+    }
+
+
+def _resultados_modular(hogar):
+    integrantes = hogar["integrantes"]
+    ingreso_equiv = calcular_ingreso_equivalente(integrantes)
+    indice_nec = calcular_indice_necesidades(integrantes)
+    corregido = calcular_ingreso_corregido(ingreso_equiv, indice_nec)
+    tramo_medios, num_medios, _ = evaluar_test_medios(hogar["datos_medios"])
+    return {
+        "ingreso_equivalente": ingreso_equiv,
+        "indice_necesidades": indice_nec,
+        "tramo_ingreso": determinar_tramo_por_ingreso(corregido),
+        "test_medios": (tramo_medios, num_medios),
+    }
+
+
+def comparar(legado, hogar):
+    """
+    Compara ambas implementaciones para un hogar.
+
+    Returns:
+        list: Pasos (de PASOS) en que los resultados difieren
+    """
+    a = _resultados_legado(legado, hogar)
+    b = _resultados_modular(hogar)
+    return [paso for paso in PASOS if a[paso] != b[paso]]
+
+
+def _variantes(hogar):
+    """Hogares un paso más simples que el dado, para la reducción."""
+    integrantes = hogar["integrantes"]
+    if len(integrantes) > 1:
+        for i in range(len(integrantes)):
+            h = copy.deepcopy(hogar)
+            del h["integrantes"][i]
+            yield h
+    for flag, valor in hogar["datos_medios"].items():
+        if valor:
+            h = copy.deepcopy(hogar)
+            h["datos_medios"][flag] = False
+            yield h
+    for i, integ in enumerate(integrantes):
+        for campo in ("ingreso_trabajo", "ingreso_pension", "ingreso_capital"):
+            if integ[campo]:
+                h = copy.deepcopy(hogar)
+                h["integrantes"][i][campo] = 0
+                yield h
+        if integ.get("estudia"):
+            h = copy.deepcopy(hogar)
+            h["integrantes"][i]["estudia"] = False
+            yield h
+        if integ["condicion"] != SIN_DISCAPACIDAD:
+            h = copy.deepcopy(hogar)
+            h["integrantes"][i]["condicion"] = SIN_DISCAPACIDAD
+            yield h
+
+
+def minimizar(legado, hogar, pasos):
+    """
+    Reduce un hogar divergente mientras siga divergiendo en los mismos pasos.
+
+    Returns:
+        dict: Hogar mínimo que reproduce la divergencia
+    """
+    actual = hogar
+    cambio = True
+    while cambio:
+        cambio = False
+        for variante in _variantes(actual):
+            if set(pasos) <= set(comparar(legado, variante)):
+                actual = variante
+                cambio = True
+                break
+    return actual
+
+
+_legado_proceso = None
+
+
+def _comparar_bloque(args):
+    """Compara un bloque de hogares (función de nivel superior para multiprocessing)."""
+    global _legado_proceso
+    if _legado_proceso is None:
+        _legado_proceso = cargar_legado()
+    legado = _legado_proceso
+
+    origen, datos = args
+    if origen == "sintetico":
+        n, semilla, inicio = datos
+        hogares = generar_hogares(n, semilla, inicio=inicio)
+    else:
+        hogares = datos
+
+    total = 0
+    divergencias = []
+    for hogar in hogares:
+        total += 1
+        pasos = comparar(legado, hogar)
+        if pasos:
+            divergencias.append({
+                "id": hogar["id"],
+                "pasos": pasos,
+                "legado": _resultados_legado(legado, hogar),
+                "modular": _resultados_modular(hogar),
+                "hogar": hogar,
+                "reproductor": minimizar(legado, hogar, pasos),
+            })
+    return total, divergencias
+
+
+def _tareas(args):
+    if args.entrada:
+        hogares = leer_hogares_jsonl(args.entrada)
+        while True:
+            bloque = list(itertools.islice(hogares, args.bloque))
+            if not bloque:
+                return
+            for hogar in bloque:
+                datos_medios = hogar.setdefault("datos_medios", {})
+                for flag in FLAGS_MEDIOS:
+                    datos_medios.setdefault(flag, False)
+            yield "archivo", bloque
+    else:
+        for inicio in range(0, args.n, args.bloque):
+            yield "sintetico", (min(args.bloque, args.n - inicio), args.semilla, inicio)
+
+
+def ejecutar(args, salida_divergencias, reporte=sys.stderr):
+    """Ejecuta la comparación y retorna (hogares comparados, divergencias)."""
+    comparados = 0
+    n_divergencias = 0
+    por_paso = collections.Counter()
+    t0 = time.perf_counter()
+    ultimo_reporte = t0
+
+    def consumir(resultado):
+        nonlocal comparados, n_divergencias, ultimo_reporte
+        total, divergencias = resultado
+        comparados += total
+        for d in divergencias:
+            n_divergencias += 1
+            por_paso.update(d["pasos"])
+            salida_divergencias.write(json.dumps(d, ensure_ascii=False) + "\n")
+        ahora = time.perf_counter()
+        if ahora - ultimo_reporte >= 10:
+            ultimo_reporte = ahora
+            print(f"  {comparados:,} hogares | {comparados / (ahora - t0):,.0f} hogares/s | "
+                  f"{n_divergencias} divergencias", file=reporte)
+
+    if args.procesos <= 1:
+        for tarea in _tareas(args):
+            consumir(_comparar_bloque(tarea))
+    else:
+        with Pool(args.procesos) as pool:
+            pendientes = collections.deque()
+            for tarea in _tareas(args):
+                pendientes.append(pool.apply_async(_comparar_bloque, (tarea,)))
+                if len(pendientes) >= 2 * args.procesos:
+                    consumir(pendientes.popleft().get())
+            while pendientes:
+                consumir(pendientes.popleft().get())
+
+    duracion = time.perf_counter() - t0
+    print(f"Hogares comparados: {comparados:,} en {duracion:.1f} s "
+          f"({comparados / duracion if duracion else 0:,.0f} hogares/s)", file=reporte)
+    print(f"Divergencias: {n_divergencias}", file=reporte)
+    for paso in PASOS:
+        if por_paso[paso]:
+            print(f"  {paso}: {por_paso[paso]}", file=reporte)
+    return comparados, n_divergencias
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compara la implementación original (.old/) con calculator/.")
+    parser.add_argument("n", type=int, nargs="?", default=100000,
+                        help="Hogares sintéticos a generar (si no se usa --entrada)")
+    parser.add_argument("--entrada", help="Archivo JSONL de hogares en vez de hogares sintéticos")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--bloque", type=int, default=5000, help="Hogares por tarea")
+    parser.add_argument("--salida", help="Archivo JSONL de divergencias (por defecto, salida estándar)")
+    args = parser.parse_args(argv)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as salida:
+            _, n_divergencias = ejecutar(args, salida)
+    else:
+        _, n_divergencias = ejecutar(args, sys.stdout)
+    return 1 if n_divergencias else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
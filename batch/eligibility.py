@@ -0,0 +1,265 @@
+"""
+Elegibilidad masiva a programas sociales según la CSE
+
+Uso:
+    python -m batch.eligibility hogares.jsonl --salida elegibles.csv
+    python -m batch.eligibility hogares.jsonl --programas programas.json --resultados resultados.jsonl \\
+        --salida elegibles.col
+
+Cada programa es una lista de predicados que deben cumplirse todos ("todas")
+y, opcionalmente, una lista de la que basta uno ("alguna"). Un predicado
+compara un atributo del hogar con un valor:
+
+    {"atributo": "tramo_final", "op": "<=", "valor": 40}
+    {"atributo": "codigos_edad", "op": "contiene_alguno", "valor": ["60-74", "75+"]}
+
+Atributos numéricos: las columnas de resultado (tramo_final, tramo_ingreso,
+n_integrantes, ingreso_corregido, ...), edad_minima, edad_maxima y
+estudiantes_18_24, con los operadores <, <=, >, >=, ==, != y "en" (lista de
+valores). Atributos de conjunto: codigos_edad (ver batch.ages), condiciones
+y medios (flags activos), con "contiene" y "contiene_alguno".
+
+Al compilar, los predicados repetidos entre programas se evalúan una sola
+vez. La evaluación es por bloques y por columnas: cada predicado produce un
+byte 0/1 por hogar, los bytes del bloque se leen como un entero y los
+programas se resuelven con AND y OR de enteros, sin recorrer los hogares
+por programa.
+"""
+
+import argparse
+import bisect
+import functools
+import itertools
+import json
+import operator
+import os
+import sys
+import time
+
+from batch.ages import CODIGOS_EDAD, EDADES_MAXIMAS
+from batch.records import FLAGS_MEDIOS, leer_hogares_jsonl
+from batch.scoring import COLUMNAS_RESULTADO, emparejar_resultados
+from batch.writers import crear_escritor, leer_resultados
+
+RUTA_PROGRAMAS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "data", "programas.json")
+TAMANO_BLOQUE = 10000
+
+# x op valor se evalúa como op_invertido(valor, x), para usar functools.partial
+_COMPARACIONES = {
+    "<": operator.gt,
+    "<=": operator.ge,
+    ">": operator.lt,
+    ">=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+_ATRIBUTOS_NUMERICOS = tuple(c for c in COLUMNAS_RESULTADO if c != "id") + (
+    "edad_minima", "edad_maxima", "estudiantes_18_24")
+_ATRIBUTOS_CONJUNTO = ("codigos_edad", "condiciones", "medios")
+
+_CODIGO_POR_EDAD = tuple(bisect.bisect_left(EDADES_MAXIMAS, edad) for edad in range(256))
+
+
+def _clave_valor(valor):
+    if isinstance(valor, list):
+        return tuple(sorted(valor, key=str))
+    return valor
+
+
+class ProgramasCompilados:
+    """
+    Programas con sus predicados deduplicados.
+
+    Args:
+        programas: Lista de programas ({"nombre", "todas", "alguna"})
+    """
+
+    def __init__(self, programas):
+        self.nombres = []
+        self.predicados = []
+        self._indice = {}
+        self._condiciones = {}
+        # (índices de "todas", índices de "alguna") por programa
+        self.reglas = []
+        for programa in programas:
+            try:
+                nombre = programa["nombre"]
+                todas = [self._compilar(p) for p in programa.get("todas", ())]
+                alguna = [self._compilar(p) for p in programa.get("alguna", ())]
+            except (KeyError, TypeError) as e:
+                raise ValueError(f"Programa inválido {programa.get('nombre', '?')!r}: {e}")
+            if nombre in self.nombres:
+                raise ValueError(f"Programa repetido: {nombre}")
+            if not todas and not alguna:
+                raise ValueError(f"El programa {nombre} no tiene condiciones")
+            self.nombres.append(nombre)
+            self.reglas.append((tuple(sorted(set(todas))), tuple(sorted(set(alguna)))))
+        self.atributos = tuple(sorted({p[0] for p in self.predicados}))
+
+    def _bit_condicion(self, condicion):
+        if condicion not in self._condiciones:
+            self._condiciones[condicion] = len(self._condiciones)
+        return 1 << self._condiciones[condicion]
+
+    def _mascara(self, atributo, valores):
+        if atributo == "codigos_edad":
+            bits = 0
+            for v in valores:
+                if v not in CODIGOS_EDAD:
+                    raise ValueError(f"Código de edad desconocido: {v!r}")
+                bits |= 1 << CODIGOS_EDAD.index(v)
+            return bits
+        if atributo == "medios":
+            bits = 0
+            for v in valores:
+                if v not in FLAGS_MEDIOS:
+                    raise ValueError(f"Flag de medios desconocido: {v!r}")
+                bits |= 1 << FLAGS_MEDIOS.index(v)
+            return bits
+        return functools.reduce(operator.or_, (self._bit_condicion(v) for v in valores), 0)
+
+    def _compilar(self, predicado):
+        atributo, op, valor = predicado["atributo"], predicado["op"], predicado["valor"]
+        clave = (atributo, op, _clave_valor(valor))
+        if clave in self._indice:
+            return self._indice[clave]
+
+        if atributo in _ATRIBUTOS_NUMERICOS:
+            if op == "en":
+                funcion = functools.partial(operator.contains, frozenset(valor))
+            elif op in _COMPARACIONES:
+                funcion = functools.partial(_COMPARACIONES[op], valor)
+            else:
+                raise ValueError(f"Operador {op!r} no válido para {atributo}")
+        elif atributo in _ATRIBUTOS_CONJUNTO:
+            if op == "contiene":
+                mascara = self._mascara(atributo, [valor])
+            elif op == "contiene_alguno":
+                mascara = self._mascara(atributo, valor)
+            else:
+                raise ValueError(f"Operador {op!r} no válido para {atributo}")
+            funcion = functools.partial(operator.and_, mascara)
+        else:
+            raise ValueError(f"Atributo desconocido: {atributo}")
+
+        indice = self._indice[clave] = len(self.predicados)
+        self.predicados.append((atributo, funcion))
+        return indice
+
+    def _columna(self, atributo, hogares, resultados):
+        if atributo in COLUMNAS_RESULTADO:
+            return [r[atributo] for r in resultados]
+        if atributo == "edad_minima":
+            return [min((i["edad"] for i in h["integrantes"]), default=0) for h in hogares]
+        if atributo == "edad_maxima":
+            return [max((i["edad"] for i in h["integrantes"]), default=0) for h in hogares]
+        if atributo == "estudiantes_18_24":
+            return [sum(1 for i in h["integrantes"] if 18 <= i["edad"] <= 24 and i.get("estudia", False))
+                    for h in hogares]
+        if atributo == "codigos_edad":
+            tabla = _CODIGO_POR_EDAD
+            return [functools.reduce(operator.or_, (1 << tabla[min(255, i["edad"])] for i in h["integrantes"]), 0)
+                    for h in hogares]
+        if atributo == "condiciones":
+            bit = self._bit_condicion
+            return [functools.reduce(operator.or_, (bit(i["condicion"]) for i in h["integrantes"]), 0)
+                    for h in hogares]
+        # medios
+        return [sum(1 << j for j, flag in enumerate(FLAGS_MEDIOS) if h.get("datos_medios", {}).get(flag))
+                for h in hogares]
+
+    def evaluar_bloque(self, hogares, resultados):
+        """
+        Evalúa todos los programas sobre un bloque de hogares.
+
+        Args:
+            hogares: Lista de hogares
+            resultados: Resultados de la CSE alineados con hogares
+
+        Returns:
+            list: Por programa, bytes con un 0/1 por hogar
+        """
+        n = len(hogares)
+        columnas = {a: self._columna(a, hogares, resultados) for a in self.atributos}
+        bits = []
+        for atributo, funcion in self.predicados:
+            cumple = bytes(map(bool, map(funcion, columnas[atributo])))
+            bits.append(int.from_bytes(cumple, "little"))
+
+        todos = int.from_bytes(b"\x01" * n, "little")
+        salida = []
+        for todas, alguna in self.reglas:
+            valor = todos
+            for i in todas:
+                valor &= bits[i]
+            if alguna:
+                valor &= functools.reduce(operator.or_, (bits[i] for i in alguna))
+            salida.append(valor.to_bytes(n, "little"))
+        return salida
+
+
+def cargar_programas(ruta=RUTA_PROGRAMAS):
+    """Carga y compila las definiciones de programas de un archivo JSON."""
+    with open(ruta, encoding="utf-8") as f:
+        return ProgramasCompilados(json.load(f)["programas"])
+
+
+def evaluar(hogares, programas, resultados=None, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Evalúa los programas sobre un flujo de hogares.
+
+    Args:
+        hogares: Iterable de hogares
+        programas: ProgramasCompilados
+        resultados: Iterable de resultados alineado con hogares, o None para
+            calcular la CSE de cada hogar
+
+    Yields:
+        tuple: (hogares del bloque, resultados del bloque, lista de bytes por programa)
+    """
+    pares = emparejar_resultados(hogares, resultados)
+    while True:
+        bloque = list(itertools.islice(pares, tamano_bloque))
+        if not bloque:
+            return
+        bloque_hogares = [h for h, _ in bloque]
+        bloque_resultados = [r for _, r in bloque]
+        yield bloque_hogares, bloque_resultados, programas.evaluar_bloque(bloque_hogares, bloque_resultados)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Determina los programas sociales a los que califica cada hogar.")
+    parser.add_argument("hogares", help="JSONL de hogares")
+    parser.add_argument("--programas", default=RUTA_PROGRAMAS, help="JSON con definiciones de programas")
+    parser.add_argument("--resultados", help="Resultados de batch.score en el mismo orden (por defecto se calculan)")
+    parser.add_argument("--salida", required=True, help="Una fila por hogar: .csv, .jsonl o .col, con .gz opcional")
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Hogares por bloque")
+    args = parser.parse_args(argv)
+
+    programas = cargar_programas(args.programas)
+    resultados = leer_resultados(args.resultados) if args.resultados else None
+    columnas = ("id",) + tuple(programas.nombres)
+    tipos = {nombre: "q" for nombre in programas.nombres}
+    totales = [0] * len(programas.nombres)
+    n = 0
+    t0 = time.perf_counter()
+    with crear_escritor(args.salida, columnas, tipos=tipos, filas_por_bloque=args.bloque) as escritor:
+        for bloque, _, por_programa in evaluar(leer_hogares_jsonl(args.hogares), programas, resultados, args.bloque):
+            for j, cumple in enumerate(por_programa):
+                totales[j] += cumple.count(1)
+            for i, hogar in enumerate(bloque):
+                fila = {"id": hogar["id"]}
+                for nombre, cumple in zip(programas.nombres, por_programa):
+                    fila[nombre] = cumple[i]
+                escritor.escribir(fila)
+            n += len(bloque)
+
+    print(f"Hogares: {n:,} | Predicados: {len(programas.predicados)} | {time.perf_counter() - t0:.1f} s",
+          file=sys.stderr)
+    for nombre, total in zip(programas.nombres, totales):
+        print(f"  {nombre}: {total:,} ({total / (n or 1):.1%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
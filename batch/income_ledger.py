@@ -0,0 +1,325 @@
+"""
+Promedio de ingresos de los últimos 12 meses desde registros mensuales
+
+Uso:
+    python -m batch.income_ledger ingresos_mensuales.csv --mes 2025-05 --salida promedios.csv
+    python -m batch.income_ledger ingresos_mensuales.csv --desde 2025-01 --mes 2025-05
+    python -m batch.income_ledger ingresos_mensuales.csv --mes 2025-05 --hogares hogares.jsonl \\
+        --salida hogares_promediados.jsonl
+
+Los registros son filas persona_id, mes (AAAA-MM), ingreso_trabajo,
+ingreso_pension e ingreso_capital, en orden de mes (dentro de un mes el
+orden no importa y una persona puede tener varias filas). Por cada fuente
+se guardan 12 arreglos de enteros, uno por mes de la ventana, y la suma
+móvil por persona. Avanzar un mes resta el mes que sale de la ventana y lo
+deja en cero, sin releer la historia; los montos se guardan en pesos
+enteros, por lo que las sumas no acumulan error de redondeo.
+
+El promedio de un mes de evaluación M es la suma de M-11 a M dividida por
+12 (los meses sin registro cuentan como cero), como indica la metodología.
+
+Los identificadores de persona se guardan como texto: el CSV los trae así y
+en el JSONL de hogares suelen ser enteros, de modo que 17 y "17" son la
+misma persona.
+"""
+
+import argparse
+import csv
+import json
+import operator
+import sys
+from array import array
+
+from batch.records import leer_hogares_jsonl
+
+MESES_VENTANA = 12
+FUENTES = ("ingreso_trabajo", "ingreso_pension", "ingreso_capital")
+
+
+def mes_a_ordinal(mes):
+    """Convierte 'AAAA-MM' en un número de mes consecutivo."""
+    if isinstance(mes, int):
+        return mes
+    txt = mes.strip()
+    try:
+        anio, numero = int(txt[:4]), int(txt[5:7] if "-" in txt else txt[4:6])
+    except ValueError:
+        raise ValueError(f"Mes inválido: {mes!r}")
+    if not 1 <= numero <= 12:
+        raise ValueError(f"Mes inválido: {mes!r}")
+    return anio * 12 + numero - 1
+
+
+def ordinal_a_mes(ordinal):
+    """Convierte un número de mes consecutivo en 'AAAA-MM'."""
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+def _ceros(n):
+    return array("q", bytes(8 * n))
+
+
+class VentanaIngresos:
+    """
+    Sumas móviles de 12 meses de ingresos por persona.
+
+    Args:
+        mes: Mes de evaluación inicial ('AAAA-MM'); la ventana cubre los 12
+            meses que terminan en él
+    """
+
+    def __init__(self, mes):
+        self.mes_actual = mes_a_ordinal(mes)
+        self._indice = {}
+        self._ids = []
+        # Los arreglos crecen al doble cuando se llenan; las posiciones sobre
+        # len(self._ids) están en cero
+        self._capacidad = 0
+        # _meses[fuente][posición] es el arreglo del mes con ordinal % 12 == posición
+        self._meses = [[array("q") for _ in range(MESES_VENTANA)] for _ in FUENTES]
+        self._sumas = [array("q") for _ in FUENTES]
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def mes(self):
+        """Mes de evaluación actual ('AAAA-MM')."""
+        return ordinal_a_mes(self.mes_actual)
+
+    def _posicion_persona(self, persona_id):
+        persona_id = str(persona_id)
+        pos = self._indice.get(persona_id)
+        if pos is None:
+            pos = self._indice[persona_id] = len(self._ids)
+            self._ids.append(persona_id)
+            if pos >= self._capacidad:
+                self._crecer(max(1024, self._capacidad))
+        return pos
+
+    def _crecer(self, cantidad):
+        relleno = bytes(8 * cantidad)
+        for f in range(len(FUENTES)):
+            self._sumas[f].frombytes(relleno)
+            for arreglo in self._meses[f]:
+                arreglo.frombytes(relleno)
+        self._capacidad += cantidad
+
+    def agregar(self, persona_id, mes, montos):
+        """
+        Registra los ingresos de una persona en un mes.
+
+        Un mes posterior al de evaluación avanza la ventana hasta él; un mes
+        anterior a la ventana se ignora.
+
+        Args:
+            persona_id: Identificador de la persona
+            mes: 'AAAA-MM' u ordinal de mes
+            montos: (trabajo, pensión, capital) en pesos
+
+        Returns:
+            bool: True si el registro quedó dentro de la ventana
+        """
+        ordinal = mes_a_ordinal(mes)
+        if ordinal > self.mes_actual:
+            self.avanzar(ordinal - self.mes_actual)
+        elif ordinal <= self.mes_actual - MESES_VENTANA:
+            return False
+        pos = self._posicion_persona(persona_id)
+        ranura = ordinal % MESES_VENTANA
+        for meses, sumas, monto in zip(self._meses, self._sumas, montos):
+            if monto:
+                monto = int(round(monto))
+                meses[ranura][pos] += monto
+                sumas[pos] += monto
+        return True
+
+    def avanzar(self, meses=1):
+        """Avanza el mes de evaluación, sacando de la ventana los meses más antiguos."""
+        n = self._capacidad
+        if meses >= MESES_VENTANA:
+            # Toda la ventana queda fuera
+            self._meses = [[_ceros(n) for _ in range(MESES_VENTANA)] for _ in FUENTES]
+            self._sumas = [_ceros(n) for _ in FUENTES]
+            self.mes_actual += meses
+            return
+        for _ in range(meses):
+            self.mes_actual += 1
+            ranura = self.mes_actual % MESES_VENTANA
+            for f in range(len(FUENTES)):
+                saliente = self._meses[f][ranura]
+                self._sumas[f] = array("q", map(operator.sub, self._sumas[f], saliente))
+                self._meses[f][ranura] = _ceros(n)
+
+    def promedio(self, persona_id):
+        """Promedio de 12 meses de cada fuente de una persona, o None si no tiene registros."""
+        pos = self._indice.get(str(persona_id))
+        if pos is None:
+            return None
+        return tuple(s[pos] / MESES_VENTANA for s in self._sumas)
+
+    def promedios(self):
+        """
+        Promedios de todas las personas en el mes de evaluación.
+
+        Yields:
+            tuple: (persona_id, trabajo, pensión, capital)
+        """
+        for pos, persona_id in enumerate(self._ids):
+            yield (persona_id,) + tuple(s[pos] / MESES_VENTANA for s in self._sumas)
+
+    def guardar(self, ruta):
+        """Guarda el estado para continuar el mes siguiente sin releer la historia."""
+        with open(ruta, "wb") as f:
+            encabezado = json.dumps({"mes": self.mes_actual, "ids": self._ids}).encode("utf-8")
+            f.write(len(encabezado).to_bytes(8, "little"))
+            f.write(encabezado)
+            n = len(self._ids)
+            for f_meses, suma in zip(self._meses, self._sumas):
+                for arreglo in f_meses:
+                    arreglo[:n].tofile(f)
+                suma[:n].tofile(f)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Carga un estado guardado con guardar()."""
+        with open(ruta, "rb") as f:
+            largo = int.from_bytes(f.read(8), "little")
+            encabezado = json.loads(f.read(largo))
+            ventana = cls(encabezado["mes"])
+            ventana._ids = encabezado["ids"]
+            ventana._indice = {persona_id: i for i, persona_id in enumerate(ventana._ids)}
+            n = ventana._capacidad = len(ventana._ids)
+            for f_meses, suma in zip(ventana._meses, ventana._sumas):
+                for arreglo in f_meses:
+                    arreglo.fromfile(f, n)
+                suma.fromfile(f, n)
+        return ventana
+
+
+def leer_registros_csv(ruta):
+    """
+    Lee registros mensuales de ingresos.
+
+    Yields:
+        tuple: (persona_id, ordinal de mes, (trabajo, pensión, capital))
+    """
+    with open(ruta, encoding="utf-8", newline="") as f:
+        for fila in csv.DictReader(f):
+            montos = tuple(float(fila.get(fuente) or 0) for fuente in FUENTES)
+            yield fila["persona_id"], mes_a_ordinal(fila["mes"]), montos
+
+
+def promedios_por_mes(registros, desde, hasta):
+    """
+    Recorre registros ordenados por mes y entrega los promedios de cada mes
+    de evaluación entre desde y hasta, avanzando la ventana de a un mes.
+
+    Yields:
+        tuple: (mes 'AAAA-MM', VentanaIngresos en ese mes)
+    """
+    desde, hasta = mes_a_ordinal(desde), mes_a_ordinal(hasta)
+    if desde > hasta:
+        raise ValueError(f"El mes inicial {ordinal_a_mes(desde)} es posterior a {ordinal_a_mes(hasta)}")
+    ventana = VentanaIngresos(desde - 1)
+    mes_previo = None
+    for persona_id, mes, montos in registros:
+        if mes_previo is not None and mes < mes_previo:
+            raise ValueError(f"Registros fuera de orden: {ordinal_a_mes(mes)} después de "
+                             f"{ordinal_a_mes(mes_previo)}")
+        mes_previo = mes
+        if mes > hasta:
+            break
+        # Antes de entrar a un mes nuevo se entregan los meses de evaluación ya completos
+        while ventana.mes_actual < mes:
+            if ventana.mes_actual >= desde:
+                yield ordinal_a_mes(ventana.mes_actual), ventana
+            ventana.avanzar()
+        ventana.agregar(persona_id, mes, montos)
+    while ventana.mes_actual <= hasta:
+        if ventana.mes_actual >= desde:
+            yield ordinal_a_mes(ventana.mes_actual), ventana
+        if ventana.mes_actual == hasta:
+            break
+        ventana.avanzar()
+
+
+def conteo_vacio():
+    """Conteo de integrantes para aplicar_a_hogares."""
+    return {"actualizados": 0, "sin_registros": 0, "sin_clave": 0}
+
+
+def aplicar_a_hogares(hogares, ventana, clave="persona_id", conteo=None):
+    """
+    Reemplaza los ingresos de los integrantes que tienen clave por sus promedios.
+
+    Los integrantes sin registros en la ventana conservan sus ingresos.
+
+    Args:
+        conteo: Diccionario de conteo_vacio() que, al terminar de iterar,
+            tiene los integrantes actualizados, los que tienen clave pero no
+            registros y los que no tienen clave
+
+    Yields:
+        dict: El mismo hogar con los ingresos actualizados
+    """
+    if conteo is None:
+        conteo = conteo_vacio()
+    for hogar in hogares:
+        for integ in hogar["integrantes"]:
+            persona_id = integ.get(clave)
+            if persona_id is None:
+                conteo["sin_clave"] += 1
+                continue
+            promedio = ventana.promedio(persona_id)
+            if promedio is None:
+                conteo["sin_registros"] += 1
+                continue
+            conteo["actualizados"] += 1
+            for fuente, valor in zip(FUENTES, promedio):
+                integ[fuente] = valor
+        yield hogar
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Promedia ingresos mensuales en ventanas de 12 meses.")
+    parser.add_argument("registros", help="CSV persona_id, mes, ingreso_trabajo, ingreso_pension, ingreso_capital")
+    parser.add_argument("--mes", required=True, help="Mes de evaluación (AAAA-MM)")
+    parser.add_argument("--desde", help="Entregar también los meses desde este (AAAA-MM)")
+    parser.add_argument("--hogares", help="JSONL de hogares cuyos integrantes tienen persona_id")
+    parser.add_argument("--salida", help="Archivo de salida (por defecto, salida estándar)")
+    args = parser.parse_args(argv)
+    try:
+        if args.desde and mes_a_ordinal(args.desde) > mes_a_ordinal(args.mes):
+            parser.error(f"--desde {args.desde} es posterior a --mes {args.mes}")
+    except ValueError as e:
+        parser.error(str(e))
+
+    salida = open(args.salida, "w", encoding="utf-8", newline="") if args.salida else sys.stdout
+    try:
+        meses = promedios_por_mes(leer_registros_csv(args.registros), args.desde or args.mes, args.mes)
+        if args.hogares:
+            # Los hogares se actualizan con la ventana del mes de evaluación, el último entregado
+            ventana = None
+            for _, ventana in meses:
+                pass
+            if ventana is None:
+                raise ValueError(f"No hay meses de evaluación hasta {args.mes}")
+            conteo = conteo_vacio()
+            for hogar in aplicar_a_hogares(leer_hogares_jsonl(args.hogares), ventana, conteo=conteo):
+                salida.write(json.dumps(hogar, ensure_ascii=False) + "\n")
+            print(f"Integrantes actualizados: {conteo['actualizados']:,} | Sin registros: "
+                  f"{conteo['sin_registros']:,} | Sin persona_id: {conteo['sin_clave']:,}", file=sys.stderr)
+        else:
+            escritor = csv.writer(salida)
+            escritor.writerow(("mes", "persona_id") + FUENTES)
+            for mes, ventana in meses:
+                for persona_id, *promedio in ventana.promedios():
+                    escritor.writerow([mes, persona_id] + promedio)
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Agrupación de filas de persona en hogares con memoria acotada
+
+Uso:
+    python -m batch.ingest personas.csv --salida hogares.jsonl --limite-memoria 512M \\
+        --directorio-temporal /scratch
+    python -m batch.ingest personas.csv --fecha-referencia 2025-06-01 --salida hogares.jsonl
+
+El extracto del registro tiene una fila por persona con el id de su hogar,
+sin orden. Mientras los datos caben en el límite de memoria se agrupan en
+un diccionario; si lo superan, las filas se reparten por hash del id de
+hogar en archivos temporales y cada partición se agrupa por separado
+(re-particionando si una partición aún no cabe). Los hogares se entregan
+completos, pero no en el orden de la entrada.
+
+Con --fecha-referencia la edad se calcula desde la columna fecha_nacimiento
+a esa fecha (ver batch.ages) antes de agrupar.
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from batch.ages import asignar_edades
+from batch.records import filas_a_hogar, leer_personas_csv
+
+LIMITE_MEMORIA_POR_DEFECTO = 256 * 1024 * 1024
+PARTICIONES_POR_DEFECTO = 64
+# Costo aproximado en memoria de una fila (dict y str de Python) además de sus valores
+BYTES_BASE_FILA = 400
+PROFUNDIDAD_MAXIMA = 4
+
+_MASCARA_64 = (1 << 64) - 1
+
+
+def leer_tamano(texto):
+    """Convierte '512M', '2G' o '1048576' en bytes."""
+    texto = texto.strip().upper()
+    multiplicadores = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+    if texto and texto[-1] in multiplicadores:
+        return int(float(texto[:-1]) * multiplicadores[texto[-1]])
+    return int(texto)
+
+
+def _bytes_fila(fila):
+    return BYTES_BASE_FILA + sum(len(v) for v in fila.values() if isinstance(v, str))
+
+
+class AgrupadorPersonas:
+    """
+    Agrupa filas de persona por hogar_id con un límite de memoria.
+
+    Después de iterar, estadisticas contiene filas, hogares, filas derramadas
+    a disco, particiones y segundos.
+    """
+
+    def __init__(self, limite_memoria=LIMITE_MEMORIA_POR_DEFECTO, directorio_temporal=None,
+                 particiones=PARTICIONES_POR_DEFECTO, columna_hogar="hogar_id"):
+        self.limite_memoria = limite_memoria
+        self.directorio_temporal = directorio_temporal
+        self.particiones = particiones
+        self.columna_hogar = columna_hogar
+        self.estadisticas = {"filas": 0, "hogares": 0, "filas_derramadas": 0,
+                             "particiones": 0, "segundos": 0.0}
+
+    def _particion(self, hogar_id, nivel):
+        # hash() es estable dentro del proceso, que es todo lo que viven las
+        # particiones. Se mezcla con el nivel (finalizador splitmix64) para que
+        # al re-particionar las filas se repartan de forma independiente.
+        x = (hash(hogar_id) + (nivel + 1) * 0x9E3779B97F4A7C15) & _MASCARA_64
+        x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASCARA_64
+        x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASCARA_64
+        return (x ^ (x >> 31)) % self.particiones
+
+    def _derramar(self, filas, directorio, nivel, columnas):
+        """Reparte filas en archivos de partición. Retorna las rutas de las particiones."""
+        rutas = [os.path.join(directorio, f"n{nivel}_p{i:03d}.csv") for i in range(self.particiones)]
+        archivos = [open(r, "w", encoding="utf-8", newline="", buffering=1 << 16) for r in rutas]
+        escritores = [csv.writer(a) for a in archivos]
+        try:
+            for fila in filas:
+                i = self._particion(fila[self.columna_hogar], nivel)
+                escritores[i].writerow([fila.get(c, "") for c in columnas])
+                self.estadisticas["filas_derramadas"] += 1
+        finally:
+            for a in archivos:
+                a.close()
+        self.estadisticas["particiones"] += self.particiones
+        return rutas
+
+    def _agrupar(self, filas, directorio, nivel):
+        """Agrupa en memoria hasta el límite; si se supera, particiona en disco."""
+        grupos = {}
+        usados = 0
+        columnas = None
+        for fila in filas:
+            if columnas is None:
+                columnas = list(fila)
+            grupos.setdefault(fila[self.columna_hogar], []).append(fila)
+            usados += _bytes_fila(fila)
+            if usados > self.limite_memoria:
+                if nivel >= PROFUNDIDAD_MAXIMA:
+                    raise MemoryError("No se pudo agrupar dentro del límite de memoria; aumente --limite-memoria")
+                en_memoria = (f for grupo in grupos.values() for f in grupo)
+                pendientes = _encadenar(en_memoria, filas)
+                rutas = self._derramar(pendientes, directorio, nivel, columnas)
+                grupos = None
+                yield from self._agrupar_particiones(rutas, directorio, nivel, columnas)
+                return
+
+        for hogar_id, grupo in grupos.items():
+            yield hogar_id, grupo
+
+    def _agrupar_particiones(self, rutas, directorio, nivel, columnas):
+        for ruta in rutas:
+            with open(ruta, encoding="utf-8", newline="") as f:
+                filas = (dict(zip(columnas, valores)) for valores in csv.reader(f))
+                yield from self._agrupar(filas, directorio, nivel + 1)
+            os.remove(ruta)
+
+    def agrupar(self, filas):
+        """
+        Agrupa filas de persona en hogares.
+
+        Args:
+            filas: Iterable de diccionarios (p. ej. csv.DictReader) con columna hogar_id
+
+        Yields:
+            dict: Hogar con id, integrantes y datos_medios
+        """
+        t0 = time.perf_counter()
+        directorio = tempfile.mkdtemp(prefix="cse_agrupar_", dir=self.directorio_temporal)
+        try:
+            for hogar_id, grupo in self._agrupar(self._contar(filas), directorio, 0):
+                self.estadisticas["hogares"] += 1
+                yield filas_a_hogar(hogar_id, grupo)
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+            self.estadisticas["segundos"] = time.perf_counter() - t0
+
+    def _contar(self, filas):
+        for fila in filas:
+            self.estadisticas["filas"] += 1
+            yield fila
+
+
+def _encadenar(*iterables):
+    for it in iterables:
+        yield from it
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agrupa filas de persona en hogares (JSONL).")
+    parser.add_argument("personas", help="CSV con una fila por persona y columna hogar_id")
+    parser.add_argument("--salida", help="JSONL de hogares (por defecto, salida estándar)")
+    parser.add_argument("--limite-memoria", default="256M", help="Por ejemplo 512M o 2G")
+    parser.add_argument("--directorio-temporal", help="Directorio para los archivos de partición")
+    parser.add_argument("--particiones", type=int, default=PARTICIONES_POR_DEFECTO)
+    parser.add_argument("--fecha-referencia",
+                        help="Calcular la edad desde fecha_nacimiento a esta fecha (AAAA-MM-DD)")
+    parser.add_argument("--columna-nacimiento", default="fecha_nacimiento")
+    args = parser.parse_args(argv)
+
+    agrupador = AgrupadorPersonas(leer_tamano(args.limite_memoria), args.directorio_temporal,
+                                  args.particiones)
+    salida = open(args.salida, "w", encoding="utf-8") if args.salida else sys.stdout
+    filas = leer_personas_csv(args.personas)
+    if args.fecha_referencia:
+        filas = asignar_edades(filas, args.fecha_referencia, args.columna_nacimiento)
+    try:
+        for hogar in agrupador.agrupar(filas):
+            salida.write(json.dumps(hogar, ensure_ascii=False) + "\n")
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+
+    e = agrupador.estadisticas
+    segundos = e["segundos"] or 1e-9
+    print(f"Filas: {e['filas']:,} | Hogares: {e['hogares']:,} | Derramadas: {e['filas_derramadas']:,} | "
+          f"{e['segundos']:.1f} s ({e['filas'] / segundos:,.0f} filas/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Cola local de trabajos de cálculo de la CSE sobre SQLite
+
+Uso:
+    python -m batch.jobs cola.db encolar hogares.jsonl resultados.csv --prioridad 5
+    python -m batch.jobs cola.db trabajar --procesos 4
+    python -m batch.jobs cola.db estado <id>
+    python -m batch.jobs cola.db resultado <id>
+
+Varios clientes encolan trabajos en un mismo archivo SQLite (en modo WAL,
+sin servicio externo) y un grupo de procesos los atiende. Un trabajo es una
+lista de hogares, cuyo resultado se guarda en la cola, o un archivo JSONL que
+se calcula con batch.score y cuyo resultado son las estadísticas de la
+ejecución.
+
+Los trabajos se toman por prioridad (mayor primero) y luego por orden de
+llegada. Tomar un trabajo es un arriendo por un tiempo: si el proceso muere
+sin terminarlo, el arriendo vence y otro proceso lo vuelve a tomar (entrega
+al menos una vez). Un trabajo que falla se reintenta con espera exponencial
+hasta max_intentos. Un trabajador que pierde su arriendo (no logra
+renovarlo) detiene el trabajo y su resultado ya no se guarda: solo quien
+tiene el arriendo puede completarlo. Los trabajos de archivo reanudan desde
+su punto de control, y batch.score retiene un bloqueo sobre la salida para
+que un intento anterior que aún no se detiene no escriba junto al nuevo. Una
+clave opcional al encolar evita duplicar trabajos que un cliente reenvía.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from batch.records import leer_hogares_jsonl
+from batch.score import ejecutar
+from batch.scoring import puntuar_hogar
+
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+TERMINADO = "terminado"
+FALLIDO = "fallido"
+
+ARRIENDO = 60.0
+MAX_INTENTOS = 3
+ESPERA_REINTENTO = 1.0
+ESPERA_SONDEO = 0.5
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS trabajos (
+    id TEXT PRIMARY KEY,
+    clave TEXT UNIQUE,
+    tipo TEXT NOT NULL,
+    carga TEXT NOT NULL,
+    prioridad INTEGER NOT NULL DEFAULT 0,
+    estado TEXT NOT NULL,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    max_intentos INTEGER NOT NULL,
+    creado REAL NOT NULL,
+    disponible_desde REAL NOT NULL,
+    arrendado_hasta REAL,
+    trabajador TEXT,
+    resultado TEXT,
+    error TEXT,
+    terminado REAL
+);
+CREATE INDEX IF NOT EXISTS trabajos_por_turno
+    ON trabajos (estado, prioridad DESC, creado);
+"""
+
+
+class ColaTrabajos:
+    """
+    Cola de trabajos persistida en un archivo SQLite.
+
+    Cada proceso o hilo debe usar su propia instancia.
+
+    Args:
+        ruta: Archivo de la base de datos (se crea si no existe)
+        arriendo: Segundos que un trabajador retiene un trabajo sin renovarlo
+    """
+
+    def __init__(self, ruta, arriendo=ARRIENDO):
+        self.ruta = ruta
+        self.arriendo = arriendo
+        self._con = sqlite3.connect(ruta, timeout=30, isolation_level=None)
+        self._con.row_factory = sqlite3.Row
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA synchronous=NORMAL")
+        self._con.executescript(_ESQUEMA)
+
+    def cerrar(self):
+        self._con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+    def _encolar(self, tipo, carga, prioridad, max_intentos, clave):
+        ahora = time.time()
+        id_trabajo = uuid.uuid4().hex
+        try:
+            self._con.execute(
+                "INSERT INTO trabajos (id, clave, tipo, carga, prioridad, estado, max_intentos, creado, "
+                "disponible_desde) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (id_trabajo, clave, tipo, json.dumps(carga, ensure_ascii=False), prioridad, PENDIENTE,
+                 max_intentos, ahora, ahora))
+        except sqlite3.IntegrityError:
+            fila = self._con.execute("SELECT id FROM trabajos WHERE clave = ?", (clave,)).fetchone()
+            if fila is None:
+                raise
+            return fila["id"]
+        return id_trabajo
+
+    def encolar_hogares(self, hogares, prioridad=0, max_intentos=MAX_INTENTOS, clave=None):
+        """
+        Encola el cálculo de una lista de hogares.
+
+        Args:
+            hogares: Iterable de hogares (ver batch.records)
+            prioridad: Los trabajos de mayor prioridad se atienden primero
+            max_intentos: Intentos antes de marcar el trabajo como fallido
+            clave: Identificador del cliente; encolar de nuevo con la misma
+                clave retorna el trabajo existente
+
+        Returns:
+            str: Id del trabajo
+        """
+        return self._encolar("hogares", list(hogares), prioridad, max_intentos, clave)
+
+    def encolar_archivo(self, entrada, salida, prioridad=0, max_intentos=MAX_INTENTOS, clave=None):
+        """Encola el cálculo de un JSONL de hogares hacia un archivo de resultados (ver batch.score)."""
+        carga = {"entrada": os.path.abspath(entrada), "salida": os.path.abspath(salida)}
+        return self._encolar("archivo", carga, prioridad, max_intentos, clave)
+
+    def tomar(self, trabajador):
+        """
+        Toma el siguiente trabajo disponible, o uno cuyo arriendo venció.
+
+        Returns:
+            dict: {"id", "tipo", "carga", "intentos"}, o None si no hay trabajos
+        """
+        ahora = time.time()
+        self._con.execute("BEGIN IMMEDIATE")
+        try:
+            # Un arriendo vencido sin intentos restantes no se vuelve a entregar
+            self._con.execute(
+                "UPDATE trabajos SET estado = ?, error = ?, arrendado_hasta = NULL "
+                "WHERE estado = ? AND arrendado_hasta < ? AND intentos >= max_intentos",
+                (FALLIDO, "Arriendo vencido sin intentos restantes", EN_CURSO, ahora))
+            fila = self._con.execute(
+                "SELECT id, tipo, carga, intentos FROM trabajos "
+                "WHERE (estado = ? AND disponible_desde <= ?) OR (estado = ? AND arrendado_hasta < ?) "
+                "ORDER BY prioridad DESC, creado LIMIT 1",
+                (PENDIENTE, ahora, EN_CURSO, ahora)).fetchone()
+            if fila is not None:
+                self._con.execute(
+                    "UPDATE trabajos SET estado = ?, intentos = intentos + 1, arrendado_hasta = ?, "
+                    "trabajador = ? WHERE id = ?",
+                    (EN_CURSO, ahora + self.arriendo, trabajador, fila["id"]))
+            self._con.execute("COMMIT")
+        except BaseException:
+            self._con.execute("ROLLBACK")
+            raise
+        if fila is None:
+            return None
+        return {"id": fila["id"], "tipo": fila["tipo"], "carga": json.loads(fila["carga"]),
+                "intentos": fila["intentos"] + 1}
+
+    def renovar(self, id_trabajo, trabajador):
+        """Extiende el arriendo de un trabajo. Retorna False si el trabajador ya no lo tiene."""
+        cursor = self._con.execute(
+            "UPDATE trabajos SET arrendado_hasta = ? WHERE id = ? AND estado = ? AND trabajador = ?",
+            (time.time() + self.arriendo, id_trabajo, EN_CURSO, trabajador))
+        return cursor.rowcount == 1
+
+    def completar(self, id_trabajo, trabajador, resultado):
+        """
+        Guarda el resultado de un trabajo. Si el trabajador ya no lo tiene
+        (su arriendo venció y otro lo tomó) el resultado se descarta.
+
+        Returns:
+            bool: True si este resultado quedó guardado
+        """
+        cursor = self._con.execute(
+            "UPDATE trabajos SET estado = ?, resultado = ?, error = NULL, arrendado_hasta = NULL, "
+            "terminado = ? WHERE id = ? AND estado = ? AND trabajador = ?",
+            (TERMINADO, json.dumps(resultado, ensure_ascii=False), time.time(), id_trabajo, EN_CURSO,
+             trabajador))
+        return cursor.rowcount == 1
+
+    def fallar(self, id_trabajo, trabajador, error):
+        """
+        Registra un intento fallido. El trabajo vuelve a la cola con espera
+        exponencial, o queda fallido si agotó sus intentos.
+
+        Returns:
+            str: Nuevo estado, o None si el trabajador ya no tenía el trabajo
+        """
+        fila = self._con.execute(
+            "SELECT intentos, max_intentos FROM trabajos WHERE id = ? AND estado = ? AND trabajador = ?",
+            (id_trabajo, EN_CURSO, trabajador)).fetchone()
+        if fila is None:
+            return None
+        if fila["intentos"] >= fila["max_intentos"]:
+            estado, disponible = FALLIDO, time.time()
+        else:
+            estado, disponible = PENDIENTE, time.time() + ESPERA_REINTENTO * 2 ** (fila["intentos"] - 1)
+        self._con.execute(
+            "UPDATE trabajos SET estado = ?, error = ?, disponible_desde = ?, arrendado_hasta = NULL "
+            "WHERE id = ? AND estado = ? AND trabajador = ?",
+            (estado, str(error), disponible, id_trabajo, EN_CURSO, trabajador))
+        return estado
+
+    def estado(self, id_trabajo):
+        """
+        Estado de un trabajo.
+
+        Returns:
+            dict: id, tipo, prioridad, estado, intentos, max_intentos, error y fechas
+        """
+        fila = self._con.execute(
+            "SELECT id, clave, tipo, prioridad, estado, intentos, max_intentos, creado, terminado, error "
+            "FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+        if fila is None:
+            raise KeyError(f"Trabajo desconocido: {id_trabajo}")
+        return dict(fila)
+
+    def resultado(self, id_trabajo):
+        """Resultado de un trabajo terminado, o None si aún no termina."""
+        fila = self._con.execute("SELECT estado, resultado FROM trabajos WHERE id = ?",
+                                 (id_trabajo,)).fetchone()
+        if fila is None:
+            raise KeyError(f"Trabajo desconocido: {id_trabajo}")
+        return json.loads(fila["resultado"]) if fila["estado"] == TERMINADO else None
+
+    def esperar(self, id_trabajo, timeout=None, intervalo=ESPERA_SONDEO):
+        """
+        Espera a que un trabajo termine o falle.
+
+        Returns:
+            dict: Estado final del trabajo (ver estado())
+        """
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            estado = self.estado(id_trabajo)
+            if estado["estado"] in (TERMINADO, FALLIDO):
+                return estado
+            if limite is not None and time.monotonic() >= limite:
+                raise TimeoutError(f"El trabajo {id_trabajo} no terminó en {timeout} s")
+            time.sleep(intervalo)
+
+    def resumen(self):
+        """Cantidad de trabajos por estado."""
+        return dict(self._con.execute("SELECT estado, COUNT(*) FROM trabajos GROUP BY estado").fetchall())
+
+    def pendientes(self):
+        """Cantidad de trabajos pendientes o en curso."""
+        return self._con.execute("SELECT COUNT(*) FROM trabajos WHERE estado IN (?, ?)",
+                                 (PENDIENTE, EN_CURSO)).fetchone()[0]
+
+
+def procesar(trabajo, cancelar=None):
+    """
+    Ejecuta un trabajo tomado de la cola.
+
+    Args:
+        cancelar: threading.Event que detiene un trabajo de archivo en su
+            siguiente bloque (ver batch.score.ejecutar), o None
+
+    Returns:
+        Resultado serializable en JSON: lista de resultados por hogar, o las
+        estadísticas de la ejecución de un archivo
+    """
+    if trabajo["tipo"] == "hogares":
+        return [puntuar_hogar(hogar) for hogar in trabajo["carga"]]
+    if trabajo["tipo"] == "archivo":
+        carga = trabajo["carga"]
+        with open(os.devnull, "w") as reporte:
+            return ejecutar(carga["entrada"], carga["salida"], reanudar=True, reporte=reporte,
+                            cancelar=cancelar)
+    raise ValueError(f"Tipo de trabajo desconocido: {trabajo['tipo']}")
+
+
+class _Renovador(threading.Thread):
+    """
+    Renueva el arriendo de un trabajo largo mientras se procesa.
+
+    Si una renovación falla (otro trabajador tomó el trabajo, o la base de
+    datos da error) activa perdido, que detiene el procesamiento.
+    """
+
+    def __init__(self, ruta, arriendo, id_trabajo, trabajador):
+        super().__init__(daemon=True)
+        self.args_renovacion = (ruta, arriendo, id_trabajo, trabajador)
+        self.detenido = threading.Event()
+        self.perdido = threading.Event()
+
+    def run(self):
+        ruta, arriendo, id_trabajo, trabajador = self.args_renovacion
+        try:
+            with ColaTrabajos(ruta, arriendo) as cola:
+                while not self.detenido.wait(arriendo / 3):
+                    if not cola.renovar(id_trabajo, trabajador):
+                        break
+                else:
+                    return
+        except Exception:
+            pass
+        self.perdido.set()
+
+
+def trabajar(ruta, trabajador=None, arriendo=ARRIENDO, hasta_vaciar=False, detener=None):
+    """
+    Bucle de un trabajador: toma trabajos y los ejecuta hasta que se pida
+    detenerlo o, con hasta_vaciar, hasta que no queden trabajos pendientes.
+
+    Returns:
+        int: Trabajos ejecutados
+    """
+    trabajador = trabajador or f"{socket.gethostname()}:{os.getpid()}"
+    ejecutados = 0
+    with ColaTrabajos(ruta, arriendo) as cola:
+        while detener is None or not detener.is_set():
+            trabajo = cola.tomar(trabajador)
+            if trabajo is None:
+                if hasta_vaciar and cola.pendientes() == 0:
+                    break
+                time.sleep(ESPERA_SONDEO)
+                continue
+            renovador = _Renovador(ruta, arriendo, trabajo["id"], trabajador)
+            renovador.start()
+            try:
+                resultado = procesar(trabajo, renovador.perdido)
+            except Exception as e:
+                cola.fallar(trabajo["id"], trabajador, f"{type(e).__name__}: {e}")
+            else:
+                cola.completar(trabajo["id"], trabajador, resultado)
+            finally:
+                renovador.detenido.set()
+                renovador.join()
+            ejecutados += 1
+    return ejecutados
+
+
+def _trabajar_proceso(ruta, arriendo, hasta_vaciar, detener):
+    try:
+        trabajar(ruta, arriendo=arriendo, hasta_vaciar=hasta_vaciar, detener=detener)
+    except KeyboardInterrupt:
+        pass
+
+
+def ejecutar_trabajadores(ruta, procesos=1, arriendo=ARRIENDO, hasta_vaciar=False):
+    """Inicia procesos trabajadores sobre la cola y espera a que terminen."""
+    detener = multiprocessing.Event()
+    trabajadores = [multiprocessing.Process(target=_trabajar_proceso, args=(ruta, arriendo, hasta_vaciar, detener))
+                    for _ in range(procesos)]
+    for p in trabajadores:
+        p.start()
+    try:
+        for p in trabajadores:
+            p.join()
+    except KeyboardInterrupt:
+        detener.set()
+        for p in trabajadores:
+            p.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cola local de trabajos de cálculo de la CSE.")
+    parser.add_argument("cola", help="Archivo SQLite de la cola")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    encolar = comandos.add_parser("encolar", help="Encolar un archivo JSONL de hogares")
+    encolar.add_argument("entrada", help="JSONL de hogares")
+    encolar.add_argument("salida", nargs="?",
+                         help="Archivo de resultados; sin él los resultados quedan en la cola")
+    encolar.add_argument("--prioridad", type=int, default=0)
+    encolar.add_argument("--max-intentos", type=int, default=MAX_INTENTOS)
+    encolar.add_argument("--clave", help="Clave para no duplicar el trabajo si se reenvía")
+
+    trabajar_ = comandos.add_parser("trabajar", help="Atender la cola")
+    trabajar_.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    trabajar_.add_argument("--arriendo", type=float, default=ARRIENDO,
+                           help="Segundos tras los que un trabajo abandonado se reintenta")
+    trabajar_.add_argument("--hasta-vaciar", action="store_true",
+                           help="Terminar cuando no queden trabajos pendientes")
+
+    estado = comandos.add_parser("estado", help="Estado de un trabajo, o resumen de la cola sin id")
+    estado.add_argument("id", nargs="?")
+
+    resultado = comandos.add_parser("resultado", help="Resultado de un trabajo terminado")
+    resultado.add_argument("id")
+    args = parser.parse_args(argv)
+
+    if args.comando == "trabajar":
+        ejecutar_trabajadores(args.cola, args.procesos, args.arriendo, args.hasta_vaciar)
+        return
+
+    with ColaTrabajos(args.cola) as cola:
+        if args.comando == "encolar":
+            if args.salida:
+                id_trabajo = cola.encolar_archivo(args.entrada, args.salida, args.prioridad,
+                                                  args.max_intentos, args.clave)
+            else:
+                id_trabajo = cola.encolar_hogares(leer_hogares_jsonl(args.entrada), args.prioridad,
+                                                  args.max_intentos, args.clave)
+            print(id_trabajo)
+        elif args.comando == "estado":
+            datos = cola.estado(args.id) if args.id else cola.resumen()
+            print(json.dumps(datos, ensure_ascii=False, indent=2))
+        else:
+            datos = cola.resultado(args.id)
+            if datos is None:
+                print(f"El trabajo está {cola.estado(args.id)['estado']}", file=sys.stderr)
+                sys.exit(1)
+            if isinstance(datos, list):
+                for fila in datos:
+                    print(json.dumps(fila, ensure_ascii=False))
+            else:
+                print(json.dumps(datos, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Tamaño de bloque adaptativo según un presupuesto de memoria
+
+Con --memory-budget, el primer bloque de una ejecución es un calentamiento
+pequeño medido con tracemalloc, del que se obtiene el costo en memoria por
+hogar (lectura, cálculo y formato). Con ese costo y la memoria residente
+(RSS) del proceso se elige el tamaño de bloque que cabe en el presupuesto.
+Después de cada bloque se vuelve a muestrear la RSS: si se acerca al
+presupuesto el bloque se reduce, y si sobra espacio crece de a poco.
+
+Al terminar, reporte() entrega la memoria máxima observada en cada etapa.
+"""
+
+import contextlib
+import os
+import sys
+import tracemalloc
+
+# Hogares del bloque de calentamiento
+HOGARES_CALENTAMIENTO = 200
+BLOQUE_MINIMO = 50
+BLOQUE_MAXIMO = 200000
+# Fracción del espacio libre que se usa al dimensionar el bloque
+FRACCION_SEGURA = 0.5
+# Sobre esta fracción del presupuesto el bloque se reduce a la mitad
+UMBRAL_REDUCCION = 0.90
+# Bajo esta fracción el bloque puede crecer
+UMBRAL_CRECIMIENTO = 0.70
+FACTOR_CRECIMIENTO = 1.25
+
+
+def rss_actual():
+    """
+    Memoria residente del proceso en bytes, o None si no se puede medir.
+
+    En Linux se lee /proc/self/statm; en otros sistemas POSIX se usa el
+    máximo de getrusage, que sobrestima la RSS actual.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo if sys.platform == "darwin" else maximo * 1024
+
+
+def _mb(n):
+    return f"{n / (1 << 20):,.1f} MB"
+
+
+class ControlMemoria:
+    """
+    Elige y ajusta el tamaño de bloque para respetar un presupuesto de memoria.
+
+    Args:
+        presupuesto: Bytes máximos de memoria residente del proceso
+        bloque_maximo: Tope del tamaño de bloque
+    """
+
+    def __init__(self, presupuesto, bloque_maximo=BLOQUE_MAXIMO):
+        self.presupuesto = presupuesto
+        self.bloque_maximo = bloque_maximo
+        self.costo_hogar = None
+        self.tamano_bloque = HOGARES_CALENTAMIENTO
+        self.picos = {}
+        self.pico_calentamiento = 0
+        self.ajustes = 0
+
+    @property
+    def calentando(self):
+        """Indica si todavía no se mide el costo por hogar."""
+        return self.costo_hogar is None
+
+    def _registrar(self, etapa):
+        rss = rss_actual()
+        if rss is not None and rss > self.picos.get(etapa, 0):
+            self.picos[etapa] = rss
+        return rss
+
+    @contextlib.contextmanager
+    def etapa(self, nombre):
+        """Registra la RSS al final de una etapa (cuando sus datos siguen vivos)."""
+        yield
+        self._registrar(nombre)
+
+    @contextlib.contextmanager
+    def bloque(self):
+        """
+        Envuelve el procesamiento de un bloque. Durante el calentamiento lo
+        mide con tracemalloc; ajustar() usa esa medición.
+        """
+        if not self.calentando:
+            yield
+            return
+        tracemalloc.start()
+        try:
+            yield
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.pico_calentamiento = pico
+        self._registrar("calentamiento")
+
+    def _tamano_para(self, rss):
+        libre = self.presupuesto - (rss or 0)
+        if libre <= 0:
+            return BLOQUE_MINIMO
+        tamano = int(libre * FRACCION_SEGURA / self.costo_hogar)
+        return max(BLOQUE_MINIMO, min(self.bloque_maximo, tamano))
+
+    def ajustar(self, n_hogares):
+        """
+        Ajusta el tamaño de bloque después de procesar un bloque de n_hogares.
+
+        Returns:
+            int: Tamaño del próximo bloque
+        """
+        if self.calentando:
+            if n_hogares:
+                self.costo_hogar = max(1, self.pico_calentamiento // n_hogares)
+                self.tamano_bloque = self._tamano_para(rss_actual())
+            return self.tamano_bloque
+        rss = self._registrar("bloque")
+        if rss is None:
+            return self.tamano_bloque
+        anterior = self.tamano_bloque
+        if rss > self.presupuesto * UMBRAL_REDUCCION:
+            self.tamano_bloque = max(BLOQUE_MINIMO, self.tamano_bloque // 2)
+        elif rss < self.presupuesto * UMBRAL_CRECIMIENTO:
+            crecido = int(self.tamano_bloque * FACTOR_CRECIMIENTO)
+            self.tamano_bloque = min(crecido, self._tamano_para(rss))
+        self.tamano_bloque = max(BLOQUE_MINIMO, self.tamano_bloque)
+        if self.tamano_bloque != anterior:
+            self.ajustes += 1
+        return self.tamano_bloque
+
+    def reporte(self):
+        """Líneas de texto con el costo medido y el pico por etapa."""
+        lineas = [f"Presupuesto de memoria: {_mb(self.presupuesto)}"]
+        if self.costo_hogar is not None:
+            lineas.append(f"  Costo por hogar (calentamiento): {self.costo_hogar:,} B | "
+                          f"pico tracemalloc {_mb(self.pico_calentamiento)}")
+        lineas.append(f"  Bloque final: {self.tamano_bloque:,} hogares | ajustes: {self.ajustes}")
+        for etapa, pico in self.picos.items():
+            marca = " (sobre el presupuesto)" if pico > self.presupuesto else ""
+            lineas.append(f"  Pico RSS {etapa}: {_mb(pico)}{marca}")
+        return lineas
@@ -0,0 +1,298 @@
+"""
+Métricas de ejecución expuestas por HTTP en formato de texto de Prometheus
+
+Uso (desde un comando que acepte --metrics-port):
+    python -m batch.score hogares.jsonl resultados.jsonl --metrics-port 9108
+    curl http://127.0.0.1:9108/metrics
+
+Sin --metrics-port no se crea ningún registro ni se inicia el servidor, y
+el cálculo sigue el camino sin instrumentar. Con métricas activas, las
+observaciones se acumulan por bloque de hogares y se registran de una vez,
+para no tomar un bloqueo por hogar.
+
+No se exportan aciertos de caché ni profundidad de colas: el cálculo por
+hogar no pasa por ningún caché (los evaluadores compilados se obtienen una
+vez por ejecución) y batch.score lee, calcula y escribe cada bloque en
+secuencia, sin una cola de trabajo pendiente que medir.
+"""
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from batch.scoring import PASOS, puntuar_hogar
+
+TIPO_CONTENIDO = "text/plain; version=0.0.4; charset=utf-8"
+
+# Límites (segundos) de los histogramas de latencia por paso y por bloque
+LIMITES_PASO = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2)
+LIMITES_BLOQUE = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas_txt(nombres, valores, extra=()):
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores)]
+    pares.extend(f'{n}="{_escapar(v)}"' for n, v in extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero_txt(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor)
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} requiere las etiquetas {self.etiquetas}")
+        return tuple(etiquetas[n] for n in self.etiquetas)
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        with self._lock:
+            valores = dict(self._valores)
+        for sufijo, clave, extra, valor in self._muestras_de(valores):
+            lineas.append(f"{self.nombre}{sufijo}{_etiquetas_txt(self.etiquetas, clave, extra)} "
+                          f"{_numero_txt(valor)}")
+        return lineas
+
+    def _muestras_de(self, valores):
+        for clave, valor in sorted(valores.items()):
+            yield "", clave, (), valor
+
+
+class Contador(_Metrica):
+    """Contador monótono, opcionalmente con etiquetas."""
+
+    tipo = "counter"
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def inc_muchos(self, cantidades):
+        """Incrementa varias series de una vez. cantidades: {tupla de valores de etiquetas: cantidad}."""
+        with self._lock:
+            for clave, cantidad in cantidades.items():
+                self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+
+class Medidor(_Metrica):
+    """Valor que sube y baja (p. ej. profundidad de una cola)."""
+
+    tipo = "gauge"
+
+    def set(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = valor
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def dec(self, cantidad=1, **etiquetas):
+        self.inc(-cantidad, **etiquetas)
+
+
+class Histograma(_Metrica):
+    """Histograma con límites fijos (cubetas acumuladas al exponer)."""
+
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES_PASO):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, valor, **etiquetas):
+        self.observar_muchos((valor,), **etiquetas)
+
+    def observar_muchos(self, valores, **etiquetas):
+        """Registra varias observaciones de la misma serie tomando el bloqueo una sola vez."""
+        clave = self._clave(etiquetas)
+        limites = self.limites
+        conteos = [0] * (len(limites) + 1)
+        suma = 0.0
+        for valor in valores:
+            conteos[bisect.bisect_left(limites, valor)] += 1
+            suma += valor
+        with self._lock:
+            actual = self._valores.get(clave)
+            if actual is None:
+                self._valores[clave] = (conteos, suma)
+            else:
+                anteriores, suma_anterior = actual
+                self._valores[clave] = ([a + c for a, c in zip(anteriores, conteos)], suma_anterior + suma)
+
+    def _muestras_de(self, valores):
+        for clave, (conteos, suma) in sorted(valores.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.limites + (float("inf"),), conteos):
+                acumulado += conteo
+                yield "_bucket", clave, (("le", _numero_txt(float(limite))),), acumulado
+            yield "_sum", clave, (), suma
+            yield "_count", clave, (), acumulado
+
+
+class RegistroMetricas:
+    """
+    Conjunto de métricas de un proceso.
+
+    Además de las métricas propias acepta recolectores: funciones sin
+    argumentos que, al exponer, retornan líneas ya formateadas (para
+    contadores que viven en otros módulos).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metricas = {}
+        self._recolectores = []
+
+    def _registrar(self, clase, nombre, *args, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(nombre)
+            if metrica is None:
+                metrica = self._metricas[nombre] = clase(nombre, *args, **kwargs)
+            elif not isinstance(metrica, clase):
+                raise ValueError(f"La métrica {nombre} ya existe con otro tipo")
+            return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Contador, nombre, ayuda, etiquetas)
+
+    def medidor(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Medidor, nombre, ayuda, etiquetas)
+
+    def histograma(self, nombre, ayuda, etiquetas=(), limites=LIMITES_PASO):
+        return self._registrar(Histograma, nombre, ayuda, etiquetas, limites)
+
+    def agregar_recolector(self, recolector):
+        with self._lock:
+            self._recolectores.append(recolector)
+
+    def exponer(self):
+        """Retorna todas las métricas en formato de texto de Prometheus."""
+        with self._lock:
+            metricas = list(self._metricas.values())
+            recolectores = list(self._recolectores)
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exponer())
+        for recolector in recolectores:
+            lineas.extend(recolector())
+        return "\n".join(lineas) + "\n"
+
+
+class MetricasCalculo:
+    """
+    Métricas del cálculo de la CSE: hogares, latencia por paso y por bloque,
+    tramos y activaciones del test de medios.
+    """
+
+    def __init__(self, registro=None):
+        self.registro = registro or RegistroMetricas()
+        r = self.registro
+        self.hogares = r.contador("cse_hogares_total", "Hogares calculados")
+        self.latencia_paso = r.histograma("cse_paso_segundos", "Latencia por paso de la metodología",
+                                          ("paso",), LIMITES_PASO)
+        self.latencia_bloque = r.histograma("cse_bloque_segundos", "Latencia por bloque de hogares",
+                                            (), LIMITES_BLOQUE)
+        self.tramos = r.contador("cse_tramo_final_total", "Hogares por tramo final", ("tramo",))
+        self.activaciones = r.contador("cse_activaciones_medios_total",
+                                       "Hogares cuyo test de medios eleva el tramo")
+
+    def puntuar_bloque(self, hogares):
+        """
+        Calcula un bloque de hogares registrando sus métricas.
+
+        Returns:
+            list: Resultados, iguales a los de puntuar_hogar
+        """
+        tiempos = {paso: [] for paso in PASOS}
+        resultados = [puntuar_hogar(hogar, tiempos) for hogar in hogares]
+        self.registrar_resultados(resultados, sum(tiempos["total"]))
+        for paso, valores in tiempos.items():
+            self.latencia_paso.observar_muchos(valores, paso=paso)
+        return resultados
+
+    def registrar_resultados(self, resultados, segundos):
+        """Registra un bloque de resultados ya calculados y su duración."""
+        por_tramo = {}
+        activaciones = 0
+        for r in resultados:
+            clave = (str(r["tramo_final"]),)
+            por_tramo[clave] = por_tramo.get(clave, 0) + 1
+            if r["tramo_medios"] > r["tramo_ingreso"]:
+                activaciones += 1
+        self.hogares.inc(len(resultados))
+        self.tramos.inc_muchos(por_tramo)
+        self.activaciones.inc(activaciones)
+        self.latencia_bloque.observar(segundos)
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    registro = None
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        cuerpo = self.registro.exponer().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", TIPO_CONTENIDO)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+class ServidorMetricas:
+    """
+    Servidor HTTP de métricas en un hilo de fondo.
+
+    Args:
+        registro: RegistroMetricas a exponer
+        puerto: Puerto TCP (0 elige uno libre; ver .puerto)
+        host: Interfaz; por defecto solo local
+    """
+
+    def __init__(self, registro, puerto, host="127.0.0.1"):
+        manejador = type("ManejadorMetricas", (_ManejadorMetricas,), {"registro": registro})
+        self._servidor = ThreadingHTTPServer((host, puerto), manejador)
+        self._servidor.daemon_threads = True
+        self.puerto = self._servidor.server_address[1]
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, name="metricas", daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, tipo_exc, exc, tb):
+        self.detener()
+        return False
@@ -0,0 +1,160 @@
+"""
+Cuantiles en una sola pasada: exactos o con sketch KLL combinable
+"""
+
+import array
+import math
+import random
+
+
+class CuantilesExactos:
+    """
+    Guarda todos los valores en un array('d') y calcula cuantiles exactos.
+
+    Usa 8 bytes por valor; para poblaciones que no caben en memoria usar SketchKLL.
+    """
+
+    def __init__(self):
+        self._valores = array.array("d")
+        self._ordenado = True
+
+    def __len__(self):
+        return len(self._valores)
+
+    def agregar(self, valor):
+        self._valores.append(valor)
+        self._ordenado = False
+
+    def agregar_muchos(self, valores):
+        self._valores.extend(valores)
+        self._ordenado = False
+
+    def combinar(self, otro):
+        """Agrega los valores de otro acumulador del mismo tipo."""
+        self._valores.extend(otro._valores)
+        self._ordenado = False
+        return self
+
+    def cuantil(self, q):
+        """Retorna el menor valor v tal que al menos q*n valores son <= v."""
+        if not self._valores:
+            raise ValueError("No hay valores")
+        if not self._ordenado:
+            self._valores = array.array("d", sorted(self._valores))
+            self._ordenado = True
+        pos = max(0, math.ceil(q * len(self._valores)) - 1)
+        return self._valores[min(pos, len(self._valores) - 1)]
+
+    def desviacion_absoluta(self, centro, q=0.5):
+        """Cuantil q de |valor - centro| (con centro = mediana y q = 0.5, la MAD)."""
+        if not self._valores:
+            raise ValueError("No hay valores")
+        desviaciones = sorted(abs(v - centro) for v in self._valores)
+        pos = max(0, math.ceil(q * len(desviaciones)) - 1)
+        return desviaciones[min(pos, len(desviaciones) - 1)]
+
+
+class SketchKLL:
+    """
+    Sketch de cuantiles KLL (Karnin, Lang y Liberty).
+
+    Usa memoria O(k) independiente del número de valores, con error de rango
+    del orden de 1.7/k. Dos sketches con el mismo k pueden combinarse, lo que
+    permite procesar fragmentos en paralelo y unir los resultados.
+    """
+
+    FACTOR = 2 / 3
+
+    def __init__(self, k=200, semilla=0):
+        self.k = k
+        self.n = 0
+        self._niveles = [[]]
+        self._rng = random.Random(semilla)
+
+    def __len__(self):
+        return self.n
+
+    def _capacidad(self, nivel):
+        profundidad = len(self._niveles) - nivel - 1
+        return max(2, int(math.ceil(self.k * self.FACTOR ** profundidad)))
+
+    def _tamano(self):
+        return sum(len(nivel) for nivel in self._niveles)
+
+    def _capacidad_total(self):
+        return sum(self._capacidad(h) for h in range(len(self._niveles)))
+
+    def agregar(self, valor):
+        self._niveles[0].append(valor)
+        self.n += 1
+        if len(self._niveles[0]) >= self._capacidad(0):
+            self._comprimir()
+
+    def agregar_muchos(self, valores):
+        for valor in valores:
+            self.agregar(valor)
+
+    def _comprimir(self):
+        while self._tamano() >= self._capacidad_total():
+            for h, nivel in enumerate(self._niveles):
+                if len(nivel) >= self._capacidad(h):
+                    break
+            if h + 1 == len(self._niveles):
+                self._niveles.append([])
+            nivel.sort()
+            # Con largo impar, el último valor se queda en el nivel actual
+            sobrante = [nivel.pop()] if len(nivel) % 2 else []
+            desplazamiento = self._rng.random() < 0.5
+            self._niveles[h + 1].extend(nivel[desplazamiento::2])
+            self._niveles[h] = sobrante
+
+    def combinar(self, otro):
+        """Agrega el contenido de otro sketch (mismo k) a este."""
+        if otro.k != self.k:
+            raise ValueError("Solo se pueden combinar sketches con el mismo k")
+        while len(self._niveles) < len(otro._niveles):
+            self._niveles.append([])
+        for h, nivel in enumerate(otro._niveles):
+            self._niveles[h].extend(nivel)
+        self.n += otro.n
+        self._comprimir()
+        return self
+
+    def cuantil(self, q):
+        """Retorna una aproximación del cuantil q (entre 0 y 1)."""
+        ponderados = sorted(
+            (valor, 1 << h) for h, nivel in enumerate(self._niveles) for valor in nivel
+        )
+        if not ponderados:
+            raise ValueError("No hay valores")
+        total = sum(peso for _, peso in ponderados)
+        objetivo = q * total
+        acumulado = 0
+        for valor, peso in ponderados:
+            acumulado += peso
+            if acumulado >= objetivo:
+                return valor
+        return ponderados[-1][0]
+
+    def desviacion_absoluta(self, centro, q=0.5):
+        """
+        Aproxima el cuantil q de |valor - centro| a partir de los valores
+        ponderados del sketch, sin otra pasada sobre los datos.
+        """
+        ponderados = sorted(
+            (abs(valor - centro), 1 << h) for h, nivel in enumerate(self._niveles) for valor in nivel
+        )
+        if not ponderados:
+            raise ValueError("No hay valores")
+        objetivo = q * sum(peso for _, peso in ponderados)
+        acumulado = 0
+        for desviacion, peso in ponderados:
+            acumulado += peso
+            if acumulado >= objetivo:
+                return desviacion
+        return ponderados[-1][0]
+
+
+def crear_acumulador(exacto=False, k=200, semilla=0):
+    """Retorna un acumulador de cuantiles exacto o aproximado."""
+    return CuantilesExactos() if exacto else SketchKLL(k, semilla)
@@ -0,0 +1,147 @@
+"""
+Formatos de registro de hogares para el procesamiento masivo
+
+Un hogar se representa como un diccionario:
+    {"id": str, "integrantes": [dict, ...], "datos_medios": {flag: bool}}
+donde cada integrante tiene las mismas claves que IntegranteFrame.obtener_datos().
+
+En JSONL cada línea es un hogar. En CSV cada fila es una persona con el id
+de su hogar; los flags del test de medios se repiten en cada fila del hogar.
+"""
+
+import csv
+import json
+import os
+
+from calculator.means_test_rules import REGLAS_MEDIOS, VERSION_VIGENTE
+
+FLAGS_MEDIOS = tuple(m["flag"] for m in REGLAS_MEDIOS[VERSION_VIGENTE]["medios"])
+
+COLUMNAS_INTEGRANTE = (
+    "nombre", "edad", "condicion", "estudia",
+    "ingreso_trabajo", "ingreso_pension", "ingreso_capital",
+)
+
+COLUMNAS_PERSONA = ("hogar_id",) + COLUMNAS_INTEGRANTE + FLAGS_MEDIOS
+
+# Bytes por lectura al recorrer un rango de un archivo
+TAMANO_LECTURA = 1 << 20
+
+
+def _a_bool(valor):
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() in ("1", "true", "si", "sí", "s")
+
+
+def _a_monto(valor):
+    if isinstance(valor, (int, float)):
+        return valor
+    txt = str(valor).strip()
+    if not txt:
+        return 0
+    try:
+        return int(txt)
+    except ValueError:
+        return float(txt)
+
+
+def fila_a_integrante(fila):
+    """Convierte una fila CSV de persona en un diccionario de integrante."""
+    return {
+        "nombre": fila.get("nombre", ""),
+        "edad": int(fila["edad"]),
+        "condicion": fila["condicion"],
+        "estudia": _a_bool(fila.get("estudia", False)),
+        "ingreso_trabajo": _a_monto(fila.get("ingreso_trabajo", 0)),
+        "ingreso_pension": _a_monto(fila.get("ingreso_pension", 0)),
+        "ingreso_capital": _a_monto(fila.get("ingreso_capital", 0)),
+    }
+
+
+def filas_a_hogar(hogar_id, filas):
+    """Arma un hogar a partir de las filas de persona que comparten hogar_id."""
+    integrantes = [fila_a_integrante(f) for f in filas]
+    datos_medios = {flag: _a_bool(filas[0].get(flag, False)) for flag in FLAGS_MEDIOS} if filas else {}
+    hogar = {"id": hogar_id, "integrantes": integrantes, "datos_medios": datos_medios}
+    if filas and filas[0].get("comuna"):
+        hogar["comuna"] = filas[0]["comuna"]
+    return hogar
+
+
+def hogar_a_filas(hogar, columnas_hogar=()):
+    """
+    Convierte un hogar en filas de persona (listas en el orden de
+    COLUMNAS_PERSONA, seguidas de columnas_hogar).
+    """
+    medios = [int(bool(hogar["datos_medios"].get(flag, False))) for flag in FLAGS_MEDIOS]
+    medios.extend(hogar.get(col, "") for col in columnas_hogar)
+    filas = []
+    for integ in hogar["integrantes"]:
+        fila = [hogar["id"]]
+        for col in COLUMNAS_INTEGRANTE:
+            valor = integ.get(col, "")
+            fila.append(int(valor) if isinstance(valor, bool) else valor)
+        fila.extend(medios)
+        filas.append(fila)
+    return filas
+
+
+def leer_hogares_jsonl(ruta):
+    """Lee hogares desde un archivo JSONL, uno por línea."""
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                yield json.loads(linea)
+
+
+def leer_personas_csv(ruta):
+    """Lee filas de persona desde un CSV con encabezado."""
+    with open(ruta, encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def rangos_lineas(ruta, partes, con_encabezado=True):
+    """
+    Divide un archivo de texto en rangos de bytes que empiezan y terminan en
+    saltos de línea, para que cada proceso lea su parte.
+
+    Returns:
+        tuple: (primera línea si con_encabezado, si no "", lista de (desde, hasta))
+    """
+    tamano = os.path.getsize(ruta)
+    with open(ruta, "rb") as f:
+        encabezado = f.readline() if con_encabezado else b""
+        inicio_datos = f.tell()
+        cortes = [inicio_datos]
+        for i in range(1, partes):
+            f.seek(max(inicio_datos, tamano * i // partes))
+            if f.tell() > inicio_datos:
+                f.readline()
+            cortes.append(max(f.tell(), cortes[-1]))
+        cortes.append(tamano)
+    return encabezado.decode("utf-8"), list(zip(cortes[:-1], cortes[1:]))
+
+
+def leer_rango(ruta, desde, hasta, tamano_lectura=TAMANO_LECTURA):
+    """
+    Lee un rango de bytes de rangos_lineas() en trozos de tamaño fijo.
+
+    Yields:
+        str: Trozos de texto formados por líneas completas (la línea cortada
+             al final de una lectura pasa al trozo siguiente)
+    """
+    with open(ruta, "rb") as f:
+        f.seek(desde)
+        pendiente = hasta - desde
+        resto = b""
+        while pendiente > 0:
+            bloque = f.read(min(tamano_lectura, pendiente))
+            if not bloque:
+                break
+            pendiente -= len(bloque)
+            bloque = resto + bloque
+            corte = bloque.rfind(b"\n") + 1 if pendiente > 0 else len(bloque)
+            bloque, resto = bloque[:corte], bloque[corte:]
+            if bloque:
+                yield bloque.decode("utf-8")
@@ -0,0 +1,253 @@
+"""
+Diferencias de tramo entre dos ejecuciones de batch.score
+
+Uso:
+    python -m batch.run_diff resultados_abril.col resultados_mayo.col --salida cambios.csv
+    python -m batch.run_diff abril.jsonl.gz mayo.jsonl.gz --salida cambios.csv --matriz transiciones.csv \\
+        --memoria 256M --procesos 4
+
+Los archivos pueden ser más grandes que la memoria. Primero cada ejecución
+se reparte en particiones temporales según un hash del id del hogar, de modo
+que un mismo hogar cae en la misma partición en ambas. Luego, por cada
+partición, se carga la ejecución anterior en un diccionario y se recorre la
+nueva (hash join); solo una partición está en memoria a la vez por proceso.
+
+De cada hogar cuyo tramo final cambió se informa el paso que explica el
+cambio, en el orden de la metodología:
+
+    ingreso_equivalente  cambió el ingreso equivalente
+    indice_necesidades   cambió el índice de necesidades (IN)
+    tramo_ingreso        mismo ingreso corregido, otros umbrales
+    test_medios          cambió el tramo por medios
+
+Se entregan además las matrices de transición entre tramos (todos los
+hogares presentes en ambas ejecuciones y por paso) y los hogares que solo
+están en una de ellas. Las filas de la salida quedan ordenadas por partición,
+no por id.
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from multiprocessing import Pool
+
+from batch.ingest import leer_tamano
+from batch.writers import crear_escritor, detectar_formato, leer_resultados
+from constants import TRAMO_DESCRIPCIONES
+
+PASOS_CAMBIO = ("ingreso_equivalente", "indice_necesidades", "tramo_ingreso", "test_medios")
+_CAMPOS = ("ingreso_equivalente", "indice_necesidades", "ingreso_corregido", "tramo_ingreso", "tramo_medios",
+           "tramo_final")
+COLUMNAS_CAMBIO = ("id", "paso", "tramo_final_antes", "tramo_final_despues",
+                   "tramo_ingreso_antes", "tramo_ingreso_despues", "tramo_medios_antes", "tramo_medios_despues",
+                   "ingreso_equivalente_antes", "ingreso_equivalente_despues",
+                   "indice_necesidades_antes", "indice_necesidades_despues",
+                   "ingreso_corregido_antes", "ingreso_corregido_despues")
+TIPOS_CAMBIO = {"paso": "s", "tramo_final_antes": "q", "tramo_final_despues": "q",
+                "tramo_ingreso_antes": "q", "tramo_ingreso_despues": "q",
+                "tramo_medios_antes": "q", "tramo_medios_despues": "q"}
+
+MEMORIA = "256M"
+# Memoria aproximada de un hogar cargado en el diccionario de una partición
+BYTES_POR_HOGAR = 600
+# Bytes por hogar en los archivos de resultados, para estimar cuántos hay
+BYTES_ARCHIVO_POR_HOGAR = {"csv": 80, "jsonl": 250, "columnar": 90}
+TOLERANCIA = 1e-9
+
+
+def particion(id_hogar, particiones):
+    """Partición de un hogar (la misma en ambas ejecuciones)."""
+    return zlib.crc32(str(id_hogar).encode("utf-8")) % particiones
+
+
+def estimar_particiones(ruta, memoria):
+    """Particiones necesarias para que una partición de ruta quepa en memoria."""
+    formato, compresion = detectar_formato(ruta)
+    bytes_archivo = os.path.getsize(ruta) * (4 if compresion else 1)
+    hogares = bytes_archivo / BYTES_ARCHIVO_POR_HOGAR[formato]
+    return max(1, math.ceil(hogares * BYTES_POR_HOGAR / memoria))
+
+
+def particionar(ruta, directorio, prefijo, particiones):
+    """
+    Reparte los resultados de ruta en archivos de partición.
+
+    Returns:
+        list: Rutas de las particiones
+    """
+    rutas = [os.path.join(directorio, f"{prefijo}-{p:04d}.jsonl") for p in range(particiones)]
+    archivos = [open(r, "w", encoding="utf-8") for r in rutas]
+    try:
+        for r in leer_resultados(ruta):
+            id_hogar = str(r["id"])
+            fila = [id_hogar] + [r[c] for c in _CAMPOS]
+            archivos[particion(id_hogar, particiones)].write(json.dumps(fila) + "\n")
+    finally:
+        for f in archivos:
+            f.close()
+    return rutas
+
+
+def _distinto(a, b):
+    return abs(a - b) > TOLERANCIA * max(1.0, abs(a), abs(b))
+
+
+def paso_del_cambio(antes, despues):
+    """
+    Paso de la metodología que explica un cambio de tramo final.
+
+    Args:
+        antes, despues: Tuplas con los valores de _CAMPOS
+
+    Returns:
+        str: Uno de PASOS_CAMBIO
+    """
+    ie_a, in_a, _, ti_a, tm_a, tf_a = antes
+    ie_d, in_d, _, ti_d, tm_d, _ = despues
+    # El cambio viene del ingreso si el nuevo tramo por ingreso, con el
+    # tramo por medios anterior, ya cambia el tramo final
+    if ti_a != ti_d and max(ti_d, tm_a) != tf_a:
+        if _distinto(ie_a, ie_d):
+            return "ingreso_equivalente"
+        if _distinto(in_a, in_d):
+            return "indice_necesidades"
+        return "tramo_ingreso"
+    return "test_medios"
+
+
+def _leer_particion(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            fila = json.loads(linea)
+            yield fila[0], tuple(fila[1:])
+
+
+def unir_particion(args):
+    """
+    Hash join de una partición (función de nivel superior para multiprocessing).
+
+    Returns:
+        dict: cambios (lista de filas), transiciones {(antes, despues): n},
+              por_paso {paso: {(antes, despues): n}}, solo_antes, solo_despues
+    """
+    ruta_antes, ruta_despues = args
+    antes = dict(_leer_particion(ruta_antes))
+    cambios = []
+    transiciones = {}
+    por_paso = {}
+    solo_despues = 0
+    for id_hogar, d in _leer_particion(ruta_despues):
+        a = antes.pop(id_hogar, None)
+        if a is None:
+            solo_despues += 1
+            continue
+        clave = (a[5], d[5])
+        transiciones[clave] = transiciones.get(clave, 0) + 1
+        if a[5] == d[5]:
+            continue
+        paso = paso_del_cambio(a, d)
+        matriz = por_paso.setdefault(paso, {})
+        matriz[clave] = matriz.get(clave, 0) + 1
+        cambios.append({
+            "id": id_hogar,
+            "paso": paso,
+            "tramo_final_antes": a[5], "tramo_final_despues": d[5],
+            "tramo_ingreso_antes": a[3], "tramo_ingreso_despues": d[3],
+            "tramo_medios_antes": a[4], "tramo_medios_despues": d[4],
+            "ingreso_equivalente_antes": a[0], "ingreso_equivalente_despues": d[0],
+            "indice_necesidades_antes": a[1], "indice_necesidades_despues": d[1],
+            "ingreso_corregido_antes": a[2], "ingreso_corregido_despues": d[2],
+        })
+    return {"cambios": cambios, "transiciones": transiciones, "por_paso": por_paso,
+            "solo_antes": len(antes), "solo_despues": solo_despues}
+
+
+def comparar(ruta_antes, ruta_despues, particiones, procesos=1, directorio=None):
+    """
+    Compara dos ejecuciones por partición.
+
+    Yields:
+        dict: Resultado de unir_particion() para cada partición, en el orden
+            de las particiones también con varios procesos
+    """
+    temporal = tempfile.mkdtemp(prefix="cse-diff-", dir=directorio)
+    try:
+        rutas_antes = particionar(ruta_antes, temporal, "antes", particiones)
+        rutas_despues = particionar(ruta_despues, temporal, "despues", particiones)
+        tareas = list(zip(rutas_antes, rutas_despues))
+        if procesos <= 1:
+            for tarea in tareas:
+                yield unir_particion(tarea)
+        else:
+            with Pool(procesos) as pool:
+                yield from pool.imap(unir_particion, tareas)
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+def _sumar_matriz(total, parcial):
+    for clave, n in parcial.items():
+        total[clave] = total.get(clave, 0) + n
+
+
+def formatear_matriz(matriz):
+    """Líneas de texto de una matriz de transición (filas: antes, columnas: después)."""
+    tramos = sorted(set(TRAMO_DESCRIPCIONES) | {t for par in matriz for t in par})
+    lineas = ["antes\\después" + "".join(f"{t:>10}" for t in tramos)]
+    for a in tramos:
+        lineas.append(f"{a:>13}" + "".join(f"{matriz.get((a, d), 0):>10,}" for d in tramos))
+    return lineas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos ejecuciones de batch.score por id de hogar.")
+    parser.add_argument("antes", help="Resultados de la ejecución anterior")
+    parser.add_argument("despues", help="Resultados de la ejecución nueva")
+    parser.add_argument("--salida", required=True, help="Hogares que cambiaron de tramo (.csv, .jsonl o .col)")
+    parser.add_argument("--matriz", help="CSV con las matrices de transición (total y por paso)")
+    parser.add_argument("--memoria", default=MEMORIA, help="Memoria por proceso para el join (p. ej. 256M)")
+    parser.add_argument("--particiones", type=int, help="Número de particiones (por defecto, según --memoria)")
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument("--temporal", help="Directorio para las particiones (por defecto, el del sistema)")
+    args = parser.parse_args(argv)
+
+    particiones = args.particiones or estimar_particiones(args.antes, leer_tamano(args.memoria))
+    t0 = time.perf_counter()
+    transiciones = {}
+    por_paso = {paso: {} for paso in PASOS_CAMBIO}
+    solo_antes = solo_despues = cambios = 0
+    with crear_escritor(args.salida, COLUMNAS_CAMBIO, tipos=TIPOS_CAMBIO) as escritor:
+        for parcial in comparar(args.antes, args.despues, particiones, args.procesos, args.temporal):
+            escritor.escribir_muchos(parcial["cambios"])
+            cambios += len(parcial["cambios"])
+            _sumar_matriz(transiciones, parcial["transiciones"])
+            for paso, matriz in parcial["por_paso"].items():
+                _sumar_matriz(por_paso[paso], matriz)
+            solo_antes += parcial["solo_antes"]
+            solo_despues += parcial["solo_despues"]
+
+    if args.matriz:
+        with open(args.matriz, "w", encoding="utf-8", newline="") as f:
+            f.write("matriz,tramo_antes,tramo_despues,hogares\n")
+            for nombre, matriz in [("total", transiciones)] + list(por_paso.items()):
+                for (a, d), n in sorted(matriz.items()):
+                    f.write(f"{nombre},{a},{d},{n}\n")
+
+    comunes = sum(transiciones.values())
+    print(f"Particiones: {particiones} | {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+    print(f"En ambas: {comunes:,} | Cambian de tramo: {cambios:,} | Solo antes: {solo_antes:,} | "
+          f"Solo después: {solo_despues:,}", file=sys.stderr)
+    for paso in PASOS_CAMBIO:
+        print(f"  {paso}: {sum(por_paso[paso].values()):,}", file=sys.stderr)
+    for linea in formatear_matriz(transiciones):
+        print(linea, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Muestreo estratificado de resultados para revisión de calidad
+
+Uso:
+    python -m batch.sampling resultados.csv --por-estrato 20 --semilla 1 --salida muestra.csv
+    python -m batch.sampling parte1.jsonl --por-estrato 20 --estado parte1.muestra.json
+    python -m batch.sampling --combinar parte1.muestra.json parte2.muestra.json --salida muestra.csv
+
+Los estratos son tramo final × acuerdo entre tramo por ingreso y tramo por
+medios × tamaño del hogar. En cada estrato se guardan a lo más k hogares:
+cada hogar recibe una clave pseudoaleatoria derivada de (semilla, id) y se
+conservan los k de menor clave (reservorio por claves). La muestra es
+uniforme dentro del estrato, no depende del orden de lectura ni de cómo se
+reparta el archivo entre procesos, y dos muestras con la misma semilla se
+combinan quedándose con las k menores claves de ambas. Un id repetido entra
+una sola vez a la muestra.
+
+Cada fila de la muestra lleva su estrato y su peso (hogares del estrato
+sobre hogares muestreados).
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import sys
+
+from batch.writers import crear_escritor, leer_resultados
+
+POR_ESTRATO = 20
+# Tamaños de hogar con estrato propio; los mayores se agrupan en "5+"
+TAMANO_MAXIMO = 5
+
+
+def estrato(resultado):
+    """
+    Estrato de un resultado.
+
+    Returns:
+        str: "<tramo final>|<medios_eleva o ingreso_define>|<tamaño>"
+    """
+    acuerdo = "medios_eleva" if resultado["tramo_medios"] > resultado["tramo_ingreso"] else "ingreso_define"
+    n = int(resultado["n_integrantes"])
+    tamano = f"{TAMANO_MAXIMO}+" if n >= TAMANO_MAXIMO else str(n)
+    return f"{resultado['tramo_final']}|{acuerdo}|{tamano}"
+
+
+def clave_muestreo(semilla, id_hogar):
+    """Clave pseudoaleatoria reproducible de un hogar, uniforme en [0, 2^64)."""
+    resumen = hashlib.blake2b(f"{semilla}:{id_hogar}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(resumen, "big")
+
+
+class MuestraEstratificada:
+    """
+    Reservorio de tamaño fijo por estrato.
+
+    Args:
+        por_estrato: Hogares máximos por estrato
+        semilla: Semilla de las claves; solo se combinan muestras con la misma
+    """
+
+    def __init__(self, por_estrato=POR_ESTRATO, semilla=0):
+        self.por_estrato = por_estrato
+        self.semilla = semilla
+        # estrato -> montículo de (-clave, id, resultado) con las menores claves.
+        # Los ids no se repiten en un montículo, así que nunca se comparan resultados
+        self._reservorios = {}
+        self.poblacion = {}
+
+    def __len__(self):
+        return sum(len(r) for r in self._reservorios.values())
+
+    def _ofrecer(self, nombre, clave, id_hogar, resultado):
+        reservorio = self._reservorios.setdefault(nombre, [])
+        lleno = len(reservorio) >= self.por_estrato
+        if lleno and -clave <= reservorio[0][0]:
+            return
+        # Solo se revisan los pocos hogares que entran al reservorio
+        if any(i == id_hogar for _, i, _ in reservorio):
+            return
+        if lleno:
+            heapq.heapreplace(reservorio, (-clave, id_hogar, resultado))
+        else:
+            heapq.heappush(reservorio, (-clave, id_hogar, resultado))
+
+    def agregar(self, resultado):
+        """Ofrece un resultado a la muestra de su estrato."""
+        nombre = estrato(resultado)
+        self.poblacion[nombre] = self.poblacion.get(nombre, 0) + 1
+        id_hogar = str(resultado["id"])
+        self._ofrecer(nombre, clave_muestreo(self.semilla, id_hogar), id_hogar, resultado)
+
+    def agregar_muchos(self, resultados):
+        for resultado in resultados:
+            self.agregar(resultado)
+        return self
+
+    def combinar(self, otra):
+        """Agrega a esta muestra los hogares de otra, tomada sobre hogares distintos."""
+        if (otra.semilla, otra.por_estrato) != (self.semilla, self.por_estrato):
+            raise ValueError("Solo se combinan muestras con la misma semilla y tamaño por estrato")
+        for nombre, n in otra.poblacion.items():
+            self.poblacion[nombre] = self.poblacion.get(nombre, 0) + n
+        for nombre, reservorio in otra._reservorios.items():
+            for menos_clave, id_hogar, resultado in reservorio:
+                self._ofrecer(nombre, -menos_clave, id_hogar, resultado)
+        return self
+
+    def filas(self):
+        """
+        Hogares muestreados, por estrato y clave.
+
+        Yields:
+            dict: El resultado con "estrato" y "peso"
+        """
+        for nombre in sorted(self._reservorios):
+            reservorio = sorted(self._reservorios[nombre], reverse=True)
+            peso = self.poblacion[nombre] / len(reservorio)
+            for _, _, resultado in reservorio:
+                yield dict(resultado, estrato=nombre, peso=peso)
+
+    def guardar(self, ruta):
+        """Guarda la muestra en JSON, para combinarla con las de otros procesos."""
+        datos = {
+            "por_estrato": self.por_estrato,
+            "semilla": self.semilla,
+            "poblacion": self.poblacion,
+            "reservorios": {nombre: [[-c, i, r] for c, i, r in reservorio]
+                            for nombre, reservorio in self._reservorios.items()},
+        }
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(datos, f, ensure_ascii=False)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        muestra = cls(datos["por_estrato"], datos["semilla"])
+        muestra.poblacion = datos["poblacion"]
+        for nombre, reservorio in datos["reservorios"].items():
+            heap = [(-c, i, r) for c, i, r in reservorio]
+            heapq.heapify(heap)
+            muestra._reservorios[nombre] = heap
+        return muestra
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Muestra estratificada de resultados de la CSE.")
+    parser.add_argument("resultados", nargs="?", help="Resultados de batch.score (.csv, .jsonl o .col)")
+    parser.add_argument("--por-estrato", type=int, default=POR_ESTRATO)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--combinar", nargs="+", metavar="ESTADO",
+                        help="Combinar muestras guardadas con --estado")
+    parser.add_argument("--estado", help="Guardar la muestra para combinarla después")
+    parser.add_argument("--salida", help="Muestra: .csv, .jsonl o .col, con .gz opcional")
+    args = parser.parse_args(argv)
+    if not args.resultados and not args.combinar:
+        parser.error("Indique un archivo de resultados o --combinar")
+    if not args.salida and not args.estado:
+        parser.error("Indique --salida o --estado")
+
+    guardadas = [MuestraEstratificada.cargar(ruta) for ruta in args.combinar or ()]
+    if args.resultados:
+        muestra = MuestraEstratificada(args.por_estrato, args.semilla)
+        muestra.agregar_muchos(leer_resultados(args.resultados))
+    else:
+        muestra = guardadas.pop(0)
+    for otra in guardadas:
+        try:
+            muestra.combinar(otra)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.estado:
+        muestra.guardar(args.estado)
+    if args.salida:
+        filas = list(muestra.filas())
+        columnas = ("estrato", "peso") + tuple(c for c in (filas[0] if filas else {}) if c not in ("estrato", "peso"))
+        with crear_escritor(args.salida, columnas, tipos={"estrato": "s"}) as escritor:
+            escritor.escribir_muchos(filas)
+    print(f"Hogares: {sum(muestra.poblacion.values()):,} | Estratos: {len(muestra.poblacion)} | "
+          f"Muestra: {len(muestra):,}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Cálculo masivo de la CSE con puntos de control
+
+Uso:
+    python -m batch.score hogares.jsonl resultados.jsonl
+    python -m batch.score hogares.jsonl resultados.jsonl --resume
+    python -m batch.score hogares.jsonl resultados.col.gz
+    python -m batch.score hogares.jsonl resultados.jsonl --metrics-port 9108
+    python -m batch.score hogares.jsonl resultados.jsonl --memory-budget 512M
+    python -m batch.score hogares.jsonl resultados.col --territorio
+    python -m batch.score hogares.jsonl resultados.jsonl --indice
+
+El formato de salida (CSV, JSONL o columnar, con .gz opcional) se deduce de
+la extensión; ver batch.writers. Mientras corre, la salida se escribe en
+<salida>.part y solo al terminar se renombra a <salida>.
+
+Los hogares se procesan por bloques. Cada --checkpoint-cada hogares se
+vacía la salida a disco y se guarda (de forma atómica) un punto de control
+con la posición en la entrada, el largo de la salida y las estadísticas
+acumuladas. Con --resume se trunca la salida al último punto de control y
+se continúa desde allí, de modo que el resultado final es idéntico al de
+una ejecución sin interrupciones. Sin --resume se parte de cero y se
+descarta el punto de control que hubiera. Mientras corre, la ejecución
+retiene un bloqueo exclusivo sobre <salida>.lock: dos ejecuciones no pueden
+escribir a la vez el mismo .part ni su punto de control. El archivo .lock se
+elimina cuando la ejecución termina bien.
+
+Con --metrics-port se exponen métricas en http://127.0.0.1:<puerto>/metrics
+(ver batch.metrics). Con --memory-budget el tamaño de bloque se adapta para
+que la memoria del proceso no supere el presupuesto (ver batch.memory). Con
+--territorio la salida incluye la comuna de cada hogar, para agregarla con
+batch.territory. Con --indice, al terminar se guarda junto a la salida el
+índice de proximidad a los umbrales (ver calculator.boundary_index).
+"""
+
+import argparse
+import contextlib
+import fcntl
+import json
+import os
+import sys
+import time
+
+from batch.ingest import leer_tamano
+from batch.memory import ControlMemoria
+from batch.metrics import MetricasCalculo, ServidorMetricas
+from batch.scoring import COLUMNAS_RESULTADO, puntuar_hogar
+from batch.writers import crear_escritor, leer_resultados
+from calculator.boundary_index import IndiceFronteras, ruta_indice
+
+TAMANO_BLOQUE = 1000
+CHECKPOINT_CADA = 50000
+ESPERA_BLOQUEO = 0.5
+
+
+class EjecucionCancelada(Exception):
+    """La ejecución se detuvo porque se activó su evento de cancelación."""
+
+
+def ruta_checkpoint(ruta_salida):
+    """Retorna la ruta del punto de control de un archivo de resultados."""
+    return ruta_salida + ".checkpoint.json"
+
+
+@contextlib.contextmanager
+def _bloquear_salida(ruta_salida, cancelar=None):
+    """
+    Retiene un bloqueo exclusivo sobre <salida>.lock.
+
+    Sin cancelar, falla si otra ejecución tiene el bloqueo; con cancelar,
+    espera a que lo suelte o a que se active el evento. Si el bloque termina
+    sin excepción, el archivo se elimina antes de soltar el bloqueo; quien
+    esperaba sobre el archivo eliminado lo vuelve a abrir.
+    """
+    ruta = ruta_salida + ".lock"
+    while True:
+        f = open(ruta, "a")
+        try:
+            while True:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if cancelar is None:
+                        raise RuntimeError(f"Otra ejecución está escribiendo {ruta_salida}") from None
+                    if cancelar.wait(ESPERA_BLOQUEO):
+                        raise EjecucionCancelada(ruta_salida) from None
+            # El bloqueo vale solo si el archivo sigue en la ruta
+            try:
+                vigente = os.stat(ruta).st_ino == os.fstat(f.fileno()).st_ino
+            except FileNotFoundError:
+                vigente = False
+        except BaseException:
+            f.close()
+            raise
+        if vigente:
+            break
+        f.close()
+    try:
+        yield
+        os.remove(ruta)
+    finally:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        f.close()
+
+
+def _verificar_cancelacion(cancelar, ruta_salida):
+    if cancelar is not None and cancelar.is_set():
+        raise EjecucionCancelada(ruta_salida)
+
+
+def estadisticas_vacias():
+    """Estadísticas acumuladas de una ejecución."""
+    return {"hogares": 0, "por_tramo": {}, "suma_ingreso_corregido": 0.0, "activaciones_medios": 0}
+
+
+def acumular(estadisticas, resultado):
+    """Agrega un resultado a las estadísticas acumuladas."""
+    estadisticas["hogares"] += 1
+    tramo = str(resultado["tramo_final"])
+    estadisticas["por_tramo"][tramo] = estadisticas["por_tramo"].get(tramo, 0) + 1
+    estadisticas["suma_ingreso_corregido"] += resultado["ingreso_corregido"]
+    if resultado["tramo_medios"] > resultado["tramo_ingreso"]:
+        estadisticas["activaciones_medios"] += 1
+
+
+def _guardar_checkpoint(ruta, datos):
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(datos, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def _leer_bloque(entrada, tamano):
+    """Lee hasta tamano hogares de un archivo binario JSONL. Retorna (hogares, posición final)."""
+    hogares = []
+    while len(hogares) < tamano:
+        linea = entrada.readline()
+        if not linea:
+            break
+        if linea.strip():
+            hogares.append(json.loads(linea))
+    return hogares, entrada.tell()
+
+
+@contextlib.contextmanager
+def _sin_medicion(etapa):
+    yield
+
+
+def _procesar_bloque(entrada, tamano, escritor, estadisticas, metricas, etapa, territorio=False, volcar=False):
+    """
+    Lee, calcula y escribe un bloque.
+
+    Args:
+        etapa: Context manager que mide cada etapa (lectura, calculo, escritura)
+        volcar: Vaciar la salida a disco al terminar el bloque, para que su
+            búfer no se acumule entre bloques
+
+    Returns:
+        tuple: (hogares, posición en la entrada, resultados)
+    """
+    with etapa("lectura"):
+        hogares, offset_entrada = _leer_bloque(entrada, tamano)
+    if not hogares:
+        return hogares, offset_entrada, []
+    with etapa("calculo"):
+        if metricas is None:
+            resultados = [puntuar_hogar(hogar) for hogar in hogares]
+        else:
+            resultados = metricas.puntuar_bloque(hogares)
+        if territorio:
+            for hogar, resultado in zip(hogares, resultados):
+                resultado["comuna"] = hogar.get("comuna", "")
+    with etapa("escritura"):
+        for resultado in resultados:
+            acumular(estadisticas, resultado)
+            escritor.escribir(resultado)
+        if volcar:
+            escritor.volcar()
+    return hogares, offset_entrada, resultados
+
+
+def ejecutar(ruta_entrada, ruta_salida, reanudar=False, tamano_bloque=TAMANO_BLOQUE,
+             checkpoint_cada=CHECKPOINT_CADA, reporte=sys.stderr, metricas=None, control_memoria=None,
+             territorio=False, indice=False, cancelar=None):
+    """
+    Calcula la CSE de todos los hogares de un JSONL.
+
+    Args:
+        metricas: MetricasCalculo donde registrar la ejecución, o None
+        control_memoria: ControlMemoria que fija el tamaño de bloque, o None
+            para usar tamano_bloque fijo
+        territorio: Agregar la columna comuna a la salida
+        indice: Guardar el IndiceFronteras de la salida en ruta_indice(ruta_salida)
+        cancelar: threading.Event, o None. Se revisa tras cada bloque, antes de
+            guardar un punto de control y antes de renombrar la salida; si está
+            activo se lanza EjecucionCancelada sin tocar el último punto de
+            control, que queda para reanudar
+
+    Returns:
+        dict: Estadísticas acumuladas de la ejecución
+    """
+    with _bloquear_salida(ruta_salida, cancelar):
+        return _ejecutar(ruta_entrada, ruta_salida, reanudar, tamano_bloque, checkpoint_cada, reporte,
+                         metricas, control_memoria, territorio, indice, cancelar)
+
+
+def _ejecutar(ruta_entrada, ruta_salida, reanudar, tamano_bloque, checkpoint_cada, reporte, metricas,
+              control_memoria, territorio, indice, cancelar):
+    ruta_cp = ruta_checkpoint(ruta_salida)
+    offset_entrada = 0
+    offset_salida = 0
+    estadisticas = estadisticas_vacias()
+
+    if reanudar and os.path.exists(ruta_cp):
+        with open(ruta_cp, encoding="utf-8") as f:
+            cp = json.load(f)
+        if os.path.abspath(cp["entrada"]) != os.path.abspath(ruta_entrada):
+            raise ValueError(f"El punto de control corresponde a otra entrada: {cp['entrada']}")
+        if os.path.getsize(ruta_entrada) < cp["offset_entrada"]:
+            raise ValueError("La entrada cambió desde el punto de control")
+        offset_entrada = cp["offset_entrada"]
+        offset_salida = cp["offset_salida"]
+        estadisticas = cp["estadisticas"]
+        print(f"Reanudando desde {estadisticas['hogares']:,} hogares", file=reporte)
+    elif reanudar:
+        print("No hay punto de control; se parte desde el inicio", file=reporte)
+    elif os.path.exists(ruta_cp):
+        # El punto de control de una ejecución anterior no describe esta salida
+        os.remove(ruta_cp)
+
+    # Lo escrito después del último punto de control se descarta
+    reanudar_en = offset_salida if offset_salida else None
+    if reanudar_en is not None and not os.path.exists(ruta_salida + ".part"):
+        raise ValueError(f"No existe la salida a reanudar: {ruta_salida}.part")
+
+    t0 = time.perf_counter()
+    procesados = 0
+    desde_checkpoint = 0
+    columnas = COLUMNAS_RESULTADO + ("comuna",) if territorio else COLUMNAS_RESULTADO
+    escritor = crear_escritor(ruta_salida, columnas, filas_por_bloque=tamano_bloque, reanudar_en=reanudar_en)
+    try:
+        with open(ruta_entrada, "rb") as entrada:
+            entrada.seek(offset_entrada)
+
+            while True:
+                if control_memoria is None:
+                    hogares, offset_entrada, resultados = _procesar_bloque(
+                        entrada, tamano_bloque, escritor, estadisticas, metricas, _sin_medicion, territorio)
+                else:
+                    with control_memoria.bloque():
+                        hogares, offset_entrada, resultados = _procesar_bloque(
+                            entrada, control_memoria.tamano_bloque, escritor, estadisticas, metricas,
+                            control_memoria.etapa, territorio, volcar=True)
+                    control_memoria.ajustar(len(hogares))
+                if not hogares:
+                    break
+                del resultados
+                _verificar_cancelacion(cancelar, ruta_salida)
+                procesados += len(hogares)
+                desde_checkpoint += len(hogares)
+
+                if desde_checkpoint >= checkpoint_cada:
+                    desde_checkpoint = 0
+                    _guardar_checkpoint(ruta_cp, {
+                        "entrada": ruta_entrada,
+                        "offset_entrada": offset_entrada,
+                        "offset_salida": escritor.punto_control(),
+                        "estadisticas": estadisticas,
+                    })
+                    segundos = time.perf_counter() - t0
+                    print(f"  {estadisticas['hogares']:,} hogares | {procesados / segundos:,.0f} hogares/s",
+                          file=reporte)
+
+        _verificar_cancelacion(cancelar, ruta_salida)
+    except BaseException:
+        # Se cierra mientras se tiene el bloqueo; el .part queda para reanudar
+        escritor.cerrar()
+        raise
+    escritor.finalizar()
+    if indice:
+        # Se lee de la salida final, así el índice también cubre lo calculado
+        # antes de un --resume
+        fronteras = IndiceFronteras()
+        fronteras.agregar_resultados(leer_resultados(ruta_salida))
+        fronteras.guardar(ruta_indice(ruta_salida))
+    if os.path.exists(ruta_cp):
+        os.remove(ruta_cp)
+    return estadisticas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcula la CSE de un archivo JSONL de hogares.")
+    parser.add_argument("entrada", help="JSONL de hogares")
+    parser.add_argument("salida", help="Resultados: .csv, .jsonl o .col, con .gz opcional")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continuar desde el último punto de control de la salida")
+    parser.add_argument("--checkpoint-cada", type=int, default=CHECKPOINT_CADA,
+                        help="Hogares entre puntos de control")
+    parser.add_argument("--bloque", type=int, default=TAMANO_BLOQUE, help="Hogares por bloque")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Exponer métricas Prometheus en este puerto local")
+    parser.add_argument("--memory-budget",
+                        help="Memoria máxima del proceso (p. ej. 512M); adapta el tamaño de bloque")
+    parser.add_argument("--territorio", action="store_true",
+                        help="Incluir la comuna de cada hogar en la salida")
+    parser.add_argument("--indice", action="store_true",
+                        help="Guardar el índice de proximidad a los umbrales junto a la salida")
+    args = parser.parse_args(argv)
+
+    control_memoria = None
+    if args.memory_budget is not None:
+        control_memoria = ControlMemoria(leer_tamano(args.memory_budget))
+
+    metricas = servidor = None
+    if args.metrics_port is not None:
+        metricas = MetricasCalculo()
+        servidor = ServidorMetricas(metricas.registro, args.metrics_port).iniciar()
+        print(f"Métricas en http://127.0.0.1:{servidor.puerto}/metrics", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    try:
+        estadisticas = ejecutar(args.entrada, args.salida, args.resume, args.bloque, args.checkpoint_cada,
+                                metricas=metricas, control_memoria=control_memoria, territorio=args.territorio,
+                                indice=args.indice)
+    finally:
+        if servidor is not None:
+            servidor.detener()
+    segundos = time.perf_counter() - t0
+    print(f"Hogares: {estadisticas['hogares']:,} en {segundos:.1f} s", file=sys.stderr)
+    for tramo, cantidad in sorted(estadisticas["por_tramo"].items(), key=lambda x: int(x[0])):
+        print(f"  Tramo {tramo}%: {cantidad:,}", file=sys.stderr)
+    if control_memoria is not None:
+        for linea in control_memoria.reporte():
+            print(linea, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
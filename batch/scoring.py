@@ -0,0 +1,92 @@
+"""
+Cálculo de la CSE para un hogar completo
+"""
+
+import time
+
+from calculator.income import calcular_ingreso_equivalente, determinar_tramo_por_ingreso
+from calculator.needs_index import calcular_indice_necesidades, calcular_ingreso_corregido
+from calculator.means_test import evaluar_test_medios
+
+# Columnas de un resultado, en el orden en que se escriben
+COLUMNAS_RESULTADO = (
+    "id", "n_integrantes", "ingreso_equivalente", "indice_necesidades",
+    "ingreso_corregido", "tramo_ingreso", "tramo_medios", "num_medios", "tramo_final",
+)
+
+# Pasos que puntuar_hogar mide cuando recibe tiempos
+PASOS = ("ingreso_equivalente", "indice_necesidades", "tramo_ingreso", "test_medios", "total")
+
+
+def puntuar_hogar(hogar, tiempos=None):
+    """
+    Ejecuta los pasos 1 a 5 de la metodología para un hogar.
+
+    Args:
+        hogar: Diccionario con "id", "integrantes" y "datos_medios"
+        tiempos: {paso: lista} para cada paso de PASOS, o None. Si se entrega,
+            se agrega la duración (segundos) de cada paso
+
+    Returns:
+        dict: Resultado con las claves de COLUMNAS_RESULTADO
+    """
+    medir = tiempos is not None
+    if medir:
+        t0 = time.perf_counter()
+    integrantes = hogar["integrantes"]
+    ingreso_equiv = calcular_ingreso_equivalente(integrantes)
+    if medir:
+        t1 = time.perf_counter()
+    indice_nec = calcular_indice_necesidades(integrantes)
+    if medir:
+        t2 = time.perf_counter()
+    ingreso_corregido = calcular_ingreso_corregido(ingreso_equiv, indice_nec)
+    tramo_ingreso = determinar_tramo_por_ingreso(ingreso_corregido)
+    if medir:
+        t3 = time.perf_counter()
+    tramo_medios, num_medios, _ = evaluar_test_medios(hogar.get("datos_medios", {}))
+    if medir:
+        t4 = time.perf_counter()
+        tiempos["ingreso_equivalente"].append(t1 - t0)
+        tiempos["indice_necesidades"].append(t2 - t1)
+        tiempos["tramo_ingreso"].append(t3 - t2)
+        tiempos["test_medios"].append(t4 - t3)
+        tiempos["total"].append(t4 - t0)
+
+    return {
+        "id": hogar["id"],
+        "n_integrantes": len(integrantes),
+        "ingreso_equivalente": ingreso_equiv,
+        "indice_necesidades": indice_nec,
+        "ingreso_corregido": ingreso_corregido,
+        "tramo_ingreso": tramo_ingreso,
+        "tramo_medios": tramo_medios,
+        "num_medios": num_medios,
+        "tramo_final": max(tramo_ingreso, tramo_medios),
+    }
+
+
+def emparejar_resultados(hogares, resultados=None):
+    """
+    Empareja cada hogar con su resultado.
+
+    Args:
+        hogares: Iterable de hogares
+        resultados: Iterable de resultados en el mismo orden (por ejemplo, la
+            salida de batch.score), o None para calcularlos con puntuar_hogar
+
+    Yields:
+        tuple: (hogar, resultado)
+    """
+    if resultados is None:
+        for hogar in hogares:
+            yield hogar, puntuar_hogar(hogar)
+        return
+    resultados = iter(resultados)
+    for hogar in hogares:
+        resultado = next(resultados, None)
+        if resultado is None or str(resultado["id"]) != str(hogar["id"]):
+            raise ValueError(f"Los resultados no están alineados con los hogares (hogar {hogar['id']})")
+        yield hogar, resultado
+    if next(resultados, None) is not None:
+        raise ValueError("Hay más resultados que hogares")
@@ -0,0 +1,319 @@
+"""
+Generador de poblaciones sintéticas de hogares
+
+Uso:
+    python -m batch.synthetic 1000000 --semilla 1 --formato jsonl --salida hogares.jsonl --procesos 4
+
+Los hogares se generan por bloques de TAMANO_BLOQUE con una semilla derivada
+de (semilla, número de bloque). Así el hogar i es siempre el mismo, sin
+importar cuántos procesos o fragmentos se usen para generarlo.
+
+Con --territorio cada hogar lleva además una comuna sintética (ver
+batch.territory), sorteada con un generador aparte para no alterar el resto
+de los datos del hogar.
+"""
+
+import argparse
+import array
+import collections
+import copy
+import csv
+import functools
+import itertools
+import json
+import math
+import random
+import sys
+from multiprocessing import Pool
+
+from calculator.coefficients import COEFICIENTES, obtener_rango_edad
+from batch.records import COLUMNAS_PERSONA, FLAGS_MEDIOS, hogar_a_filas
+from batch.territory import comunas_sinteticas
+
+TAMANO_BLOQUE = 1000
+
+SIN_DISCAPACIDAD = "Sin discapacidad, dependencia o NEE"
+
+# Distribuciones por defecto. Son aproximaciones plausibles para pruebas de
+# carga, no estimaciones oficiales.
+DISTRIBUCIONES_POR_DEFECTO = {
+    # Probabilidad de cada tamaño de hogar
+    "tamano_hogar": {1: 0.18, 2: 0.25, 3: 0.23, 4: 0.19, 5: 0.09, 6: 0.04, 7: 0.02},
+    # Peso de cada rango de edad para los integrantes distintos del jefe de hogar
+    "edad_integrantes": {"0-5": 0.14, "6-14": 0.18, "15-17": 0.06, "18-59": 0.44,
+                         "60-74": 0.12, "75+": 0.06},
+    # Edad del jefe de hogar (uniforme entre mínimo y máximo)
+    "edad_jefe": [18, 90],
+    # Probabilidad de discapacidad, dependencia o NEE por rango de edad
+    "discapacidad": {"0-5": 0.03, "6-14": 0.06, "15-17": 0.07, "18-59": 0.09,
+                     "60-74": 0.18, "75+": 0.35},
+    # Probabilidad de que una persona de 18-24 estudie
+    "estudia_18_24": 0.45,
+    # Ingresos log-normales: probabilidad de percibir, mu y sigma del logaritmo
+    "ingreso_trabajo": {"probabilidad": 0.62, "mu": 13.0, "sigma": 0.75, "edad_min": 18, "edad_max": 69},
+    "ingreso_pension": {"probabilidad": 0.85, "mu": 12.2, "sigma": 0.55, "edad_min": 60, "edad_max": 200},
+    "ingreso_capital": {"probabilidad": 0.05, "mu": 11.5, "sigma": 1.10, "edad_min": 18, "edad_max": 200},
+    # Prevalencia de cada flag del test de medios
+    "medios": {
+        "salud_alto_valor": 0.08,
+        "salud_muy_alto_valor": 0.02,
+        "educacion_alto_valor": 0.05,
+        "vehiculos_alto_valor": 0.10,
+        "vehiculos_muy_alto_valor": 0.02,
+        "nave_mayor": 0.001,
+        "tres_naves_menores": 0.002,
+        "bienes_raices_alto_valor": 0.08,
+        "bienes_raices_muy_alto_valor": 0.02,
+        "padre_madre_alto_valor": 0.02,
+        "padre_madre_muy_alto_valor": 0.01,
+    },
+}
+
+_LIMITES_RANGO = {"0-5": (0, 5), "6-14": (6, 14), "15-17": (15, 17), "18-59": (18, 59),
+                  "60-74": (60, 74), "75+": (75, 100)}
+
+
+def cargar_distribuciones(ruta=None):
+    """
+    Retorna las distribuciones por defecto, opcionalmente sobrescritas por un JSON.
+
+    Las claves del JSON reemplazan a las por defecto; los diccionarios anidados
+    se combinan clave a clave.
+    """
+    distribuciones = copy.deepcopy(DISTRIBUCIONES_POR_DEFECTO)
+    if ruta is None:
+        return distribuciones
+    with open(ruta, encoding="utf-8") as f:
+        propias = json.load(f)
+    for clave, valor in propias.items():
+        if clave not in distribuciones:
+            raise ValueError(f"Distribución desconocida: {clave}")
+        if isinstance(valor, dict) and isinstance(distribuciones[clave], dict):
+            if clave == "tamano_hogar":
+                valor = {int(k): v for k, v in valor.items()}
+            distribuciones[clave].update(valor)
+        else:
+            distribuciones[clave] = valor
+    return distribuciones
+
+
+class _Muestreador:
+    """Distribuciones preparadas para muestrear rápido con random.Random."""
+
+    def __init__(self, distribuciones):
+        self.d = distribuciones
+        tamanos = distribuciones["tamano_hogar"]
+        self.tamanos = list(tamanos)
+        self.pesos_tamano = list(itertools.accumulate(tamanos[k] for k in self.tamanos))
+        rangos = distribuciones["edad_integrantes"]
+        self.rangos = list(rangos)
+        self.pesos_rango = list(itertools.accumulate(rangos[k] for k in self.rangos))
+        # Condiciones válidas por rango según la Tabla N°1
+        self.condiciones = {
+            rango: [c for c in COEFICIENTES[rango] if c != SIN_DISCAPACIDAD]
+            for rango in COEFICIENTES
+        }
+
+    def _ingreso(self, rng, fuente, edad):
+        p = self.d[fuente]
+        if not p["edad_min"] <= edad <= p["edad_max"] or rng.random() >= p["probabilidad"]:
+            return 0
+        return int(round(math.exp(rng.gauss(p["mu"], p["sigma"]))))
+
+    def integrante(self, rng, numero, jefe):
+        if jefe:
+            edad = rng.randint(*self.d["edad_jefe"])
+        else:
+            rango = rng.choices(self.rangos, cum_weights=self.pesos_rango)[0]
+            edad = rng.randint(*_LIMITES_RANGO[rango])
+        rango = obtener_rango_edad(edad)
+        if rng.random() < self.d["discapacidad"].get(rango, 0.0):
+            condicion = rng.choice(self.condiciones[rango])
+        else:
+            condicion = SIN_DISCAPACIDAD
+        return {
+            "nombre": f"Integrante {numero}",
+            "edad": edad,
+            "condicion": condicion,
+            "estudia": 18 <= edad <= 24 and rng.random() < self.d["estudia_18_24"],
+            "ingreso_trabajo": self._ingreso(rng, "ingreso_trabajo", edad),
+            "ingreso_pension": self._ingreso(rng, "ingreso_pension", edad),
+            "ingreso_capital": self._ingreso(rng, "ingreso_capital", edad),
+        }
+
+    def hogar(self, rng, indice):
+        n = rng.choices(self.tamanos, cum_weights=self.pesos_tamano)[0]
+        integrantes = [self.integrante(rng, i + 1, i == 0) for i in range(n)]
+        medios = self.d["medios"]
+        datos_medios = {flag: rng.random() < medios.get(flag, 0.0) for flag in FLAGS_MEDIOS}
+        return {"id": f"H{indice:010d}", "integrantes": integrantes, "datos_medios": datos_medios}
+
+
+def _generar_bloque(args):
+    """Genera los hogares de un bloque (función de nivel superior para multiprocessing)."""
+    bloque, semilla, distribuciones, desde, hasta, territorio = args
+    rng = random.Random(f"{semilla}:{bloque}")
+    muestreador = _Muestreador(distribuciones)
+    if territorio:
+        rng_territorio = random.Random(f"{semilla}:{bloque}:territorio")
+        comunas, pesos_comuna = comunas_sinteticas()
+    inicio = bloque * TAMANO_BLOQUE
+    hogares = []
+    for indice in range(inicio, hasta):
+        hogar = muestreador.hogar(rng, indice)
+        if territorio:
+            hogar["comuna"] = rng_territorio.choices(comunas, cum_weights=pesos_comuna)[0]
+        if indice >= desde:
+            hogares.append(hogar)
+    return hogares
+
+
+def generar_hogares(n, semilla=0, distribuciones=None, inicio=0, procesos=1, territorio=False):
+    """
+    Genera n hogares sintéticos a partir del índice inicio.
+
+    Args:
+        n: Número de hogares a generar
+        semilla: Semilla base
+        distribuciones: Diccionario como DISTRIBUCIONES_POR_DEFECTO
+        inicio: Índice del primer hogar (para generar fragmentos)
+        procesos: Procesos en paralelo
+        territorio: Agregar una comuna sintética a cada hogar
+
+    Yields:
+        dict: Hogar con id, integrantes y datos_medios (y comuna)
+    """
+    if distribuciones is None:
+        distribuciones = DISTRIBUCIONES_POR_DEFECTO
+    fin = inicio + n
+
+    def tareas():
+        for bloque in range(inicio // TAMANO_BLOQUE, (fin - 1) // TAMANO_BLOQUE + 1 if n else 0):
+            hasta = min(fin, (bloque + 1) * TAMANO_BLOQUE)
+            yield bloque, semilla, distribuciones, inicio, hasta, territorio
+
+    if procesos <= 1:
+        for args in tareas():
+            yield from _generar_bloque(args)
+        return
+
+    with Pool(procesos) as pool:
+        pendientes = collections.deque()
+        for args in tareas():
+            pendientes.append(pool.apply_async(_generar_bloque, (args,)))
+            if len(pendientes) >= 2 * procesos:
+                yield from pendientes.popleft().get()
+        while pendientes:
+            yield from pendientes.popleft().get()
+
+
+def generar_fragmento(n_total, fragmento, n_fragmentos, semilla=0, distribuciones=None, procesos=1,
+                      territorio=False):
+    """Genera el fragmento número fragmento (desde 0) de n_fragmentos de una población de n_total."""
+    desde = n_total * fragmento // n_fragmentos
+    hasta = n_total * (fragmento + 1) // n_fragmentos
+    return generar_hogares(hasta - desde, semilla, distribuciones, inicio=desde, procesos=procesos,
+                           territorio=territorio)
+
+
+def a_arreglos(hogares):
+    """
+    Convierte hogares en columnas a nivel de persona (array.array).
+
+    Returns:
+        dict: Columnas hogar (índice del hogar en la entrada), edad, condicion
+              (índice en la lista "condiciones"), estudia, ingresos y un arreglo
+              por flag del test de medios a nivel de hogar; además "ids" y
+              "condiciones" como listas.
+    """
+    columnas = {
+        "hogar": array.array("l"),
+        "edad": array.array("h"),
+        "condicion": array.array("b"),
+        "estudia": array.array("b"),
+        "ingreso_trabajo": array.array("d"),
+        "ingreso_pension": array.array("d"),
+        "ingreso_capital": array.array("d"),
+    }
+    medios = {flag: array.array("b") for flag in FLAGS_MEDIOS}
+    ids = []
+    condiciones = []
+    codigo_condicion = {}
+    for h, hogar in enumerate(hogares):
+        ids.append(hogar["id"])
+        for flag in FLAGS_MEDIOS:
+            medios[flag].append(bool(hogar["datos_medios"].get(flag, False)))
+        for integ in hogar["integrantes"]:
+            cond = integ["condicion"]
+            if cond not in codigo_condicion:
+                codigo_condicion[cond] = len(condiciones)
+                condiciones.append(cond)
+            columnas["hogar"].append(h)
+            columnas["edad"].append(integ["edad"])
+            columnas["condicion"].append(codigo_condicion[cond])
+            columnas["estudia"].append(bool(integ.get("estudia", False)))
+            columnas["ingreso_trabajo"].append(integ["ingreso_trabajo"])
+            columnas["ingreso_pension"].append(integ["ingreso_pension"])
+            columnas["ingreso_capital"].append(integ["ingreso_capital"])
+    columnas.update(medios)
+    columnas["ids"] = ids
+    columnas["condiciones"] = condiciones
+    return columnas
+
+
+def escribir_jsonl(hogares, salida):
+    """Escribe hogares en JSONL. Retorna el número de hogares escritos."""
+    n = 0
+    for hogar in hogares:
+        salida.write(json.dumps(hogar, ensure_ascii=False))
+        salida.write("\n")
+        n += 1
+    return n
+
+
+def escribir_csv(hogares, salida, columnas_hogar=()):
+    """
+    Escribe hogares como filas de persona en CSV. Retorna el número de hogares escritos.
+
+    Args:
+        columnas_hogar: Columnas adicionales a nivel de hogar (p. ej. ("comuna",))
+    """
+    escritor = csv.writer(salida)
+    escritor.writerow(COLUMNAS_PERSONA + tuple(columnas_hogar))
+    n = 0
+    for hogar in hogares:
+        escritor.writerows(hogar_a_filas(hogar, columnas_hogar))
+        n += 1
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera hogares sintéticos para pruebas de carga.")
+    parser.add_argument("n", type=int, help="Número de hogares")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--formato", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--salida", help="Archivo de salida (por defecto, salida estándar)")
+    parser.add_argument("--distribuciones", help="JSON con distribuciones que reemplazan las por defecto")
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument("--fragmento", help="Generar solo el fragmento k/N (k desde 0), p. ej. 2/8")
+    parser.add_argument("--territorio", action="store_true", help="Agregar una comuna sintética a cada hogar")
+    args = parser.parse_args(argv)
+
+    distribuciones = cargar_distribuciones(args.distribuciones)
+    fragmento, n_fragmentos = (int(x) for x in args.fragmento.split("/")) if args.fragmento else (0, 1)
+    hogares = generar_fragmento(args.n, fragmento, n_fragmentos, args.semilla, distribuciones, args.procesos,
+                                args.territorio)
+
+    if args.formato == "jsonl":
+        escribir = escribir_jsonl
+    else:
+        escribir = functools.partial(escribir_csv, columnas_hogar=("comuna",) if args.territorio else ())
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8", newline="") as salida:
+            escribir(hogares, salida)
+    else:
+        escribir(hogares, sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Agregación territorial de resultados de la CSE por región y comuna
+
+Uso:
+    python -m batch.score hogares.jsonl resultados.jsonl --territorio
+    python -m batch.territory resultados.jsonl --salida resumen.csv --procesos 8
+
+El archivo de resultados debe tener la columna comuna (código de 5 dígitos
+cuyos 2 primeros son la región). Cada proceso agrega una parte del archivo
+(rangos de líneas en CSV/JSONL, rangos de bloques en columnar) por comuna:
+hogares por tramo, suma de ingreso corregido, activaciones del test de
+medios y un sketch KLL del ingreso corregido. Los agregados parciales se
+combinan y a partir de las comunas se obtienen las regiones y el país. Los
+archivos comprimidos se leen en un solo proceso.
+
+La salida tiene una fila por nivel (pais, region, comuna), en el formato que
+indique su extensión (ver batch.writers).
+"""
+
+import argparse
+import bisect
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from constants import TRAMO_DESCRIPCIONES
+from batch.quantiles import SketchKLL
+from batch.records import leer_rango, rangos_lineas
+from batch.writers import crear_escritor, detectar_formato, indice_columnar, leer_bloques_columnar, leer_resultados
+
+# (código, nombre, fracción aproximada de la población, número de comunas)
+REGIONES = (
+    ("01", "Tarapacá", 0.020, 7),
+    ("02", "Antofagasta", 0.035, 9),
+    ("03", "Atacama", 0.016, 9),
+    ("04", "Coquimbo", 0.043, 15),
+    ("05", "Valparaíso", 0.103, 38),
+    ("06", "O'Higgins", 0.052, 33),
+    ("07", "Maule", 0.059, 30),
+    ("08", "Biobío", 0.085, 33),
+    ("09", "La Araucanía", 0.052, 32),
+    ("10", "Los Lagos", 0.048, 30),
+    ("11", "Aysén", 0.005, 10),
+    ("12", "Magallanes", 0.009, 11),
+    ("13", "Metropolitana", 0.405, 52),
+    ("14", "Los Ríos", 0.021, 12),
+    ("15", "Arica y Parinacota", 0.013, 4),
+    ("16", "Ñuble", 0.026, 21),
+)
+NOMBRES_REGION = {codigo: nombre for codigo, nombre, _, _ in REGIONES}
+
+TRAMOS = tuple(sorted(TRAMO_DESCRIPCIONES))
+CUANTILES = (0.25, 0.50, 0.75, 0.90)
+
+COLUMNAS_RESUMEN = (
+    ("nivel", "region", "nombre_region", "comuna", "hogares")
+    + tuple(f"tramo_{t}" for t in TRAMOS)
+    + ("ingreso_corregido_promedio",)
+    + tuple(f"ingreso_corregido_p{int(q * 100)}" for q in CUANTILES)
+    + ("tasa_activacion_medios",)
+)
+TIPOS_RESUMEN = dict(
+    {c: "q" for c in COLUMNAS_RESUMEN if c == "hogares" or c.startswith("tramo_")},
+    nivel="s", region="s", nombre_region="s", comuna="s",
+)
+
+_COLUMNAS_USADAS = ("comuna", "ingreso_corregido", "tramo_ingreso", "tramo_medios", "tramo_final")
+
+
+def region_de_comuna(comuna):
+    """Código de región de un código de comuna."""
+    return comuna[:2]
+
+
+def comunas_sinteticas():
+    """
+    Códigos de comuna sintéticos (región + número correlativo, no son códigos
+    oficiales) con pesos acumulados: cada región según su población y, dentro
+    de ella, pesos 1/k para que unas pocas comunas concentren más hogares.
+
+    Returns:
+        tuple: (lista de códigos, lista de pesos acumulados)
+    """
+    codigos, pesos = [], []
+    for region, _, participacion, n_comunas in REGIONES:
+        armonico = sum(1 / k for k in range(1, n_comunas + 1))
+        for k in range(1, n_comunas + 1):
+            codigos.append(f"{region}{k:03d}")
+            pesos.append(participacion / (k * armonico))
+    return codigos, list(itertools.accumulate(pesos))
+
+
+class AgregadoTerritorial:
+    """Agregado combinable de los resultados de un territorio."""
+
+    __slots__ = ("hogares", "por_tramo", "suma_ingreso_corregido", "activaciones", "sketch")
+
+    def __init__(self, k=200, semilla=0):
+        self.hogares = 0
+        self.por_tramo = {}
+        self.suma_ingreso_corregido = 0.0
+        self.activaciones = 0
+        self.sketch = SketchKLL(k, semilla)
+
+    def agregar(self, ingreso_corregido, tramo_ingreso, tramo_medios, tramo_final):
+        self.hogares += 1
+        self.por_tramo[tramo_final] = self.por_tramo.get(tramo_final, 0) + 1
+        self.suma_ingreso_corregido += ingreso_corregido
+        if tramo_medios > tramo_ingreso:
+            self.activaciones += 1
+        self.sketch.agregar(ingreso_corregido)
+
+    def combinar(self, otro):
+        """Agrega otro agregado a este."""
+        self.hogares += otro.hogares
+        for tramo, n in otro.por_tramo.items():
+            self.por_tramo[tramo] = self.por_tramo.get(tramo, 0) + n
+        self.suma_ingreso_corregido += otro.suma_ingreso_corregido
+        self.activaciones += otro.activaciones
+        self.sketch.combinar(otro.sketch)
+        return self
+
+
+class _Agregador:
+    """Agregados por comuna de una parte del archivo."""
+
+    def __init__(self, k, semilla):
+        self.k = k
+        self.semilla = semilla
+        self.por_comuna = {}
+
+    def agregar(self, comuna, ingreso_corregido, tramo_ingreso, tramo_medios, tramo_final):
+        agregado = self.por_comuna.get(comuna)
+        if agregado is None:
+            agregado = self.por_comuna[comuna] = AgregadoTerritorial(self.k, f"{self.semilla}:{comuna}")
+        agregado.agregar(ingreso_corregido, tramo_ingreso, tramo_medios, tramo_final)
+
+
+def _agregar_parte(args):
+    """Agrega una parte del archivo (función de nivel superior para multiprocessing)."""
+    ruta, formato, encabezado, desde, hasta, k, semilla = args
+    agregador = _Agregador(k, semilla)
+    agregar = agregador.agregar
+
+    if formato == "columnar":
+        for bloque in leer_bloques_columnar(ruta, desde, hasta):
+            for fila in zip(*(bloque[c] for c in _COLUMNAS_USADAS)):
+                agregar(*fila)
+        return agregador.por_comuna
+
+    if formato == "jsonl":
+        for texto in leer_rango(ruta, desde, hasta):
+            for linea in texto.splitlines():
+                if linea.strip():
+                    r = json.loads(linea)
+                    agregar(r["comuna"], r["ingreso_corregido"], r["tramo_ingreso"], r["tramo_medios"],
+                            r["tramo_final"])
+    else:
+        nombres = next(csv.reader([encabezado]))
+        i_comuna, i_ingreso, i_tramo_ing, i_tramo_med, i_tramo_fin = (nombres.index(c) for c in _COLUMNAS_USADAS)
+        for texto in leer_rango(ruta, desde, hasta):
+            for fila in csv.reader(io.StringIO(texto)):
+                if fila:
+                    agregar(fila[i_comuna], float(fila[i_ingreso]), int(fila[i_tramo_ing]),
+                            int(fila[i_tramo_med]), int(fila[i_tramo_fin]))
+    return agregador.por_comuna
+
+
+def _partes(ruta, procesos, k, semilla):
+    formato, compresion = detectar_formato(ruta)
+    if formato == "columnar":
+        bloques = [pos for pos, _ in indice_columnar(ruta)]
+        if not bloques:
+            return []
+        fin = os.path.getsize(ruta)
+        cortes = [bloques[len(bloques) * i // procesos] for i in range(procesos)] + [fin]
+        rangos = [(a, b) for a, b in zip(cortes[:-1], cortes[1:]) if a < b]
+        encabezado = ""
+    else:
+        encabezado, rangos = rangos_lineas(ruta, procesos, con_encabezado=formato == "csv")
+    return [(ruta, formato, encabezado, desde, hasta, k, f"{semilla}:{i}")
+            for i, (desde, hasta) in enumerate(rangos)]
+
+
+def agregar_resultados(ruta, procesos=1, k=200, semilla=0):
+    """
+    Agrega un archivo de resultados por comuna.
+
+    Returns:
+        dict: {comuna: AgregadoTerritorial}
+    """
+    _, compresion = detectar_formato(ruta)
+    if compresion is not None:
+        agregador = _Agregador(k, semilla)
+        for r in leer_resultados(ruta):
+            agregador.agregar(*(r[c] for c in _COLUMNAS_USADAS))
+        return agregador.por_comuna
+
+    tareas = _partes(ruta, max(1, procesos), k, semilla)
+    if procesos <= 1:
+        parciales = [_agregar_parte(t) for t in tareas]
+    else:
+        with Pool(procesos) as pool:
+            parciales = pool.map(_agregar_parte, tareas)
+
+    total = {}
+    for parcial in parciales:
+        for comuna, agregado in parcial.items():
+            if comuna in total:
+                total[comuna].combinar(agregado)
+            else:
+                total[comuna] = agregado
+    return total
+
+
+def _fila(nivel, region, comuna, agregado):
+    fila = {
+        "nivel": nivel,
+        "region": region,
+        "nombre_region": NOMBRES_REGION.get(region, ""),
+        "comuna": comuna,
+        "hogares": agregado.hogares,
+    }
+    for t in TRAMOS:
+        fila[f"tramo_{t}"] = agregado.por_tramo.get(t, 0)
+    n = agregado.hogares or 1
+    fila["ingreso_corregido_promedio"] = agregado.suma_ingreso_corregido / n
+    for q in CUANTILES:
+        fila[f"ingreso_corregido_p{int(q * 100)}"] = agregado.sketch.cuantil(q) if agregado.hogares else 0.0
+    fila["tasa_activacion_medios"] = agregado.activaciones / n
+    return fila
+
+
+def resumir(por_comuna, k=200, semilla=0):
+    """
+    Combina las comunas en regiones y país.
+
+    Returns:
+        list: Filas (dict con COLUMNAS_RESUMEN): país, luego cada región seguida de sus comunas
+    """
+    regiones = {}
+    pais = AgregadoTerritorial(k, f"{semilla}:pais")
+    for comuna in sorted(por_comuna):
+        region = region_de_comuna(comuna)
+        if region not in regiones:
+            regiones[region] = AgregadoTerritorial(k, f"{semilla}:{region}")
+        regiones[region].combinar(por_comuna[comuna])
+        pais.combinar(por_comuna[comuna])
+
+    filas = [_fila("pais", "", "", pais)]
+    comunas = sorted(por_comuna)
+    for region in sorted(regiones):
+        filas.append(_fila("region", region, "", regiones[region]))
+        inicio = bisect.bisect_left(comunas, region)
+        for comuna in comunas[inicio:]:
+            if region_de_comuna(comuna) != region:
+                break
+            filas.append(_fila("comuna", region, comuna, por_comuna[comuna]))
+    return filas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Agrega resultados de la CSE por región y comuna.")
+    parser.add_argument("resultados", help="Resultados con columna comuna (.csv, .jsonl o .col)")
+    parser.add_argument("--salida", required=True, help="Resumen (.csv, .jsonl o .col, con .gz opcional)")
+    parser.add_argument("--procesos", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--k", type=int, default=200, help="Precisión del sketch KLL")
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    por_comuna = agregar_resultados(args.resultados, args.procesos, args.k, args.semilla)
+    filas = resumir(por_comuna, args.k, args.semilla)
+    with crear_escritor(args.salida, COLUMNAS_RESUMEN, tipos=TIPOS_RESUMEN) as escritor:
+        escritor.escribir_muchos(filas)
+    print(f"Hogares: {filas[0]['hogares']:,} | Comunas: {len(por_comuna):,} | "
+          f"{time.perf_counter() - t0:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
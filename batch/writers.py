@@ -0,0 +1,372 @@
+"""
+Escritores y lectores de resultados: CSV, JSONL y columnar binario
+
+Los escritores acumulan resultados y los formatean por bloques (columna por
+columna), escriben con un buffer grande, pueden comprimir con gzip y
+finalizan de forma atómica: se escribe en <ruta>.part y al terminar se
+renombra a <ruta>.
+
+El formato se deduce de la extensión: .csv, .jsonl o .col (columnar), con
+.gz opcional para compresión.
+
+Formato columnar (.col):
+    b"CSECOL1\\n", uint32 largo + JSON {"columnas": [[nombre, tipo], ...]}
+    y luego bloques: b"B", uint32 filas y por columna uint32 bytes + datos.
+    Tipo "q" = int64, "d" = float64, "s" = uint32 largos + UTF-8.
+    Todo en little-endian.
+"""
+
+import array
+import csv
+import gzip
+import io
+import json
+import math
+import os
+import struct
+import sys
+
+from batch.scoring import COLUMNAS_RESULTADO
+
+TAMANO_BUFFER = 1 << 20
+FILAS_POR_BLOQUE = 10000
+
+# Tipos de las columnas de resultado en el formato columnar y al leer CSV
+TIPOS_RESULTADO = {
+    "id": "s",
+    "n_integrantes": "q",
+    "ingreso_equivalente": "d",
+    "indice_necesidades": "d",
+    "ingreso_corregido": "d",
+    "tramo_ingreso": "q",
+    "tramo_medios": "q",
+    "num_medios": "q",
+    "tramo_final": "q",
+    "comuna": "s",
+}
+
+MAGIA_COLUMNAR = b"CSECOL1\n"
+
+_ES_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def detectar_formato(ruta):
+    """Retorna (formato, compresion) según la extensión de la ruta."""
+    base, compresion = (ruta[:-3], "gzip") if ruta.endswith(".gz") else (ruta, None)
+    extension = os.path.splitext(base)[1].lower()
+    formatos = {".csv": "csv", ".jsonl": "jsonl", ".col": "columnar"}
+    if extension not in formatos:
+        raise ValueError(f"Extensión de resultados no reconocida: {ruta}")
+    return formatos[extension], compresion
+
+
+def _txt_numero(v):
+    if type(v) is float:
+        if math.isfinite(v):
+            return repr(v)
+        return json.dumps(v)
+    return str(int(v)) if isinstance(v, bool) else repr(v)
+
+
+class EscritorResultados:
+    """Base de los escritores: buffer, compresión, puntos de control y finalización atómica."""
+
+    def __init__(self, ruta, columnas=COLUMNAS_RESULTADO, compresion=None,
+                 filas_por_bloque=FILAS_POR_BLOQUE, reanudar_en=None, tamano_buffer=TAMANO_BUFFER,
+                 tipos=None):
+        self.ruta = ruta
+        self.ruta_temporal = ruta + ".part"
+        self.columnas = tuple(columnas)
+        self.tipos = dict(TIPOS_RESULTADO, **(tipos or {}))
+        self.compresion = compresion
+        self.filas_por_bloque = filas_por_bloque
+        self.filas = 0
+        self._pendientes = []
+        if reanudar_en is None:
+            self._archivo = open(self.ruta_temporal, "wb", buffering=tamano_buffer)
+        else:
+            self._archivo = open(self.ruta_temporal, "r+b", buffering=tamano_buffer)
+            self._archivo.seek(reanudar_en)
+            self._archivo.truncate()
+        self._abrir_flujo()
+        if reanudar_en is None:
+            self._flujo.write(self._encabezado())
+
+    def _abrir_flujo(self):
+        if self.compresion == "gzip":
+            # Sin nombre ni fecha en el encabezado para que la salida sea reproducible
+            self._flujo = gzip.GzipFile(filename="", fileobj=self._archivo, mode="wb",
+                                        compresslevel=6, mtime=0)
+        elif self.compresion is None:
+            self._flujo = self._archivo
+        else:
+            raise ValueError(f"Compresión no soportada: {self.compresion}")
+
+    def _cerrar_flujo(self):
+        # Cerrar un GzipFile termina el miembro gzip sin cerrar el archivo subyacente
+        if self._flujo is not self._archivo:
+            self._flujo.close()
+
+    def _encabezado(self):
+        return b""
+
+    def _formatear_bloque(self, resultados):
+        raise NotImplementedError
+
+    def _columnas_de(self, resultados):
+        return [[r[c] for r in resultados] for c in self.columnas]
+
+    def escribir(self, resultado):
+        self._pendientes.append(resultado)
+        if len(self._pendientes) >= self.filas_por_bloque:
+            self.volcar()
+
+    def escribir_muchos(self, resultados):
+        for resultado in resultados:
+            self.escribir(resultado)
+
+    def volcar(self):
+        """Formatea y escribe los resultados pendientes."""
+        if self._pendientes:
+            self._flujo.write(self._formatear_bloque(self._pendientes))
+            self.filas += len(self._pendientes)
+            self._pendientes = []
+
+    def punto_control(self):
+        """
+        Deja en disco todo lo escrito y retorna la posición desde la que se
+        puede reanudar con reanudar_en.
+        """
+        self.volcar()
+        self._cerrar_flujo()
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        posicion = self._archivo.tell()
+        self._abrir_flujo()
+        return posicion
+
+    def finalizar(self):
+        """Escribe lo pendiente y renombra el archivo temporal a la ruta final."""
+        self.volcar()
+        self._cerrar_flujo()
+        self._archivo.flush()
+        os.fsync(self._archivo.fileno())
+        self._archivo.close()
+        os.replace(self.ruta_temporal, self.ruta)
+
+    def cerrar(self):
+        """Cierra el archivo temporal sin renombrarlo, para reanudar desde el último punto de control."""
+        self._archivo.close()
+
+    def abortar(self):
+        """Descarta el archivo temporal."""
+        self._archivo.close()
+        if os.path.exists(self.ruta_temporal):
+            os.remove(self.ruta_temporal)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo_exc, exc, tb):
+        if tipo_exc is None:
+            self.finalizar()
+        else:
+            self.abortar()
+        return False
+
+
+class EscritorCSV(EscritorResultados):
+    """Resultados en CSV con encabezado."""
+
+    def _encabezado(self):
+        return (",".join(self.columnas) + "\n").encode("utf-8")
+
+    def _formatear_bloque(self, resultados):
+        columnas_txt = []
+        for nombre, valores in zip(self.columnas, self._columnas_de(resultados)):
+            if self.tipos.get(nombre) == "s":
+                columnas_txt.append([_txt_csv(v) for v in valores])
+            else:
+                columnas_txt.append(list(map(_txt_numero, valores)))
+        lineas = map(",".join, zip(*columnas_txt))
+        return ("\n".join(lineas) + "\n").encode("utf-8")
+
+
+def _txt_csv(v):
+    v = str(v)
+    if any(c in v for c in ',"\n\r'):
+        return '"' + v.replace('"', '""') + '"'
+    return v
+
+
+class EscritorJSONL(EscritorResultados):
+    """Resultados en JSONL, un objeto por línea con las claves en el orden de las columnas."""
+
+    def _formatear_bloque(self, resultados):
+        columnas_txt = []
+        for nombre, valores in zip(self.columnas, self._columnas_de(resultados)):
+            clave = json.dumps(nombre) + ": "
+            if self.tipos.get(nombre) == "s":
+                columnas_txt.append([clave + json.dumps(v, ensure_ascii=False) for v in valores])
+            else:
+                columnas_txt.append([clave + _txt_numero(v) for v in valores])
+        lineas = ("{" + ", ".join(campos) + "}" for campos in zip(*columnas_txt))
+        return ("\n".join(lineas) + "\n").encode("utf-8")
+
+
+def _a_bytes(arreglo):
+    if _ES_BIG_ENDIAN:
+        arreglo.byteswap()
+    return arreglo.tobytes()
+
+
+class EscritorColumnar(EscritorResultados):
+    """Resultados en el formato columnar binario descrito en el módulo."""
+
+    def _encabezado(self):
+        esquema = json.dumps({"columnas": [[c, self.tipos.get(c, "d")] for c in self.columnas]})
+        esquema = esquema.encode("utf-8")
+        return MAGIA_COLUMNAR + struct.pack("<I", len(esquema)) + esquema
+
+    def _formatear_bloque(self, resultados):
+        partes = [b"B", struct.pack("<I", len(resultados))]
+        for nombre, valores in zip(self.columnas, self._columnas_de(resultados)):
+            tipo = self.tipos.get(nombre, "d")
+            if tipo == "s":
+                codificados = [str(v).encode("utf-8") for v in valores]
+                datos = _a_bytes(array.array("I", map(len, codificados))) + b"".join(codificados)
+            else:
+                datos = _a_bytes(array.array(tipo, valores))
+            partes.append(struct.pack("<I", len(datos)))
+            partes.append(datos)
+        return b"".join(partes)
+
+
+ESCRITORES = {"csv": EscritorCSV, "jsonl": EscritorJSONL, "columnar": EscritorColumnar}
+
+
+def crear_escritor(ruta, columnas=COLUMNAS_RESULTADO, **opciones):
+    """Crea el escritor que corresponde a la extensión de la ruta."""
+    formato, compresion = detectar_formato(ruta)
+    return ESCRITORES[formato](ruta, columnas, compresion=compresion, **opciones)
+
+
+def _abrir_lectura(ruta, compresion):
+    if compresion == "gzip":
+        return gzip.open(ruta, "rb")
+    return open(ruta, "rb", buffering=TAMANO_BUFFER)
+
+
+def _leer_exacto(f, n):
+    datos = f.read(n)
+    if len(datos) != n:
+        raise ValueError("Archivo columnar truncado")
+    return datos
+
+
+def _leer_esquema(f, ruta):
+    if f.read(len(MAGIA_COLUMNAR)) != MAGIA_COLUMNAR:
+        raise ValueError(f"No es un archivo columnar: {ruta}")
+    (largo,) = struct.unpack("<I", _leer_exacto(f, 4))
+    return json.loads(_leer_exacto(f, largo))["columnas"]
+
+
+def _leer_columna(datos, tipo, filas):
+    if tipo == "s":
+        largos = array.array("I")
+        largos.frombytes(datos[:4 * filas])
+        if _ES_BIG_ENDIAN:
+            largos.byteswap()
+        valores = []
+        pos = 4 * filas
+        for n in largos:
+            valores.append(datos[pos:pos + n].decode("utf-8"))
+            pos += n
+        return valores
+    valores = array.array(tipo)
+    valores.frombytes(datos)
+    if _ES_BIG_ENDIAN:
+        valores.byteswap()
+    return valores.tolist()
+
+
+def indice_columnar(ruta):
+    """
+    Posiciones de los bloques de un archivo columnar sin comprimir, leyendo
+    solo los encabezados de bloque.
+
+    Returns:
+        list: (posición en bytes, filas) de cada bloque
+    """
+    bloques = []
+    with open(ruta, "rb") as f:
+        columnas = _leer_esquema(f, ruta)
+        while True:
+            posicion = f.tell()
+            if not f.read(1):
+                return bloques
+            (filas,) = struct.unpack("<I", _leer_exacto(f, 4))
+            for _ in columnas:
+                (n_bytes,) = struct.unpack("<I", _leer_exacto(f, 4))
+                f.seek(n_bytes, os.SEEK_CUR)
+            bloques.append((posicion, filas))
+
+
+def leer_bloques_columnar(ruta, desde=None, hasta=None):
+    """
+    Lee un archivo columnar por bloques.
+
+    Args:
+        desde, hasta: Rango de posiciones de bloque (ver indice_columnar); solo
+            para archivos sin comprimir
+
+    Yields:
+        dict: {columna: lista de valores} por bloque
+    """
+    _, compresion = detectar_formato(ruta)
+    with _abrir_lectura(ruta, compresion) as f:
+        columnas = _leer_esquema(f, ruta)
+        if desde is not None:
+            f.seek(desde)
+        while hasta is None or f.tell() < hasta:
+            marca = f.read(1)
+            if not marca:
+                return
+            (filas,) = struct.unpack("<I", _leer_exacto(f, 4))
+            bloque = {}
+            for nombre, tipo in columnas:
+                (n_bytes,) = struct.unpack("<I", _leer_exacto(f, 4))
+                bloque[nombre] = _leer_columna(_leer_exacto(f, n_bytes), tipo, filas)
+            yield bloque
+
+
+def leer_resultados(ruta):
+    """
+    Lee resultados de un archivo CSV, JSONL o columnar (con o sin .gz).
+
+    Yields:
+        dict: Un resultado por hogar
+    """
+    formato, compresion = detectar_formato(ruta)
+    if formato == "columnar":
+        for bloque in leer_bloques_columnar(ruta):
+            nombres = list(bloque)
+            for valores in zip(*(bloque[n] for n in nombres)):
+                yield dict(zip(nombres, valores))
+        return
+
+    with _abrir_lectura(ruta, compresion) as binario:
+        texto = io.TextIOWrapper(binario, encoding="utf-8", newline="")
+        if formato == "jsonl":
+            for linea in texto:
+                if linea.strip():
+                    yield json.loads(linea)
+        else:
+            for fila in csv.DictReader(texto):
+                for nombre, valor in fila.items():
+                    tipo = TIPOS_RESULTADO.get(nombre)
+                    if tipo == "q":
+                        fila[nombre] = int(valor)
+                    elif tipo == "d":
+                        fila[nombre] = float(valor)
+                yield fila
@@ -0,0 +1,95 @@
+"""
+Escalamiento de CSEEngine con hilos
+
+Uso:
+    python -m benchmarks.engine_scaling
+    python -m benchmarks.engine_scaling --hogares 200000 --hilos 1 2 4 8 --eficiencia-minima 0.6
+
+Un mismo CSEEngine se comparte entre N hilos, cada uno con una parte de
+los hogares. Se verifica que los resultados sean idénticos a los de un
+solo hilo y se reporta el rendimiento y la eficiencia de escalamiento.
+Con el GIL activo no se espera escalamiento; en un CPython sin GIL
+(free-threaded, 3.13t o posterior) --eficiencia-minima hace que el script
+termine con código 1 si la eficiencia cae bajo el mínimo.
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+from calculator.engine import CSEEngine
+from batch.synthetic import generar_hogares
+
+
+def gil_activo():
+    """Indica si el intérprete corre con el GIL activo."""
+    verificar = getattr(sys, "_is_gil_enabled", None)
+    return True if verificar is None else verificar()
+
+
+def medir(motor, hogares, hilos):
+    """
+    Calcula todos los hogares repartidos en hilos.
+
+    Returns:
+        tuple: (segundos, resultados en el orden de la entrada)
+    """
+    partes = [hogares[i::hilos] for i in range(hilos)]
+    salidas = [None] * hilos
+    barrera = threading.Barrier(hilos + 1)
+
+    def trabajar(i):
+        barrera.wait()
+        salidas[i] = list(motor.score_many(partes[i]))
+
+    trabajadores = [threading.Thread(target=trabajar, args=(i,)) for i in range(hilos)]
+    for t in trabajadores:
+        t.start()
+    barrera.wait()
+    t0 = time.perf_counter()
+    for t in trabajadores:
+        t.join()
+    segundos = time.perf_counter() - t0
+
+    resultados = [None] * len(hogares)
+    for i, salida in enumerate(salidas):
+        resultados[i::hilos] = salida
+    return segundos, resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el escalamiento de CSEEngine con hilos.")
+    parser.add_argument("--hogares", type=int, default=100000)
+    parser.add_argument("--hilos", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--eficiencia-minima", type=float,
+                        help="Eficiencia mínima exigida sin GIL (rendimiento / (hilos * rendimiento con 1 hilo))")
+    args = parser.parse_args(argv)
+
+    motor = CSEEngine()
+    hogares = list(generar_hogares(args.hogares, semilla=args.semilla))
+    print(f"{motor} | {args.hogares:,} hogares | GIL {'activo' if gil_activo() else 'inactivo'}")
+
+    medir(motor, hogares, 1)  # calentamiento
+    segundos_base, referencia = medir(motor, hogares, 1)
+    rendimiento_base = args.hogares / segundos_base
+    fallas = []
+    for hilos in args.hilos:
+        segundos, resultados = medir(motor, hogares, hilos)
+        rendimiento = args.hogares / segundos
+        eficiencia = rendimiento / (hilos * rendimiento_base)
+        print(f"  {hilos:>3} hilos: {rendimiento:>12,.0f} hogares/s | "
+              f"aceleración {rendimiento / rendimiento_base:5.2f}x | eficiencia {eficiencia:6.1%}")
+        if resultados != referencia:
+            fallas.append(f"{hilos} hilos: resultados distintos a los de un hilo")
+        if args.eficiencia_minima is not None and not gil_activo() and eficiencia < args.eficiencia_minima:
+            fallas.append(f"{hilos} hilos: eficiencia {eficiencia:.1%} bajo {args.eficiencia_minima:.0%}")
+
+    for falla in fallas:
+        print(f"  - {falla}", file=sys.stderr)
+    return 1 if fallas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
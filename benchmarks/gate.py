@@ -0,0 +1,242 @@
+"""
+Control de regresiones de rendimiento contra una línea base guardada
+
+Uso:
+    python -m benchmarks.gate                        # compara con benchmarks/baseline.json
+    python -m benchmarks.gate --actualizar-linea-base
+    python -m benchmarks.gate --solo puntuar_hogar --solo reporte
+
+Cada benchmark se mide en varias muestras. Una regresión de tiempo requiere
+que la mediana empeore más que la tolerancia del benchmark y que la prueba
+U de Mann-Whitney (unilateral) contra las muestras de la línea base sea
+significativa. La memoria se compara por el pico de tracemalloc.
+Termina con código 1 si hay alguna regresión.
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from calculator.income import calcular_ingreso_equivalente, determinar_tramo_por_ingreso
+from calculator.needs_index import calcular_indice_necesidades
+from calculator.means_test import evaluar_test_medios
+from calculator.means_test_rules import compilar_reglas
+from calculator.engine import CSEEngine
+from batch.scoring import puntuar_hogar
+from batch.synthetic import generar_hogares
+from gui.report import generar_reporte
+
+RUTA_LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+MUESTRAS = 15
+# Ejecuciones por muestra, para que cada muestra dure varios milisegundos
+REPETICIONES = 10
+ALFA = 0.01
+# Holgura absoluta de memoria, para no fallar por variaciones de pocos bytes
+HOLGURA_MEMORIA = 4096
+
+
+def _hogares(n):
+    return list(generar_hogares(n, semilla=12345))
+
+
+def _bench_ingreso_equivalente():
+    hogares = [h["integrantes"] for h in _hogares(1000)]
+    return lambda: [calcular_ingreso_equivalente(i) for i in hogares]
+
+
+def _bench_indice_necesidades():
+    hogares = [h["integrantes"] for h in _hogares(1000)]
+    return lambda: [calcular_indice_necesidades(i) for i in hogares]
+
+
+def _bench_tramo_por_ingreso():
+    ingresos = [i * 1500.0 for i in range(1000)]
+    return lambda: [determinar_tramo_por_ingreso(x) for x in ingresos]
+
+
+def _bench_test_medios():
+    medios = [h["datos_medios"] for h in _hogares(1000)]
+    return lambda: [evaluar_test_medios(m) for m in medios]
+
+
+def _bench_test_medios_compilado():
+    medios = [h["datos_medios"] for h in _hogares(1000)]
+    evaluador = compilar_reglas()
+    return lambda: [evaluador(m) for m in medios]
+
+
+def _bench_puntuar_hogar():
+    hogares = _hogares(1000)
+    return lambda: [puntuar_hogar(h) for h in hogares]
+
+
+def _bench_motor():
+    hogares = _hogares(1000)
+    motor = CSEEngine()
+    return lambda: list(motor.score_many(hogares))
+
+
+def _bench_reporte():
+    hogares = _hogares(200)
+    casos = []
+    for hogar in hogares:
+        r = puntuar_hogar(hogar)
+        _, _, detalle = evaluar_test_medios(hogar["datos_medios"])
+        casos.append((hogar["integrantes"], r["ingreso_equivalente"], r["indice_necesidades"],
+                      r["ingreso_corregido"], r["tramo_ingreso"], r["tramo_medios"],
+                      r["num_medios"], detalle))
+    return lambda: [generar_reporte(*c) for c in casos]
+
+
+# nombre: (preparación que retorna la función a medir, tolerancia de tiempo, tolerancia de memoria)
+BENCHMARKS = {
+    "ingreso_equivalente": (_bench_ingreso_equivalente, 0.15, 0.10),
+    "indice_necesidades": (_bench_indice_necesidades, 0.15, 0.10),
+    "tramo_por_ingreso": (_bench_tramo_por_ingreso, 0.15, 0.10),
+    "test_medios": (_bench_test_medios, 0.15, 0.10),
+    "test_medios_compilado": (_bench_test_medios_compilado, 0.20, 0.10),
+    "puntuar_hogar": (_bench_puntuar_hogar, 0.10, 0.10),
+    "motor": (_bench_motor, 0.10, 0.10),
+    "reporte": (_bench_reporte, 0.15, 0.10),
+}
+
+
+def medir(preparar, muestras=MUESTRAS):
+    """
+    Mide una función preparada.
+
+    Returns:
+        dict: muestras (segundos por ejecución), mediana y memoria_pico (bytes)
+    """
+    funcion = preparar()
+    funcion()  # calentamiento
+
+    tiempos = []
+    for _ in range(muestras):
+        t0 = time.perf_counter()
+        for _ in range(REPETICIONES):
+            funcion()
+        tiempos.append((time.perf_counter() - t0) / REPETICIONES)
+
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"muestras": tiempos, "mediana": statistics.median(tiempos), "memoria_pico": pico}
+
+
+def mann_whitney_p(actuales, base):
+    """
+    Valor p unilateral de la prueba U de Mann-Whitney (H1: actuales > base),
+    con aproximación normal y corrección por empates.
+    """
+    n1, n2 = len(actuales), len(base)
+    combinados = sorted([(v, 0) for v in actuales] + [(v, 1) for v in base])
+
+    # Rangos promedio para empates
+    rangos = [0.0] * len(combinados)
+    correccion_empates = 0.0
+    i = 0
+    while i < len(combinados):
+        j = i
+        while j + 1 < len(combinados) and combinados[j + 1][0] == combinados[i][0]:
+            j += 1
+        rango = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            rangos[k] = rango
+        t = j - i + 1
+        correccion_empates += t ** 3 - t
+        i = j + 1
+
+    r1 = sum(r for r, (_, grupo) in zip(rangos, combinados) if grupo == 0)
+    u1 = r1 - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    media = n1 * n2 / 2
+    varianza = n1 * n2 / 12 * ((n + 1) - correccion_empates / (n * (n - 1)))
+    if varianza <= 0:
+        return 1.0
+    z = (u1 - media - 0.5) / math.sqrt(varianza)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def evaluar(nombre, actual, base, tolerancia_tiempo, tolerancia_memoria):
+    """
+    Compara una medición con su línea base.
+
+    Returns:
+        list: Descripciones de las regresiones encontradas (vacía si no hay)
+    """
+    regresiones = []
+    razon = actual["mediana"] / base["mediana"] if base["mediana"] else 1.0
+    p = mann_whitney_p(actual["muestras"], base["muestras"])
+    if razon > 1 + tolerancia_tiempo and p < ALFA:
+        regresiones.append(f"{nombre}: tiempo {razon:.2f}x la línea base "
+                           f"(tolerancia {tolerancia_tiempo:.0%}, p={p:.2g})")
+
+    limite = base["memoria_pico"] * (1 + tolerancia_memoria) + HOLGURA_MEMORIA
+    if actual["memoria_pico"] > limite:
+        regresiones.append(f"{nombre}: memoria {actual['memoria_pico']:,} B vs "
+                           f"{base['memoria_pico']:,} B (tolerancia {tolerancia_memoria:.0%})")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara el rendimiento contra la línea base guardada.")
+    parser.add_argument("--linea-base", default=RUTA_LINEA_BASE)
+    parser.add_argument("--actualizar-linea-base", action="store_true",
+                        help="Mide y reemplaza la línea base en vez de comparar")
+    parser.add_argument("--solo", action="append", choices=sorted(BENCHMARKS),
+                        help="Ejecutar solo este benchmark (puede repetirse)")
+    parser.add_argument("--muestras", type=int, default=MUESTRAS)
+    args = parser.parse_args(argv)
+
+    nombres = args.solo or list(BENCHMARKS)
+    mediciones = {}
+    for nombre in nombres:
+        mediciones[nombre] = medir(BENCHMARKS[nombre][0], args.muestras)
+        m = mediciones[nombre]
+        print(f"{nombre:<24} mediana {m['mediana'] * 1000:9.3f} ms | memoria pico {m['memoria_pico']:>12,} B")
+
+    if args.actualizar_linea_base:
+        linea_base = {}
+        if os.path.exists(args.linea_base):
+            with open(args.linea_base, encoding="utf-8") as f:
+                linea_base = json.load(f)
+        linea_base.update(mediciones)
+        with open(args.linea_base, "w", encoding="utf-8") as f:
+            json.dump(linea_base, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Línea base actualizada: {args.linea_base}")
+        return 0
+
+    with open(args.linea_base, encoding="utf-8") as f:
+        linea_base = json.load(f)
+
+    regresiones = []
+    for nombre in nombres:
+        if nombre not in linea_base:
+            print(f"Aviso: {nombre} no tiene línea base", file=sys.stderr)
+            continue
+        _, tol_tiempo, tol_memoria = BENCHMARKS[nombre]
+        regresiones.extend(evaluar(nombre, mediciones[nombre], linea_base[nombre], tol_tiempo, tol_memoria))
+
+    if regresiones:
+        print("\nRegresiones de rendimiento:")
+        for r in regresiones:
+            print(f"  - {r}")
+        return 1
+    print("\nSin regresiones de rendimiento.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+"""
+Índice de proximidad a los umbrales de tramo por ingreso
+"""
+
+import bisect
+import json
+import os
+
+from constants import UMBRALES_INGRESO
+
+
+def ruta_indice(ruta_resultados):
+    """Retorna la ruta del índice que se guarda junto a un archivo de resultados."""
+    return ruta_resultados + ".fronteras.json"
+
+
+class IndiceFronteras:
+    """
+    Índice de hogares ordenado por ingreso equivalente corregido.
+
+    Permite encontrar los hogares cuyo ingreso corregido está cerca de un
+    umbral de UMBRALES_INGRESO, donde un pequeño error de ingreso cambia
+    el tramo. Las búsquedas son logarítmicas (bisect) sobre una lista
+    ordenada; los identificadores de hogar se normalizan a str.
+    """
+
+    def __init__(self, umbrales=None):
+        if umbrales is None:
+            umbrales = UMBRALES_INGRESO
+        # Solo los umbrales finitos son fronteras entre tramos
+        self.umbrales = sorted((u, t) for u, t in umbrales if u != float("inf"))
+        self.tramo_superior = max(t for _, t in umbrales)
+        self._valores_umbral = [u for u, _ in self.umbrales]
+        self._claves = []     # (ingreso_corregido, hogar_id) ordenado
+        self._ingresos = []   # ingreso_corregido, paralelo a _claves
+        self._por_id = {}     # hogar_id -> ingreso_corregido
+
+    def __len__(self):
+        return len(self._claves)
+
+    def __contains__(self, hogar_id):
+        return str(hogar_id) in self._por_id
+
+    def actualizar(self, hogar_id, ingreso_corregido):
+        """Inserta un hogar o reemplaza su ingreso corregido si ya estaba indexado."""
+        hogar_id = str(hogar_id)
+        ingreso_corregido = float(ingreso_corregido)
+        if hogar_id in self._por_id:
+            if self._por_id[hogar_id] == ingreso_corregido:
+                return
+            self._quitar(hogar_id)
+        clave = (ingreso_corregido, hogar_id)
+        pos = bisect.bisect_left(self._claves, clave)
+        self._claves.insert(pos, clave)
+        self._ingresos.insert(pos, ingreso_corregido)
+        self._por_id[hogar_id] = ingreso_corregido
+
+    def eliminar(self, hogar_id):
+        """Elimina un hogar del índice. Retorna False si no estaba indexado."""
+        hogar_id = str(hogar_id)
+        if hogar_id not in self._por_id:
+            return False
+        self._quitar(hogar_id)
+        return True
+
+    def _quitar(self, hogar_id):
+        clave = (self._por_id.pop(hogar_id), hogar_id)
+        pos = bisect.bisect_left(self._claves, clave)
+        del self._claves[pos]
+        del self._ingresos[pos]
+
+    def agregar_resultados(self, resultados):
+        """
+        Indexa (o reindexa) resultados de cálculo.
+
+        Los hogares nuevos se agregan al final y se ordenan una sola vez, de
+        modo que indexar una ejecución completa cuesta O(n log n); los ya
+        indexados se reemplazan con actualizar().
+
+        Args:
+            resultados: Iterable de diccionarios con claves "id" e "ingreso_corregido"
+        """
+        nuevos = {}
+        for res in resultados:
+            hogar_id = str(res["id"])
+            if hogar_id in self._por_id:
+                self.actualizar(hogar_id, res["ingreso_corregido"])
+            else:
+                nuevos[hogar_id] = float(res["ingreso_corregido"])
+        if not nuevos:
+            return
+        self._por_id.update(nuevos)
+        self._claves.extend((ing, hid) for hid, ing in nuevos.items())
+        self._claves.sort()
+        self._ingresos = [ing for ing, _ in self._claves]
+
+    def particion(self, tramo):
+        """
+        Retorna los hogares cuyo ingreso corregido cae en el tramo indicado.
+
+        Returns:
+            list: Tuplas (hogar_id, ingreso_corregido) ordenadas por ingreso
+        """
+        inferior = None
+        superior = None
+        for umbral, t in self.umbrales:
+            if t == tramo:
+                superior = umbral
+                break
+            inferior = umbral
+        else:
+            # Tramo por sobre el último umbral finito
+            if tramo != self.tramo_superior:
+                raise ValueError(f"Tramo desconocido: {tramo}")
+
+        lo = 0 if inferior is None else bisect.bisect_right(self._ingresos, inferior)
+        hi = len(self._ingresos) if superior is None else bisect.bisect_right(self._ingresos, superior)
+        return [(hid, ing) for ing, hid in self._claves[lo:hi]]
+
+    def dentro_de(self, distancia=None, porcentaje=None):
+        """
+        Hogares a menos de cierta distancia de algún umbral.
+
+        Args:
+            distancia: Distancia máxima en pesos
+            porcentaje: Distancia máxima como porcentaje de cada umbral
+
+        Returns:
+            list: Tuplas (hogar_id, ingreso_corregido, umbral, distancia) ordenadas
+                  por distancia, usando el umbral más cercano de cada hogar
+        """
+        if distancia is None and porcentaje is None:
+            raise ValueError("Debe indicar distancia o porcentaje")
+
+        encontrados = {}
+        for umbral in self._valores_umbral:
+            d = distancia if distancia is not None else 0
+            if porcentaje is not None:
+                d = max(d, umbral * porcentaje / 100)
+            lo = bisect.bisect_left(self._ingresos, umbral - d)
+            hi = bisect.bisect_right(self._ingresos, umbral + d)
+            for ing, hid in self._claves[lo:hi]:
+                dist = abs(ing - umbral)
+                previo = encontrados.get(hid)
+                if previo is None or dist < previo[3]:
+                    encontrados[hid] = (hid, ing, umbral, dist)
+
+        return sorted(encontrados.values(), key=lambda r: (r[3], r[1], r[0]))
+
+    def mas_cercanos(self, umbral, k):
+        """
+        Retorna los k hogares más cercanos a un umbral.
+
+        Returns:
+            list: Tuplas (hogar_id, ingreso_corregido, distancia) ordenadas por distancia
+        """
+        pos = bisect.bisect_left(self._ingresos, umbral)
+        izq, der = pos - 1, pos
+        n = len(self._ingresos)
+        resultado = []
+        while len(resultado) < k and (izq >= 0 or der < n):
+            dist_izq = umbral - self._ingresos[izq] if izq >= 0 else float("inf")
+            dist_der = self._ingresos[der] - umbral if der < n else float("inf")
+            if dist_der <= dist_izq:
+                ing, hid = self._claves[der]
+                resultado.append((hid, ing, dist_der))
+                der += 1
+            else:
+                ing, hid = self._claves[izq]
+                resultado.append((hid, ing, dist_izq))
+                izq -= 1
+        return resultado
+
+    def guardar(self, ruta):
+        """Guarda el índice en disco (escritura atómica)."""
+        datos = {
+            "umbrales": self.umbrales,
+            "tramo_superior": self.tramo_superior,
+            "hogares": [[hid, ing] for ing, hid in self._claves],
+        }
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(datos, f)
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Carga un índice guardado con guardar()."""
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        umbrales = [tuple(u) for u in datos["umbrales"]]
+        indice = cls(umbrales + [(float("inf"), datos["tramo_superior"])])
+        # Los hogares se guardan ya ordenados
+        indice._claves = [(float(ing), str(hid)) for hid, ing in datos["hogares"]]
+        indice._ingresos = [ing for ing, _ in indice._claves]
+        indice._por_id = {hid: ing for ing, hid in indice._claves}
+        return indice
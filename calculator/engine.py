@@ -0,0 +1,114 @@
+"""
+Motor de cálculo de la CSE con parámetros propios
+
+Las funciones de calculator/ leen los valores globales de constants.py. Un
+CSEEngine, en cambio, se construye sobre una versión de parámetros
+compilada (tabla de coeficientes, umbrales y tabla del test de medios) y
+no tiene estado mutable: varios motores con parámetros distintos pueden
+convivir, y un mismo motor puede usarse desde muchos hilos sin bloqueo.
+"""
+
+from calculator.income import aporte_ingreso
+from calculator.parameters import (
+    EDAD_MAXIMA_TABLA, ParametrosCompilados, RepositorioParametros, compilar_parametros,
+)
+
+
+class CSEEngine:
+    """
+    Calcula la CSE de hogares con una versión de parámetros fija.
+
+    Args:
+        parametros: ParametrosCompilados, el diccionario de una versión (como
+            en data/parametros.json) o None para usar la versión vigente a
+            fecha en el archivo de parámetros por defecto
+        fecha: Fecha de vigencia cuando parametros es None (por defecto, hoy)
+    """
+
+    __slots__ = ("_parametros", "_coeficientes_por_edad", "_umbral_estudiante", "_evaluar_medios")
+
+    def __init__(self, parametros=None, fecha=None):
+        if parametros is None:
+            parametros = RepositorioParametros().obtener(fecha)
+        elif not isinstance(parametros, ParametrosCompilados):
+            parametros = compilar_parametros(parametros)
+        object.__setattr__(self, "_parametros", parametros)
+        # Fila de la Tabla N°1 por edad, para no resolver el rango en cada integrante
+        object.__setattr__(self, "_coeficientes_por_edad", tuple(
+            parametros.coeficientes[parametros.rango_edad(edad)] for edad in range(EDAD_MAXIMA_TABLA + 1)
+        ))
+        object.__setattr__(self, "_umbral_estudiante", parametros.umbral_estudiante)
+        object.__setattr__(self, "_evaluar_medios", parametros.evaluar_medios.tramo_y_total)
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("CSEEngine es inmutable")
+
+    def __delattr__(self, nombre):
+        raise AttributeError("CSEEngine es inmutable")
+
+    def __repr__(self):
+        return f"CSEEngine(version={self.version!r})"
+
+    @property
+    def parametros(self):
+        """Versión de parámetros compilada que usa el motor."""
+        return self._parametros
+
+    @property
+    def version(self):
+        """Nombre de la versión de parámetros."""
+        return self._parametros.version
+
+    def score(self, hogar):
+        """
+        Ejecuta los pasos 1 a 5 de la metodología para un hogar.
+
+        Args:
+            hogar: Diccionario con "id", "integrantes" y "datos_medios"
+
+        Returns:
+            dict: Resultado con las claves de batch.scoring.COLUMNAS_RESULTADO
+        """
+        p = self._parametros
+        coeficientes_por_edad = self._coeficientes_por_edad
+        integrantes = hogar["integrantes"]
+        umbral = self._umbral_estudiante
+
+        # Ingreso equivalente e índice de necesidades en una sola pasada
+        ingreso_equiv = 0
+        suma_coeficientes = 0
+        for integ in integrantes:
+            edad = integ["edad"]
+            if type(edad) is int and 0 <= edad <= EDAD_MAXIMA_TABLA:
+                suma_coeficientes += coeficientes_por_edad[edad].get(integ["condicion"], 0.0)
+            else:
+                suma_coeficientes += p.coeficiente(edad, integ["condicion"])
+            ingreso_equiv += aporte_ingreso(integ, umbral)
+
+        indice_nec = p.n_elevado(len(integrantes)) + suma_coeficientes
+        ingreso_corregido = ingreso_equiv / indice_nec if indice_nec != 0 else 0
+        tramo_ingreso = p.tramo_por_ingreso(ingreso_corregido)
+        tramo_medios, num_medios = self._evaluar_medios(hogar.get("datos_medios", {}))
+
+        return {
+            "id": hogar["id"],
+            "n_integrantes": len(integrantes),
+            "ingreso_equivalente": ingreso_equiv,
+            "indice_necesidades": indice_nec,
+            "ingreso_corregido": ingreso_corregido,
+            "tramo_ingreso": tramo_ingreso,
+            "tramo_medios": tramo_medios,
+            "num_medios": num_medios,
+            "tramo_final": max(tramo_ingreso, tramo_medios),
+        }
+
+    def score_many(self, hogares):
+        """
+        Calcula la CSE de un iterable de hogares, de forma perezosa.
+
+        Yields:
+            dict: Un resultado por hogar, en el orden de la entrada
+        """
+        score = self.score
+        for hogar in hogares:
+            yield score(hogar)
@@ -5,6 +5,30 @@ Cálculo del ingreso equivalente del hogar
 from constants import SALARIO_MINIMO, UMBRALES_INGRESO
 
 
+def aporte_ingreso(integ, umbral_estudiante):
+    """
+    Aporte de un integrante al ingreso equivalente del hogar.
+
+    Se excluyen los ingresos de menores de 18. De una persona entre 18-24
+    que estudia solo se considera lo que supera umbral_estudiante (2
+    salarios mínimos de la versión de parámetros).
+
+    Args:
+        integ: Diccionario con datos del integrante
+        umbral_estudiante: Umbral de ingresos de estudiantes de 18 a 24 años
+
+    Returns:
+        float: Ingreso del integrante que se suma al del hogar
+    """
+    edad = integ["edad"]
+    if edad < 18:
+        return 0
+    ingreso = integ["ingreso_trabajo"] + integ["ingreso_pension"] + integ["ingreso_capital"]
+    if edad <= 24 and integ.get("estudia", False):
+        return ingreso - umbral_estudiante if ingreso > umbral_estudiante else 0
+    return ingreso
+
+
 def calcular_ingreso_equivalente(integrantes):
     """
     Calcula el ingreso equivalente del hogar (suma de ingresos de mayores de 18).
@@ -15,28 +39,10 @@ def calcular_ingreso_equivalente(integrantes):
     Returns:
         float: Ingreso equivalente total del hogar
     """
+    umbral = 2 * SALARIO_MINIMO
     total = 0
-    
     for integ in integrantes:
-        edad = integ["edad"]
-        ing_trabajo = integ["ingreso_trabajo"]
-        ing_pension = integ["ingreso_pension"]
-        ing_capital = integ["ingreso_capital"]
-
-        if edad < 18:
-            # Se excluyen ingresos de menores de 18
-            continue
-
-        if 18 <= edad <= 24 and integ.get("estudia", False):
-            # Persona entre 18-24 que estudia y trabaja:
-            # solo se consideran ingresos si superan 2 salarios mínimos
-            ingreso_total_persona = ing_trabajo + ing_pension + ing_capital
-            umbral = 2 * SALARIO_MINIMO
-            if ingreso_total_persona > umbral:
-                total += ingreso_total_persona - umbral
-        else:
-            total += ing_trabajo + ing_pension + ing_capital
-
+        total += aporte_ingreso(integ, umbral)
     return total
 
 
@@ -0,0 +1,192 @@
+"""
+Reglas del test de medios expresadas como datos, versionadas por resolución
+"""
+
+import operator
+import threading
+
+# Cada versión describe:
+#   medios: flags de datos_medios, en el orden del detalle. Cada uno indica su
+#           medio, nivel ("alto" o "muy_alto"), tramo implicado por sí solo y
+#           el mínimo de medios activos del mismo nivel para que cuente
+#           (educación y bienes raíces solo cuentan junto a otro medio).
+#   escalamientos: por nivel, cantidad mínima de medios activos y tramo
+#           mínimo que se alcanza.
+#   precedencia: niveles en orden de evaluación; el primero que infiere un
+#           tramo distinto de 0 determina el resultado.
+REGLAS_MEDIOS = {
+    "082-2024": {
+        "resolucion": "Resolución Exenta N°082, Junio 2024",
+        "medios": [
+            {"flag": "salud_alto_valor", "medio": "salud", "nivel": "alto", "tramo": 50,
+             "detalle": "Cotización de salud: Plan de alto valor -> Tramo 50"},
+            {"flag": "salud_muy_alto_valor", "medio": "salud", "nivel": "muy_alto", "tramo": 90,
+             "detalle": "Cotización de salud: Plan de muy alto valor -> Tramo 90"},
+            {"flag": "educacion_alto_valor", "medio": "educacion", "nivel": "alto", "tramo": 50,
+             "activa_con": 2,
+             "detalle": "Matrícula educacional de alto valor (>= $100.000)"},
+            {"flag": "vehiculos_alto_valor", "medio": "vehiculos", "nivel": "alto", "tramo": 50,
+             "detalle": "Vehículos: Alto valor (>= 20% más costosos) -> Tramo 50"},
+            {"flag": "vehiculos_muy_alto_valor", "medio": "vehiculos", "nivel": "muy_alto", "tramo": 90,
+             "detalle": "Vehículos: Muy alto valor (>= 5% más costosos) -> Tramo 90"},
+            {"flag": "nave_mayor", "medio": "nave_mayor", "nivel": "muy_alto", "tramo": 90,
+             "detalle": "Nave mayor -> Tramo 90"},
+            {"flag": "tres_naves_menores", "medio": "naves_menores", "nivel": "muy_alto", "tramo": 90,
+             "detalle": "3 o más naves menores/deportivas -> Tramo 90"},
+            {"flag": "bienes_raices_alto_valor", "medio": "bienes_raices", "nivel": "alto", "tramo": 50,
+             "activa_con": 2,
+             "detalle": "Bienes raíces: Alto valor (>= 20% más costosos) -> Se activa con otro medio"},
+            {"flag": "bienes_raices_muy_alto_valor", "medio": "bienes_raices", "nivel": "muy_alto",
+             "tramo": 90,
+             "detalle": "Bienes raíces: Muy alto valor (>= 5% más costosos) -> Tramo 90"},
+            {"flag": "padre_madre_alto_valor", "medio": "padre_madre", "nivel": "alto", "tramo": 80,
+             "detalle": "Ingresos padre/madre no presente: Alto valor -> Tramo 80"},
+            {"flag": "padre_madre_muy_alto_valor", "medio": "padre_madre", "nivel": "muy_alto",
+             "tramo": 90,
+             "detalle": "Ingresos padre/madre no presente: Muy alto valor -> Tramo 90"},
+        ],
+        "escalamientos": [
+            {"nivel": "muy_alto", "minimo": 2, "tramo": 100},
+            {"nivel": "alto", "minimo": 2, "tramo": 70},
+            {"nivel": "alto", "minimo": 3, "tramo": 90},
+        ],
+        "precedencia": ["muy_alto", "alto"],
+    },
+}
+
+VERSION_VIGENTE = "082-2024"
+
+
+def _evaluar_mascara(reglas, mascara):
+    """
+    Interpreta las reglas para una combinación de flags (bit i = medio i activo).
+
+    Returns:
+        tuple: (tramo_inferido, total_medios, indices de medios activos)
+    """
+    medios = reglas["medios"]
+    activos = [i for i in range(len(medios)) if mascara >> i & 1]
+    conteo = {}
+    for i in activos:
+        nivel = medios[i]["nivel"]
+        conteo[nivel] = conteo.get(nivel, 0) + 1
+
+    tramo_inferido = 0
+    for nivel in reglas["precedencia"]:
+        total_nivel = conteo.get(nivel, 0)
+        tramo_nivel = 0
+        for i in activos:
+            medio = medios[i]
+            if medio["nivel"] == nivel and total_nivel >= medio.get("activa_con", 1):
+                tramo_nivel = max(tramo_nivel, medio["tramo"])
+        for esc in reglas["escalamientos"]:
+            if esc["nivel"] == nivel and total_nivel >= esc["minimo"]:
+                tramo_nivel = max(tramo_nivel, esc["tramo"])
+        if tramo_nivel:
+            tramo_inferido = tramo_nivel
+            break
+
+    return tramo_inferido, len(activos), activos
+
+
+class EvaluadorMedios:
+    """
+    Evaluador compilado de una versión de las reglas del test de medios.
+
+    Al compilar se evalúan las 2^n combinaciones de flags y se guarda, por
+    combinación, la tupla de resultado ya armada. Evaluar un hogar que trae
+    todos los flags como booleanos es una sola consulta: la tupla de sus
+    valores (operator.itemgetter) es la clave de la tabla. Si faltan flags o
+    traen otros valores, primero se normalizan a booleanos.
+    """
+
+    def __init__(self, version, reglas):
+        self.version = version
+        self.resolucion = reglas.get("resolucion", "")
+        self.flags = tuple(m["flag"] for m in reglas["medios"])
+        self._bits = tuple(1 << i for i in range(len(self.flags)))
+        self._falsos = (False,) * len(self.flags)
+        detalles = [m["detalle"] for m in reglas["medios"]]
+
+        tabla = []
+        for mascara in range(1 << len(self.flags)):
+            tramo, total, activos = _evaluar_mascara(reglas, mascara)
+            tabla.append((tramo, total, tuple(detalles[i] for i in activos)))
+        self._tabla = tuple(tabla)
+        self._tabla_sin_detalle = tuple((tramo, total) for tramo, total, _ in tabla)
+        self._valores = operator.itemgetter(*self.flags)
+        self._por_valores = {
+            tuple(bool(mascara >> i & 1) for i in range(len(self.flags))): resultado
+            for mascara, resultado in enumerate(tabla)
+        }
+        self._por_valores_sin_detalle = {valores: resultado[:2] for valores, resultado in self._por_valores.items()}
+
+    def mascara(self, datos_medios):
+        """Retorna la máscara de bits de los flags activos."""
+        activos = map(bool, map(datos_medios.get, self.flags, self._falsos))
+        return sum(map(operator.mul, activos, self._bits))
+
+    def evaluar_mascara(self, mascara):
+        """Retorna (tramo_inferido, total_medios) para una máscara ya armada."""
+        return self._tabla_sin_detalle[mascara]
+
+    def _clave(self, datos_medios):
+        return tuple(map(bool, map(datos_medios.get, self.flags, self._falsos)))
+
+    def __call__(self, datos_medios):
+        """
+        Evalúa los test de medios con la misma firma y resultado que evaluar_test_medios.
+
+        Returns:
+            tuple: (tramo_inferido, total_medios, detalle), con detalle como
+                   lista nueva en cada llamada
+        """
+        try:
+            tramo, total, detalle = self._por_valores[self._valores(datos_medios)]
+        except (KeyError, TypeError):
+            tramo, total, detalle = self._por_valores[self._clave(datos_medios)]
+        return tramo, total, list(detalle)
+
+    def tramo_y_total(self, datos_medios):
+        """Retorna (tramo_inferido, total_medios), sin armar el detalle."""
+        try:
+            return self._por_valores_sin_detalle[self._valores(datos_medios)]
+        except (KeyError, TypeError):
+            return self._por_valores_sin_detalle[self._clave(datos_medios)]
+
+
+_compilados = {}
+_cache_lock = threading.Lock()
+_estadisticas_cache = {"aciertos": 0, "fallos": 0}
+
+
+def estadisticas_cache():
+    """Aciertos y fallos del caché de compilar_reglas."""
+    with _cache_lock:
+        return dict(_estadisticas_cache)
+
+
+def compilar_reglas(version=VERSION_VIGENTE, reglas=None):
+    """
+    Compila (una sola vez por versión) las reglas del test de medios.
+
+    Args:
+        version: Clave de la versión en REGLAS_MEDIOS
+        reglas: Reglas a compilar; si se entrega, no se usa el caché
+
+    Returns:
+        EvaluadorMedios: Evaluador compilado
+    """
+    if reglas is not None:
+        return EvaluadorMedios(version, reglas)
+    with _cache_lock:
+        evaluador = _compilados.get(version)
+        _estadisticas_cache["fallos" if evaluador is None else "aciertos"] += 1
+    if evaluador is None:
+        if version not in REGLAS_MEDIOS:
+            raise KeyError(f"Versión de reglas desconocida: {version}")
+        evaluador = EvaluadorMedios(version, REGLAS_MEDIOS[version])
+        with _cache_lock:
+            evaluador = _compilados.setdefault(version, evaluador)
+    return evaluador
+
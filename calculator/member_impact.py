@@ -0,0 +1,116 @@
+"""
+Impacto de la salida o el ingreso de un integrante en la CSE del hogar
+
+El ingreso equivalente es una suma de aportes por integrante y el índice de
+necesidades es IN = N^0.7 + ΣY. Con las sumas del hogar calculadas una vez,
+sacar al integrante i solo resta su aporte y su coeficiente:
+
+    IE' = IE - aporte_i        IN' = (N - 1)^0.7 + (ΣY - Y_i)
+
+por lo que el impacto de todos los integrantes cuesta O(N) por hogar en vez
+de recalcular el hogar completo N veces. El test de medios es del hogar y
+no cambia.
+"""
+
+from calculator.engine import CSEEngine
+from calculator.income import aporte_ingreso
+
+
+def _resultado(p, ingreso_equiv, suma_coeficientes, n, tramo_medios):
+    if n == 0:
+        return None, None, None
+    indice_nec = p.n_elevado(n) + suma_coeficientes
+    ingreso_corregido = ingreso_equiv / indice_nec if indice_nec != 0 else 0
+    tramo_ingreso = p.tramo_por_ingreso(ingreso_corregido)
+    return ingreso_corregido, tramo_ingreso, max(tramo_ingreso, tramo_medios)
+
+
+class _SumasHogar:
+    """Aportes por integrante y totales del hogar."""
+
+    def __init__(self, hogar, p):
+        integrantes = hogar["integrantes"]
+        self.aportes = [aporte_ingreso(i, p.umbral_estudiante) for i in integrantes]
+        self.coeficientes = [p.coeficiente(i["edad"], i["condicion"]) for i in integrantes]
+        self.ingreso_equiv = sum(self.aportes)
+        self.suma_coeficientes = sum(self.coeficientes)
+        self.n = len(integrantes)
+        self.tramo_medios = p.evaluar_medios.tramo_y_total(hogar.get("datos_medios", {}))[0]
+
+
+def impacto_salida(hogar, engine=None):
+    """
+    Calcula, para cada integrante, la CSE del hogar si ese integrante saliera.
+
+    Args:
+        hogar: Diccionario con "id", "integrantes" y "datos_medios"
+        engine: CSEEngine cuyos parámetros se usan (por defecto, los vigentes)
+
+    Returns:
+        list: Por integrante, dict con posicion, nombre, ingreso_corregido,
+              tramo_ingreso, tramo_final y cambia_tramo (None en los valores
+              si el hogar queda sin integrantes)
+    """
+    return _impacto_salida(hogar, (engine or CSEEngine()).parametros)[1]
+
+
+def _impacto_salida(hogar, p):
+    s = _SumasHogar(hogar, p)
+    actual = _resultado(p, s.ingreso_equiv, s.suma_coeficientes, s.n, s.tramo_medios)[2]
+    impactos = []
+    for posicion, integ in enumerate(hogar["integrantes"]):
+        ingreso_corregido, tramo_ingreso, tramo_final = _resultado(
+            p, s.ingreso_equiv - s.aportes[posicion], s.suma_coeficientes - s.coeficientes[posicion],
+            s.n - 1, s.tramo_medios)
+        impactos.append({
+            "posicion": posicion,
+            "nombre": integ.get("nombre", ""),
+            "ingreso_corregido": ingreso_corregido,
+            "tramo_ingreso": tramo_ingreso,
+            "tramo_final": tramo_final,
+            "cambia_tramo": tramo_final != actual,
+        })
+    return actual, impactos
+
+
+def impacto_ingreso(hogar, integrante, engine=None):
+    """
+    Calcula la CSE del hogar si se agregara un integrante.
+
+    Returns:
+        dict: ingreso_corregido, tramo_ingreso, tramo_final y cambia_tramo
+    """
+    p = (engine or CSEEngine()).parametros
+    s = _SumasHogar(hogar, p)
+    actual = _resultado(p, s.ingreso_equiv, s.suma_coeficientes, s.n, s.tramo_medios)[2]
+    ingreso_corregido, tramo_ingreso, tramo_final = _resultado(
+        p, s.ingreso_equiv + aporte_ingreso(integrante, p.umbral_estudiante),
+        s.suma_coeficientes + p.coeficiente(integrante["edad"], integrante["condicion"]),
+        s.n + 1, s.tramo_medios)
+    return {
+        "ingreso_corregido": ingreso_corregido,
+        "tramo_ingreso": tramo_ingreso,
+        "tramo_final": tramo_final,
+        "cambia_tramo": tramo_final != actual,
+    }
+
+
+def impacto_poblacion(hogares, engine=None, solo_cambios=False):
+    """
+    Impacto de la salida de cada integrante en una población, en una pasada.
+
+    Args:
+        hogares: Iterable de hogares
+        engine: CSEEngine (se construye uno solo para toda la población)
+        solo_cambios: Entregar solo los integrantes cuya salida cambia el tramo
+
+    Yields:
+        dict: id del hogar, tramo_final_actual y los campos de impacto_salida()
+    """
+    p = (engine or CSEEngine()).parametros
+    for hogar in hogares:
+        actual, impactos = _impacto_salida(hogar, p)
+        for impacto in impactos:
+            if solo_cambios and not impacto["cambia_tramo"]:
+                continue
+            yield dict(impacto, id=hogar["id"], tramo_final_actual=actual)
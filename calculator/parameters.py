@@ -0,0 +1,257 @@
+"""
+Conjuntos de parámetros versionados por fecha de vigencia
+
+Los valores de constants.py y la Tabla N°1 de coefficients.py cambian cada
+año. Este módulo carga versiones desde un archivo JSON, elige la vigente a
+una fecha y compila cada versión una sola vez en tablas de consulta.
+"""
+
+import bisect
+import copy
+import datetime
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+import types
+
+from calculator.income import aporte_ingreso
+from calculator.means_test_rules import compilar_reglas
+
+logger = logging.getLogger(__name__)
+
+RUTA_POR_DEFECTO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                "data", "parametros.json")
+
+# Edades y tamaños de hogar cubiertos por las tablas precalculadas
+EDAD_MAXIMA_TABLA = 130
+N_MAXIMO_TABLA = 40
+
+
+def _a_fecha(fecha):
+    """Convierte una fecha 'AAAA-MM-DD', date o datetime a date."""
+    if fecha is None:
+        return datetime.date.today()
+    if isinstance(fecha, datetime.datetime):
+        return fecha.date()
+    if isinstance(fecha, datetime.date):
+        return fecha
+    return datetime.datetime.strptime(fecha, "%Y-%m-%d").date()
+
+
+def _huella(datos_version):
+    """Huella del contenido de una versión, para reutilizar compilaciones."""
+    canonico = json.dumps(datos_version, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonico.encode("utf-8")).hexdigest()
+
+
+class ParametrosCompilados:
+    """
+    Una versión de parámetros compilada a tablas de consulta.
+
+    Es inmutable después de construida (los atributos no se pueden asignar y
+    la Tabla N°1 es de solo lectura), por lo que puede compartirse entre
+    hilos sin bloqueo.
+    """
+
+    __slots__ = ("_datos", "version", "vigencia_desde", "resolucion", "salario_minimo", "umbral_estudiante",
+                 "factor_escala", "umbrales_ingreso", "umbrales", "tramos", "rangos", "coeficientes",
+                 "_edades_maximas", "reglas_medios", "_rango_por_edad", "_n_elevado", "evaluar_medios")
+
+    def __init__(self, datos):
+        fijar = object.__setattr__
+        try:
+            fijar(self, "version", datos["version"])
+            fijar(self, "vigencia_desde", _a_fecha(datos["vigencia_desde"]))
+            fijar(self, "resolucion", datos.get("resolucion", ""))
+            fijar(self, "salario_minimo", datos["salario_minimo"])
+            fijar(self, "umbral_estudiante", 2 * datos["salario_minimo"])
+            fijar(self, "factor_escala", datos["factor_escala"])
+
+            umbrales = [(float("inf") if u is None else u, t) for u, t in datos["umbrales_ingreso"]]
+            fijar(self, "umbrales_ingreso", tuple(umbrales))
+            fijar(self, "umbrales", tuple(u for u, _ in umbrales))
+            fijar(self, "tramos", tuple(t for _, t in umbrales))
+
+            rangos = datos["rangos_edad"]
+            fijar(self, "rangos", tuple(r["rango"] for r in rangos))
+            fijar(self, "coeficientes", types.MappingProxyType(
+                {r["rango"]: types.MappingProxyType(dict(r["coeficientes"])) for r in rangos}))
+            fijar(self, "_edades_maximas", tuple(r["edad_maxima"] for r in rangos if r["edad_maxima"] is not None))
+
+            fijar(self, "reglas_medios", datos["reglas_medios"])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Versión de parámetros inválida ({datos.get('version', '?')}): {e}")
+        # Copia de los datos de origen, para reconstruir la versión al serializarla
+        fijar(self, "_datos", copy.deepcopy(datos))
+
+        # Tablas precalculadas
+        fijar(self, "_rango_por_edad", tuple(
+            self.rangos[bisect.bisect_left(self._edades_maximas, edad)]
+            for edad in range(EDAD_MAXIMA_TABLA + 1)
+        ))
+        fijar(self, "_n_elevado", tuple(math.pow(n, self.factor_escala) for n in range(N_MAXIMO_TABLA + 1)))
+        fijar(self, "evaluar_medios", compilar_reglas(self.reglas_medios))
+
+    def __setattr__(self, nombre, valor):
+        raise AttributeError("ParametrosCompilados es inmutable")
+
+    def __delattr__(self, nombre):
+        raise AttributeError("ParametrosCompilados es inmutable")
+
+    def __reduce__(self):
+        return ParametrosCompilados, (self._datos,)
+
+    def __repr__(self):
+        return f"ParametrosCompilados(version={self.version!r}, vigencia_desde={self.vigencia_desde})"
+
+    def rango_edad(self, edad):
+        """Retorna la clave del rango de edad para la tabla de coeficientes."""
+        if isinstance(edad, int) and 0 <= edad <= EDAD_MAXIMA_TABLA:
+            return self._rango_por_edad[edad]
+        return self.rangos[bisect.bisect_left(self._edades_maximas, edad)]
+
+    def coeficiente(self, edad, condicion):
+        """Obtiene el coeficiente Y para una edad y condición dadas."""
+        return self.coeficientes[self.rango_edad(edad)].get(condicion, 0.0)
+
+    def n_elevado(self, n):
+        """Retorna N elevado al factor de escala."""
+        if n <= N_MAXIMO_TABLA:
+            return self._n_elevado[n]
+        return math.pow(n, self.factor_escala)
+
+    def ingreso_equivalente(self, integrantes):
+        """Equivalente a calcular_ingreso_equivalente con el salario mínimo de la versión."""
+        umbral = self.umbral_estudiante
+        total = 0
+        for integ in integrantes:
+            total += aporte_ingreso(integ, umbral)
+        return total
+
+    def indice_necesidades(self, integrantes):
+        """Equivalente a calcular_indice_necesidades con la Tabla N°1 de la versión."""
+        suma_coeficientes = 0
+        for integ in integrantes:
+            suma_coeficientes += self.coeficiente(integ["edad"], integ["condicion"])
+        return self.n_elevado(len(integrantes)) + suma_coeficientes
+
+    def tramo_por_ingreso(self, ingreso_corregido):
+        """Equivalente a determinar_tramo_por_ingreso con los umbrales de la versión."""
+        pos = bisect.bisect_left(self.umbrales, ingreso_corregido)
+        return self.tramos[pos] if pos < len(self.tramos) else self.tramos[-1]
+
+
+_cache_compilados = {}
+_cache_lock = threading.Lock()
+_cache_estadisticas = {"aciertos": 0, "fallos": 0}
+
+
+def estadisticas_cache():
+    """Aciertos y fallos del caché de compilar_parametros."""
+    with _cache_lock:
+        return dict(_cache_estadisticas)
+
+
+def compilar_parametros(datos_version):
+    """
+    Compila una versión de parámetros, reutilizando la compilación previa si
+    su contenido no cambió.
+
+    Returns:
+        ParametrosCompilados: Versión compilada
+    """
+    huella = _huella(datos_version)
+    with _cache_lock:
+        compilado = _cache_compilados.get(huella)
+        _cache_estadisticas["fallos" if compilado is None else "aciertos"] += 1
+    if compilado is None:
+        compilado = ParametrosCompilados(datos_version)
+        with _cache_lock:
+            compilado = _cache_compilados.setdefault(huella, compilado)
+    return compilado
+
+
+class RepositorioParametros:
+    """
+    Versiones de parámetros cargadas desde un archivo JSON vigilado.
+
+    Cada consulta revisa (como máximo una vez por intervalo_revision segundos)
+    si el archivo cambió; de ser así, lo relee y recompila solo las versiones
+    cuyo contenido es nuevo. Si el archivo nuevo es inválido se mantienen las
+    versiones anteriores.
+    """
+
+    def __init__(self, ruta=RUTA_POR_DEFECTO, intervalo_revision=1.0):
+        self.ruta = ruta
+        self.intervalo_revision = intervalo_revision
+        self._lock = threading.Lock()
+        self._firma = None
+        self._ultima_revision = 0.0
+        self._estado = ((), [])  # (versiones, fechas de vigencia), reemplazado en bloque
+        self.recargar()
+
+    def _firma_archivo(self):
+        st = os.stat(self.ruta)
+        return st.st_mtime_ns, st.st_size
+
+    def recargar(self):
+        """Relee el archivo de parámetros. Retorna True si hubo cambios."""
+        with self._lock:
+            firma = self._firma_archivo()
+            if firma == self._firma:
+                return False
+            with open(self.ruta, encoding="utf-8") as f:
+                datos = json.load(f)
+            versiones = sorted((compilar_parametros(v) for v in datos["versiones"]),
+                               key=lambda p: p.vigencia_desde)
+            self._estado = (tuple(versiones), [p.vigencia_desde for p in versiones])
+            self._firma = firma
+            logger.info("Parámetros cargados desde %s: %s", self.ruta,
+                        ", ".join(p.version for p in versiones))
+            return True
+
+    def _revisar_cambios(self):
+        ahora = time.monotonic()
+        if ahora - self._ultima_revision < self.intervalo_revision:
+            return
+        self._ultima_revision = ahora
+        try:
+            self.recargar()
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("No se pudo recargar %s, se mantienen las versiones actuales: %s",
+                           self.ruta, e)
+
+    @property
+    def versiones(self):
+        """Versiones cargadas, ordenadas por fecha de vigencia."""
+        self._revisar_cambios()
+        return self._estado[0]
+
+    def obtener(self, fecha=None):
+        """
+        Retorna la versión vigente a una fecha.
+
+        Args:
+            fecha: date, datetime o 'AAAA-MM-DD' (por defecto, hoy)
+
+        Returns:
+            ParametrosCompilados: Versión con la mayor vigencia_desde <= fecha
+        """
+        self._revisar_cambios()
+        fecha = _a_fecha(fecha)
+        versiones, fechas = self._estado
+        pos = bisect.bisect_right(fechas, fecha)
+        if pos == 0:
+            raise LookupError(f"No hay parámetros vigentes al {fecha}")
+        return versiones[pos - 1]
+
+    def obtener_version(self, version):
+        """Retorna una versión por su nombre."""
+        for p in self.versiones:
+            if p.version == version:
+                return p
+        raise KeyError(f"Versión de parámetros desconocida: {version}")
@@ -0,0 +1,109 @@
+"""
+Cálculo de la CSE sobre flujos de hogares
+
+score_stream() conecta un productor de hogares de cualquier tamaño (lista,
+generador, lector de archivo o iterable asíncrono) con un consumidor, sin
+armar la lista completa: lee un bloque, lo calcula y lo entrega antes de
+leer el siguiente. Con un iterable síncrono no hay más de un bloque en
+memoria. Con uno asíncrono, un productor lee por adelantado hasta
+max_bloques bloques mientras se calcula el actual; si el consumidor se
+atrasa, el productor espera.
+
+Un hogar es un diccionario como en batch.records, o solo la lista de sus
+integrantes (sin test de medios); en ese caso el id es su posición en el
+flujo.
+"""
+
+import asyncio
+import itertools
+
+from calculator.engine import CSEEngine
+
+TAMANO_BLOQUE = 1000
+MAX_BLOQUES = 4
+
+_FIN = object()
+
+
+def _normalizar(hogar, posicion):
+    if isinstance(hogar, dict):
+        return hogar
+    return {"id": posicion, "integrantes": list(hogar), "datos_medios": {}}
+
+
+def _calcular_bloque(score, bloque, inicio):
+    return [score(_normalizar(hogar, inicio + i)) for i, hogar in enumerate(bloque)]
+
+
+def score_stream(hogares, tamano_bloque=TAMANO_BLOQUE, motor=None, max_bloques=MAX_BLOQUES):
+    """
+    Calcula la CSE de un flujo de hogares y entrega los resultados por bloques.
+
+    Args:
+        hogares: Iterable o iterable asíncrono de hogares
+        tamano_bloque: Hogares por bloque
+        motor: CSEEngine a usar (por defecto, uno con los parámetros vigentes)
+        max_bloques: Bloques que el productor asíncrono puede leer por adelantado
+
+    Returns:
+        Generador, o generador asíncrono si hogares es asíncrono, que
+        entrega listas de resultados (ver CSEEngine.score) en el orden de la
+        entrada
+    """
+    if tamano_bloque < 1:
+        raise ValueError("tamano_bloque debe ser al menos 1")
+    if motor is None:
+        motor = CSEEngine()
+    if hasattr(hogares, "__aiter__"):
+        return _score_stream_async(hogares, tamano_bloque, motor, max(1, max_bloques))
+    return _score_stream_sync(hogares, tamano_bloque, motor)
+
+
+def _score_stream_sync(hogares, tamano_bloque, motor):
+    iterador = iter(hogares)
+    inicio = 0
+    while True:
+        bloque = list(itertools.islice(iterador, tamano_bloque))
+        if not bloque:
+            return
+        yield _calcular_bloque(motor.score, bloque, inicio)
+        inicio += len(bloque)
+
+
+async def _producir(hogares, tamano_bloque, cola):
+    try:
+        bloque = []
+        async for hogar in hogares:
+            bloque.append(hogar)
+            if len(bloque) >= tamano_bloque:
+                await cola.put(bloque)
+                bloque = []
+        if bloque:
+            await cola.put(bloque)
+        await cola.put(_FIN)
+    except Exception as e:
+        await cola.put(e)
+
+
+async def _score_stream_async(hogares, tamano_bloque, motor, max_bloques):
+    cola = asyncio.Queue(maxsize=max_bloques)
+    productor = asyncio.ensure_future(_producir(hogares, tamano_bloque, cola))
+    inicio = 0
+    try:
+        while True:
+            bloque = await cola.get()
+            if bloque is _FIN:
+                return
+            if isinstance(bloque, Exception):
+                raise bloque
+            # El cálculo corre en un hilo para que el productor siga leyendo
+            resultados = await asyncio.to_thread(_calcular_bloque, motor.score, bloque, inicio)
+            inicio += len(bloque)
+            yield resultados
+    finally:
+        if not productor.done():
+            productor.cancel()
+            try:
+                await productor
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,54 @@
+"""
+Edades a una fecha de referencia y cambios de código de edad entre dos fechas
+"""
+
+import unittest
+
+from batch.ages import (
+    CODIGO_SIN_NACER, CODIGOS_EDAD, EDAD_MAXIMA, EDAD_SIN_NACER, asignar_edades, cambios_de_codigo,
+    codigos_a_fecha, edades, hogares_con_cambios, leer_fechas,
+)
+
+
+class TestEdades(unittest.TestCase):
+
+    def test_edades(self):
+        nacimientos = leer_fechas(["2000-01-01", "2000-01-02", "1700-05-05", "2025-01-01"])
+        self.assertEqual(list(edades(nacimientos, "2025-01-01")), [25, 24, EDAD_MAXIMA, 0])
+        self.assertEqual(list(edades(leer_fechas([]), "2025-01-01")), [])
+
+    def test_29_de_febrero(self):
+        nacimientos = leer_fechas(["2004-02-29"])
+        self.assertEqual(list(edades(nacimientos, "2025-02-28")), [20])
+        self.assertEqual(list(edades(nacimientos, "2025-03-01")), [21])
+        self.assertEqual(list(edades(nacimientos, "2028-02-29")), [24])
+
+    def test_sin_nacer(self):
+        nacimientos = leer_fechas(["2000-01-01", "2025-03-01", "2030-01-01"])
+        self.assertEqual(list(edades(nacimientos, "2025-01-01")), [25, EDAD_SIN_NACER, EDAD_SIN_NACER])
+        self.assertEqual(list(codigos_a_fecha(nacimientos, "2025-01-01")),
+                         [CODIGOS_EDAD.index("25-59"), CODIGO_SIN_NACER, CODIGO_SIN_NACER])
+
+    def test_recien_nacido_en_la_ventana(self):
+        nacimientos = leer_fechas(["2000-01-01", "2025-03-01"])
+        self.assertEqual(cambios_de_codigo(nacimientos, "2025-01-01", "2025-06-01"), [1])
+
+    def test_cambios_de_codigo(self):
+        # Cruces en cada límite, con más personas que un tramo de comparación
+        fechas = ["2019-06-01", "2010-06-01", "2007-06-01", "2000-06-01", "1965-06-01", "1950-06-01"]
+        fijas = ["1990-01-01"] * 500
+        nacimientos = leer_fechas(fijas + fechas + fijas)
+        esperados = list(range(500, 500 + len(fechas)))
+        self.assertEqual(cambios_de_codigo(nacimientos, "2025-05-31", "2025-06-01"), esperados)
+        self.assertEqual(cambios_de_codigo(nacimientos, "2025-06-01", "2025-12-31"), [])
+
+        hogar_ids = ["a"] * 500 + ["b", "b", "c", "c", "d", "d"] + ["e"] * 500
+        self.assertEqual(hogares_con_cambios(hogar_ids, nacimientos, "2025-05-31", "2025-06-01"),
+                         {"b", "c", "d"})
+
+    def test_ingesta_rechaza_sin_nacer(self):
+        filas = [{"fecha_nacimiento": "2000-01-01"}, {"fecha_nacimiento": "2025-03-01"}]
+        with self.assertRaises(ValueError):
+            list(asignar_edades(filas, "2025-01-01"))
+        fila, = asignar_edades(filas[:1], "2025-01-01")
+        self.assertEqual((fila["edad"], fila["codigo_edad"]), (25, "25-59"))
@@ -0,0 +1,50 @@
+"""
+Flags del test de medios derivados de activos
+"""
+
+import unittest
+
+from batch.asset_flags import (
+    CORTES_POR_DEFECTO, asignar_medios, calcular_cortes, derivar_flags, flags_por_hogar,
+)
+
+
+class TestFlagsActivos(unittest.TestCase):
+
+    def setUp(self):
+        # 100 hogares con un vehículo y un plan de salud de valor 1..100
+        self.activos = []
+        for i in range(1, 101):
+            self.activos.append((str(i), "vehiculo", float(i)))
+            self.activos.append((str(i), "plan_salud", float(i)))
+        # Un vehículo barato adicional no cambia el máximo del hogar 100
+        self.activos.append(("100", "vehiculo", 1.0))
+        self.activos += [("7", "nave_menor", 0.0)] * 3 + [("8", "nave_menor", 0.0)] * 2
+        self.activos.append(("9", "nave_mayor", 0.0))
+
+    def test_una_pasada_igual_a_cortes_dados(self):
+        valores_corte, flags = derivar_flags(iter(self.activos), exacto=True)
+        self.assertEqual(valores_corte, calcular_cortes(self.activos, exacto=True))
+        self.assertEqual(flags, flags_por_hogar(self.activos, valores_corte))
+
+    def test_flags(self):
+        valores_corte, flags = derivar_flags(self.activos, exacto=True)
+        self.assertLess(valores_corte["salud_alto_valor"], valores_corte["salud_muy_alto_valor"])
+        self.assertLess(valores_corte["vehiculos_alto_valor"], valores_corte["vehiculos_muy_alto_valor"])
+        self.assertEqual(flags["100"], {"vehiculos_muy_alto_valor", "salud_muy_alto_valor"})
+        self.assertEqual(flags["50"], {"salud_alto_valor"})
+        self.assertNotIn("10", flags)
+        self.assertIn("tres_naves_menores", flags["7"])
+        self.assertNotIn("tres_naves_menores", flags.get("8", set()))
+        self.assertIn("nave_mayor", flags["9"])
+
+        hogar = next(asignar_medios([{"id": 100, "datos_medios": {"vehiculos_alto_valor": True}}], flags))
+        self.assertFalse(hogar["datos_medios"]["vehiculos_alto_valor"])
+        self.assertTrue(hogar["datos_medios"]["vehiculos_muy_alto_valor"])
+
+    def test_cuantiles_invertidos(self):
+        cortes = (("plan_salud", "salud_alto_valor", 0.70, "salud_muy_alto_valor", 0.35),)
+        with self.assertRaises(ValueError):
+            derivar_flags(self.activos, cortes)
+        for _, _, q_alto, _, q_muy_alto in CORTES_POR_DEFECTO:
+            self.assertLess(q_alto, q_muy_alto)
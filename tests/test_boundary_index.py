@@ -0,0 +1,90 @@
+"""
+Índice de proximidad a los umbrales frente a búsquedas por fuerza bruta
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+from batch.score import ejecutar
+from batch.synthetic import escribir_jsonl, generar_hogares
+from batch.writers import leer_resultados
+from calculator.boundary_index import IndiceFronteras, ruta_indice
+from calculator.income import determinar_tramo_por_ingreso
+from constants import UMBRALES_INGRESO
+
+
+class TestIndiceFronteras(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        umbrales = [u for u, _ in UMBRALES_INGRESO[:-1]]
+        self.ingresos = {}
+        for i in range(2000):
+            # La mitad de los hogares justo en un umbral o muy cerca
+            if i % 2:
+                valor = rng.choice(umbrales) + rng.choice((-1, 0, 1)) * rng.random() * 500
+            else:
+                valor = rng.uniform(0, 1500000)
+            self.ingresos[str(i)] = valor
+        self.indice = IndiceFronteras()
+        self.indice.agregar_resultados({"id": i, "ingreso_corregido": v} for i, v in self.ingresos.items())
+
+    def test_particion(self):
+        for _, tramo in UMBRALES_INGRESO:
+            esperado = sorted((v, i) for i, v in self.ingresos.items() if determinar_tramo_por_ingreso(v) == tramo)
+            self.assertEqual(self.indice.particion(tramo), [(i, v) for v, i in esperado])
+        with self.assertRaises(ValueError):
+            self.indice.particion(45)
+
+    def test_dentro_de(self):
+        encontrados = {r[0]: r for r in self.indice.dentro_de(distancia=300)}
+        for hogar_id, ingreso in self.ingresos.items():
+            distancia, umbral = min((abs(ingreso - u), u) for u, _ in UMBRALES_INGRESO[:-1])
+            if distancia <= 300:
+                self.assertEqual(encontrados[hogar_id][2:], (umbral, distancia))
+            else:
+                self.assertNotIn(hogar_id, encontrados)
+
+    def test_mas_cercanos(self):
+        umbral = UMBRALES_INGRESO[2][0]
+        cercanos = self.indice.mas_cercanos(umbral, 25)
+        distancias = sorted(abs(v - umbral) for v in self.ingresos.values())[:25]
+        self.assertEqual([d for _, _, d in cercanos], distancias)
+
+    def test_incremental_igual_a_masivo(self):
+        incremental = IndiceFronteras()
+        for hogar_id, ingreso in reversed(list(self.ingresos.items())):
+            incremental.actualizar(hogar_id, ingreso)
+        self.assertEqual(incremental.particion(60), self.indice.particion(60))
+
+        self.indice.actualizar("0", 1.0)
+        self.assertEqual(self.indice.particion(40)[0], ("0", 1.0))
+        self.assertTrue(self.indice.eliminar("0"))
+        self.assertFalse(self.indice.eliminar("0"))
+        self.assertNotIn("0", self.indice)
+        self.assertEqual(len(self.indice), len(self.ingresos) - 1)
+
+    def test_guardar_y_cargar(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, "indice.json")
+            self.indice.guardar(ruta)
+            cargado = IndiceFronteras.cargar(ruta)
+        for _, tramo in UMBRALES_INGRESO:
+            self.assertEqual(cargado.particion(tramo), self.indice.particion(tramo))
+        self.assertEqual(cargado.dentro_de(porcentaje=1), self.indice.dentro_de(porcentaje=1))
+
+    def test_indice_de_batch_score(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            entrada = os.path.join(directorio, "hogares.jsonl")
+            salida = os.path.join(directorio, "resultados.csv")
+            with open(entrada, "w", encoding="utf-8") as f:
+                escribir_jsonl(generar_hogares(300, semilla=1), f)
+            with open(os.devnull, "w") as reporte:
+                ejecutar(entrada, salida, reporte=reporte, indice=True)
+            cargado = IndiceFronteras.cargar(ruta_indice(salida))
+            resultados = list(leer_resultados(salida))
+        self.assertEqual(len(cargado), 300)
+        for r in resultados:
+            self.assertIn(r["id"], cargado)
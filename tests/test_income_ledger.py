@@ -0,0 +1,120 @@
+"""
+Ventana móvil de 12 meses de ingresos y su aplicación a hogares
+"""
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from batch.income_ledger import (
+    FUENTES, MESES_VENTANA, VentanaIngresos, aplicar_a_hogares, conteo_vacio, main, mes_a_ordinal,
+    ordinal_a_mes, promedios_por_mes,
+)
+
+
+def _registros():
+    """24 meses de registros: la persona 'a' gana 100 * n en el mes n, 'b' solo tiene pensión en dos meses."""
+    inicio = mes_a_ordinal("2024-01")
+    for n in range(24):
+        mes = ordinal_a_mes(inicio + n)
+        yield "a", mes, (100.0 * (n + 1), 0.0, 0.0)
+        if n in (3, 20):
+            yield "b", mes, (0.0, 1200.0, 0.0)
+
+
+def _promedio_completo(registros, mes):
+    """Promedio recorriendo toda la historia para un mes de evaluación."""
+    fin = mes_a_ordinal(mes)
+    sumas = {}
+    for persona_id, m, montos in registros:
+        if fin - MESES_VENTANA < mes_a_ordinal(m) <= fin:
+            suma = sumas.setdefault(persona_id, [0.0] * len(FUENTES))
+            for i, monto in enumerate(montos):
+                suma[i] += monto
+    return {p: tuple(v / MESES_VENTANA for v in s) for p, s in sumas.items()}
+
+
+class TestVentanaIngresos(unittest.TestCase):
+
+    def test_ventana_movil_igual_a_historia_completa(self):
+        registros = list(_registros())
+        meses = 0
+        ordinales = ((p, mes_a_ordinal(m), montos) for p, m, montos in registros)
+        for mes, ventana in promedios_por_mes(ordinales, "2024-06", "2025-12"):
+            meses += 1
+            esperado = _promedio_completo(registros, mes)
+            for persona_id in ("a", "b"):
+                self.assertEqual(ventana.promedio(persona_id), esperado.get(persona_id, (0.0, 0.0, 0.0)))
+        self.assertEqual(meses, 19)
+
+    def test_salto_de_mas_de_una_ventana(self):
+        ventana = VentanaIngresos("2024-01")
+        ventana.agregar("a", "2024-01", (1200, 0, 0))
+        ventana.agregar("a", "2025-06", (120, 0, 0))
+        self.assertEqual(ventana.mes, "2025-06")
+        self.assertEqual(ventana.promedio("a"), (10.0, 0.0, 0.0))
+        self.assertFalse(ventana.agregar("a", "2024-06", (1, 0, 0)))
+
+    def test_guardar_y_cargar(self):
+        ventana = VentanaIngresos("2024-12")
+        for persona_id, mes, montos in _registros():
+            if mes_a_ordinal(mes) <= mes_a_ordinal("2024-12"):
+                ventana.agregar(persona_id, mes, montos)
+        with tempfile.TemporaryDirectory() as d:
+            ruta = os.path.join(d, "ventana.bin")
+            ventana.guardar(ruta)
+            cargada = VentanaIngresos.cargar(ruta)
+        self.assertEqual(list(cargada.promedios()), list(ventana.promedios()))
+        cargada.avanzar(3)
+        ventana.avanzar(3)
+        self.assertEqual(list(cargada.promedios()), list(ventana.promedios()))
+
+    def test_desde_posterior_a_hasta(self):
+        with self.assertRaises(ValueError):
+            list(promedios_por_mes(_registros(), "2025-06", "2025-05"))
+
+
+class TestAplicarAHogares(unittest.TestCase):
+
+    def setUp(self):
+        self.ventana = VentanaIngresos("2024-12")
+        self.ventana.agregar("17", "2024-11", (1200, 2400, 0))
+
+    def _hogar(self):
+        return {"id": 1, "integrantes": [
+            {"persona_id": 17, "edad": 40, "ingreso_trabajo": 5, "ingreso_pension": 5, "ingreso_capital": 5},
+            {"persona_id": 18, "edad": 38, "ingreso_trabajo": 7, "ingreso_pension": 0, "ingreso_capital": 0},
+            {"edad": 9, "ingreso_trabajo": 0, "ingreso_pension": 0, "ingreso_capital": 0},
+        ]}
+
+    def test_clave_entera_y_conteo(self):
+        conteo = conteo_vacio()
+        hogar, = aplicar_a_hogares([self._hogar()], self.ventana, conteo=conteo)
+        actualizado, sin_registros, sin_clave = hogar["integrantes"]
+        self.assertEqual([actualizado[f] for f in FUENTES], [100.0, 200.0, 0.0])
+        self.assertEqual(sin_registros["ingreso_trabajo"], 7)
+        self.assertEqual(conteo, {"actualizados": 1, "sin_registros": 1, "sin_clave": 1})
+
+    def test_main_hogares(self):
+        with tempfile.TemporaryDirectory() as d:
+            registros = os.path.join(d, "registros.csv")
+            with open(registros, "w", encoding="utf-8") as f:
+                f.write("persona_id,mes,ingreso_trabajo,ingreso_pension,ingreso_capital\n"
+                        "17,2024-11,1200,2400,0\n")
+            hogares = os.path.join(d, "hogares.jsonl")
+            with open(hogares, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self._hogar()) + "\n")
+            salida = os.path.join(d, "salida.jsonl")
+            with contextlib.redirect_stderr(io.StringIO()) as err:
+                main([registros, "--mes", "2024-12", "--desde", "2024-06", "--hogares", hogares,
+                      "--salida", salida])
+            with open(salida, encoding="utf-8") as f:
+                hogar = json.loads(f.readline())
+            self.assertEqual(hogar["integrantes"][0]["ingreso_pension"], 200.0)
+            self.assertIn("Sin registros: 1", err.getvalue())
+
+            with contextlib.redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+                main([registros, "--mes", "2024-12", "--desde", "2025-01", "--hogares", hogares])
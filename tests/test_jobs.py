@@ -0,0 +1,127 @@
+"""
+Arriendos de la cola de trabajos y cancelación de batch.score
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from batch.jobs import EN_CURSO, TERMINADO, ColaTrabajos, procesar
+from batch.score import EjecucionCancelada, _bloquear_salida, ejecutar
+from batch.synthetic import escribir_jsonl, generar_hogares
+
+
+class _CancelarTrasBloques:
+    """Evento de cancelación que se activa tras n revisiones."""
+
+    def __init__(self, n):
+        self.restantes = n
+
+    def is_set(self):
+        self.restantes -= 1
+        return self.restantes < 0
+
+    def wait(self, timeout=None):
+        return self.is_set()
+
+
+class TestArriendos(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.cola = ColaTrabajos(os.path.join(self.dir.name, "cola.db"), arriendo=0.05)
+
+    def tearDown(self):
+        self.cola.cerrar()
+        self.dir.cleanup()
+
+    def test_solo_quien_tiene_el_arriendo_completa(self):
+        id_trabajo = self.cola.encolar_hogares([])
+        self.assertEqual(self.cola.tomar("a")["id"], id_trabajo)
+        self.assertFalse(self.cola.completar(id_trabajo, "b", ["otro"]))
+        self.assertEqual(self.cola.estado(id_trabajo)["estado"], EN_CURSO)
+        self.assertTrue(self.cola.completar(id_trabajo, "a", []))
+        self.assertEqual(self.cola.estado(id_trabajo)["estado"], TERMINADO)
+
+    def test_arriendo_vencido_no_completa(self):
+        id_trabajo = self.cola.encolar_hogares([])
+        self.cola.tomar("a")
+        time.sleep(0.1)
+        self.assertEqual(self.cola.tomar("b")["id"], id_trabajo)
+        self.assertFalse(self.cola.renovar(id_trabajo, "a"))
+        self.assertFalse(self.cola.completar(id_trabajo, "a", ["viejo"]))
+        self.assertTrue(self.cola.completar(id_trabajo, "b", ["nuevo"]))
+        self.assertEqual(self.cola.resultado(id_trabajo), ["nuevo"])
+
+
+class TestCancelacion(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.entrada = os.path.join(self.dir.name, "hogares.jsonl")
+        with open(self.entrada, "w", encoding="utf-8") as f:
+            escribir_jsonl(generar_hogares(500, semilla=3), f)
+        self.reporte = open(os.devnull, "w")
+
+    def tearDown(self):
+        self.reporte.close()
+        self.dir.cleanup()
+
+    def _ruta(self, nombre):
+        return os.path.join(self.dir.name, nombre)
+
+    def _leer(self, ruta):
+        with open(ruta, "rb") as f:
+            return f.read()
+
+    def test_cancelar_y_reanudar(self):
+        completa = self._ruta("completa.csv")
+        ejecutar(self.entrada, completa, tamano_bloque=50, checkpoint_cada=100, reporte=self.reporte)
+
+        salida = self._ruta("salida.csv")
+        with self.assertRaises(EjecucionCancelada):
+            ejecutar(self.entrada, salida, tamano_bloque=50, checkpoint_cada=100, reporte=self.reporte,
+                     cancelar=_CancelarTrasBloques(5))
+        self.assertFalse(os.path.exists(salida))
+        self.assertTrue(os.path.exists(salida + ".part"))
+        self.assertTrue(os.path.exists(salida + ".lock"))
+
+        ejecutar(self.entrada, salida, reanudar=True, tamano_bloque=50, checkpoint_cada=100,
+                 reporte=self.reporte)
+        self.assertEqual(self._leer(salida), self._leer(completa))
+        self.assertFalse(os.path.exists(salida + ".lock"))
+
+    def test_salida_bloqueada(self):
+        salida = self._ruta("salida.csv")
+        with _bloquear_salida(salida):
+            with self.assertRaises(RuntimeError):
+                ejecutar(self.entrada, salida, reporte=self.reporte)
+            with self.assertRaises(EjecucionCancelada):
+                ejecutar(self.entrada, salida, reporte=self.reporte, cancelar=_CancelarTrasBloques(1))
+        self.assertEqual(ejecutar(self.entrada, salida, reporte=self.reporte)["hogares"], 500)
+        self.assertFalse(os.path.exists(salida + ".lock"))
+
+    def test_espera_el_bloqueo(self):
+        salida = self._ruta("salida.csv")
+        liberado = threading.Event()
+
+        def retener():
+            with _bloquear_salida(salida):
+                liberado.wait()
+
+        hilo = threading.Thread(target=retener)
+        hilo.start()
+        time.sleep(0.05)
+        threading.Timer(0.2, liberado.set).start()
+        estadisticas = ejecutar(self.entrada, salida, reporte=self.reporte, cancelar=threading.Event())
+        hilo.join()
+        self.assertEqual(estadisticas["hogares"], 500)
+
+    def test_trabajo_de_archivo_elimina_bloqueo(self):
+        salida = self._ruta("salida.csv")
+        trabajo = {"tipo": "archivo", "carga": {"entrada": self.entrada, "salida": salida}}
+        self.assertEqual(procesar(trabajo)["hogares"], 500)
+        self.assertTrue(os.path.exists(salida))
+        self.assertFalse(os.path.exists(salida + ".lock"))
@@ -0,0 +1,57 @@
+"""
+Equivalencia entre las reglas compiladas del test de medios y evaluar_test_medios
+"""
+
+import itertools
+import unittest
+
+from calculator.means_test import evaluar_test_medios
+from calculator.means_test_rules import REGLAS_MEDIOS, VERSION_VIGENTE, compilar_reglas
+
+
+class TestReglasMedios(unittest.TestCase):
+
+    def setUp(self):
+        self.evaluador = compilar_reglas()
+
+    def _combinaciones(self):
+        for valores in itertools.product((False, True), repeat=len(self.evaluador.flags)):
+            yield dict(zip(self.evaluador.flags, valores))
+
+    def _comparar(self, evaluador, datos_medios):
+        resultado = evaluador(datos_medios)
+        self.assertEqual(resultado, evaluar_test_medios(datos_medios), datos_medios)
+        self.assertIsInstance(resultado[2], list)
+        self.assertEqual(evaluador.tramo_y_total(datos_medios), resultado[:2])
+
+    def test_todas_las_combinaciones(self):
+        combinaciones = list(self._combinaciones())
+        self.assertEqual(len(combinaciones), 2048)
+        for datos_medios in combinaciones:
+            self._comparar(self.evaluador, datos_medios)
+
+    def test_solo_flags_activos(self):
+        # Sin los flags en False, se usa el camino que normaliza los valores
+        for datos_medios in self._combinaciones():
+            self._comparar(self.evaluador, {f: v for f, v in datos_medios.items() if v})
+
+    def test_mascara(self):
+        for datos_medios in self._combinaciones():
+            mascara = sum(1 << i for i, flag in enumerate(self.evaluador.flags) if datos_medios[flag])
+            self.assertEqual(self.evaluador.mascara(datos_medios), mascara)
+            self.assertEqual(self.evaluador.evaluar_mascara(mascara), self.evaluador(datos_medios)[:2])
+
+    def test_detalle_no_compartido(self):
+        datos_medios = {flag: True for flag in self.evaluador.flags}
+        self.evaluador(datos_medios)[2].clear()
+        self.assertEqual(self.evaluador(datos_medios), evaluar_test_medios(datos_medios))
+
+    def test_sin_cache(self):
+        evaluador = compilar_reglas(VERSION_VIGENTE, REGLAS_MEDIOS[VERSION_VIGENTE])
+        self.assertIsNot(evaluador, self.evaluador)
+        for datos_medios in self._combinaciones():
+            self._comparar(evaluador, datos_medios)
+
+
+if __name__ == "__main__":
+    unittest.main()
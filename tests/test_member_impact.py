@@ -0,0 +1,58 @@
+"""
+Impacto de integrantes frente a recalcular el hogar completo
+"""
+
+import copy
+import unittest
+
+from batch.synthetic import generar_hogares
+from calculator.engine import CSEEngine
+from calculator.member_impact import impacto_ingreso, impacto_poblacion, impacto_salida
+
+
+class TestImpactoIntegrantes(unittest.TestCase):
+
+    def setUp(self):
+        self.motor = CSEEngine()
+        self.hogares = list(generar_hogares(400, semilla=6))
+
+    def _sin(self, hogar, posicion):
+        otro = copy.deepcopy(hogar)
+        del otro["integrantes"][posicion]
+        return otro
+
+    def _comparar(self, impacto, esperado, actual):
+        self.assertAlmostEqual(impacto["ingreso_corregido"], esperado["ingreso_corregido"], places=6)
+        self.assertEqual(impacto["tramo_ingreso"], esperado["tramo_ingreso"])
+        self.assertEqual(impacto["tramo_final"], esperado["tramo_final"])
+        self.assertEqual(impacto["cambia_tramo"], esperado["tramo_final"] != actual)
+
+    def test_salida_igual_a_recalcular(self):
+        cambios = 0
+        for hogar in self.hogares:
+            actual = self.motor.score(hogar)["tramo_final"]
+            for posicion, impacto in enumerate(impacto_salida(hogar, self.motor)):
+                self.assertEqual(impacto["posicion"], posicion)
+                if len(hogar["integrantes"]) == 1:
+                    self.assertIsNone(impacto["tramo_final"])
+                    continue
+                self._comparar(impacto, self.motor.score(self._sin(hogar, posicion)), actual)
+                cambios += impacto["cambia_tramo"]
+        self.assertTrue(cambios)
+
+    def test_ingreso_igual_a_recalcular(self):
+        for hogar, otro in zip(self.hogares, reversed(self.hogares)):
+            integrante = otro["integrantes"][0]
+            ampliado = copy.deepcopy(hogar)
+            ampliado["integrantes"].append(integrante)
+            self._comparar(impacto_ingreso(hogar, integrante, self.motor), self.motor.score(ampliado),
+                           self.motor.score(hogar)["tramo_final"])
+
+    def test_poblacion(self):
+        esperados = [dict(impacto, id=hogar["id"]) for hogar in self.hogares
+                     for impacto in impacto_salida(hogar, self.motor)]
+        obtenidos = list(impacto_poblacion(self.hogares, self.motor))
+        self.assertEqual([{k: v for k, v in o.items() if k != "tramo_final_actual"} for o in obtenidos],
+                         esperados)
+        solo_cambios = list(impacto_poblacion(self.hogares, self.motor, solo_cambios=True))
+        self.assertEqual(solo_cambios, [o for o in obtenidos if o["cambia_tramo"]])
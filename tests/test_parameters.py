@@ -0,0 +1,86 @@
+"""
+Recarga de versiones de parámetros y motores sobre parámetros compilados
+"""
+
+import copy
+import json
+import os
+import pickle
+import tempfile
+import unittest
+
+from batch.scoring import puntuar_hogar
+from batch.synthetic import generar_hogares
+from calculator.engine import CSEEngine
+from calculator.parameters import RUTA_POR_DEFECTO, RepositorioParametros, compilar_parametros
+
+
+class TestRecargaParametros(unittest.TestCase):
+
+    def setUp(self):
+        with open(RUTA_POR_DEFECTO, encoding="utf-8") as f:
+            self.datos = json.load(f)
+        self.dir = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.dir.name, "parametros.json")
+        self._mtime = 1_700_000_000 * 10 ** 9
+        self._escribir(self.datos)
+        self.repo = RepositorioParametros(self.ruta, intervalo_revision=0)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _escribir(self, datos):
+        with open(self.ruta, "w", encoding="utf-8") as f:
+            json.dump(datos, f)
+        # La firma del archivo es (mtime, tamaño): cada escritura avanza el mtime
+        self._mtime += 10 ** 9
+        os.utime(self.ruta, ns=(self._mtime, self._mtime))
+
+    def _nueva_version(self, version, vigencia, salario_minimo):
+        nueva = copy.deepcopy(self.datos["versiones"][0])
+        nueva.update(version=version, vigencia_desde=vigencia, salario_minimo=salario_minimo)
+        return nueva
+
+    def test_recarga_agrega_version(self):
+        anterior = self.repo.obtener("2025-01-01")
+        datos = copy.deepcopy(self.datos)
+        datos["versiones"].append(self._nueva_version("2025-06", "2025-06-01", 600000))
+        self._escribir(datos)
+
+        self.assertEqual(self.repo.obtener("2025-07-01").version, "2025-06")
+        self.assertEqual(self.repo.obtener("2025-07-01").umbral_estudiante, 1200000)
+        # La versión sin cambios no se recompila
+        self.assertIs(self.repo.obtener("2025-01-01"), anterior)
+        self.assertFalse(self.repo.recargar())
+        with self.assertRaises(LookupError):
+            self.repo.obtener("2000-01-01")
+
+    def test_archivo_invalido_mantiene_versiones(self):
+        anterior = self.repo.versiones
+        with open(self.ruta, "w", encoding="utf-8") as f:
+            f.write("{no es json")
+        with self.assertLogs("calculator.parameters", "WARNING"):
+            self.assertEqual(self.repo.versiones, anterior)
+
+    def test_parametros_inmutables_y_serializables(self):
+        p = self.repo.obtener_version(self.datos["versiones"][0]["version"])
+        with self.assertRaises(AttributeError):
+            p.salario_minimo = 1
+        with self.assertRaises(TypeError):
+            p.coeficientes[p.rangos[0]]["x"] = 1.0
+        copia = pickle.loads(pickle.dumps(p))
+        self.assertEqual(copia.umbrales_ingreso, p.umbrales_ingreso)
+
+    def test_motor_con_version_modificada(self):
+        hogares = list(generar_hogares(300, semilla=2))
+        vigente = CSEEngine(self.repo.obtener())
+        for hogar in hogares:
+            self.assertEqual(vigente.score(hogar), puntuar_hogar(hogar))
+
+        # Con otro salario mínimo cambia el aporte de estudiantes de 18 a 24 años
+        otro = CSEEngine(compilar_parametros(self._nueva_version("x", "2030-01-01", 100000)))
+        estudiantes = [h for h in hogares
+                       if any(18 <= i["edad"] <= 24 and i.get("estudia") for i in h["integrantes"])]
+        self.assertTrue(estudiantes)
+        self.assertTrue(any(otro.score(h)["ingreso_equivalente"] > vigente.score(h)["ingreso_equivalente"]
+                            for h in estudiantes))
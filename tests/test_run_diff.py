@@ -0,0 +1,89 @@
+"""
+Atribución del paso que explica cada cambio de tramo entre dos ejecuciones
+"""
+
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import unittest
+
+from batch.run_diff import PASOS_CAMBIO, main
+from batch.scoring import COLUMNAS_RESULTADO
+from batch.writers import crear_escritor, leer_resultados
+
+# (ingreso equivalente, IN, tramo por ingreso, tramo por medios) antes y después, y el paso esperado
+CASOS = {
+    "ie": ((1000, 2.0, 40, 40), (5000, 2.0, 60, 40), "ingreso_equivalente"),
+    "in": ((1000, 2.0, 50, 40), (1000, 4.0, 40, 40), "indice_necesidades"),
+    "umbral": ((1000, 2.0, 50, 40), (1000, 2.0, 60, 40), "tramo_ingreso"),
+    "medios": ((1000, 2.0, 40, 40), (1000, 2.0, 40, 70), "test_medios"),
+    # Cambian ambos, pero el ingreso por sí solo ya cambia el tramo final
+    "ambos": ((1000, 2.0, 40, 40), (5000, 2.0, 60, 80), "ingreso_equivalente"),
+    # Cambia el ingreso, pero el tramo final lo sigue fijando el test de medios
+    "medios_domina": ((1000, 2.0, 40, 70), (5000, 2.0, 60, 90), "test_medios"),
+    "sin_cambio_final": ((1000, 2.0, 40, 90), (5000, 2.0, 60, 90), None),
+    "igual": ((1000, 2.0, 60, 40), (1000, 2.0, 60, 40), None),
+}
+REPETICIONES = 40
+
+
+def _resultado(id_hogar, ingreso_equiv, indice_nec, tramo_ingreso, tramo_medios):
+    return {"id": id_hogar, "n_integrantes": 2, "ingreso_equivalente": ingreso_equiv,
+            "indice_necesidades": indice_nec, "ingreso_corregido": ingreso_equiv / indice_nec,
+            "tramo_ingreso": tramo_ingreso, "tramo_medios": tramo_medios, "num_medios": 0,
+            "tramo_final": max(tramo_ingreso, tramo_medios)}
+
+
+class TestDiferencias(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        antes, despues = [], []
+        for k in range(REPETICIONES):
+            for nombre, (a, d, _) in CASOS.items():
+                antes.append(_resultado(f"{nombre}-{k}", *a))
+                despues.append(_resultado(f"{nombre}-{k}", *d))
+        antes.append(_resultado("solo-antes", 1000, 2.0, 40, 40))
+        despues.append(_resultado("solo-despues", 1000, 2.0, 40, 40))
+        self.antes = self._escribir("antes.csv", antes)
+        self.despues = self._escribir("despues.col", despues)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _ruta(self, nombre):
+        return os.path.join(self.dir.name, nombre)
+
+    def _escribir(self, nombre, resultados):
+        ruta = self._ruta(nombre)
+        with crear_escritor(ruta, COLUMNAS_RESULTADO) as escritor:
+            escritor.escribir_muchos(resultados)
+        return ruta
+
+    def _comparar(self, *opciones):
+        salida, matriz = self._ruta("cambios.jsonl"), self._ruta("matriz.csv")
+        with contextlib.redirect_stderr(io.StringIO()) as reporte:
+            main([self.antes, self.despues, "--salida", salida, "--matriz", matriz, *opciones])
+        with open(matriz, encoding="utf-8", newline="") as f:
+            matrices = [(m, int(a), int(d), int(n)) for m, a, d, n in list(csv.reader(f))[1:]]
+        return {c["id"]: c for c in leer_resultados(salida)}, matrices, reporte.getvalue()
+
+    def test_paso_de_cada_cambio(self):
+        for opciones in ([], ["--particiones", "7"], ["--particiones", "5", "--procesos", "2"]):
+            with self.subTest(opciones=opciones):
+                cambios, matrices, reporte = self._comparar(*opciones)
+                esperados = {f"{nombre}-{k}": paso for nombre, (_, _, paso) in CASOS.items()
+                             for k in range(REPETICIONES) if paso}
+                self.assertEqual({i: c["paso"] for i, c in cambios.items()}, esperados)
+                self.assertEqual(cambios["ambos-0"]["tramo_final_despues"], 80)
+                self.assertIn("Solo antes: 1 | Solo después: 1", reporte)
+
+                por_paso = {}
+                for nombre, a, d, n in matrices:
+                    por_paso[nombre] = por_paso.get(nombre, 0) + n
+                self.assertEqual(por_paso["total"], REPETICIONES * len(CASOS))
+                for paso in PASOS_CAMBIO:
+                    self.assertEqual(por_paso.get(paso, 0), list(esperados.values()).count(paso))
+                self.assertIn(("test_medios", 70, 90, REPETICIONES), matrices)
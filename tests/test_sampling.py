@@ -0,0 +1,62 @@
+"""
+Muestreo estratificado: reproducible, independiente del orden y combinable
+"""
+
+import os
+import random
+import tempfile
+import unittest
+
+from batch.sampling import MuestraEstratificada, estrato
+from batch.scoring import puntuar_hogar
+from batch.synthetic import generar_hogares
+
+
+class TestMuestreo(unittest.TestCase):
+
+    def setUp(self):
+        self.resultados = [puntuar_hogar(h) for h in generar_hogares(3000, semilla=8)]
+
+    def _muestra(self, resultados, semilla=1, por_estrato=5):
+        return MuestraEstratificada(por_estrato, semilla).agregar_muchos(resultados)
+
+    def _ids(self, muestra):
+        return [(f["estrato"], f["id"], f["peso"]) for f in muestra.filas()]
+
+    def test_reproducible_e_independiente_del_orden(self):
+        base = self._ids(self._muestra(self.resultados))
+        self.assertEqual(self._ids(self._muestra(self.resultados)), base)
+        desordenados = list(self.resultados)
+        random.Random(3).shuffle(desordenados)
+        self.assertEqual(self._ids(self._muestra(desordenados)), base)
+        self.assertNotEqual(self._ids(self._muestra(self.resultados, semilla=2)), base)
+
+    def test_combinar_partes(self):
+        base = self._ids(self._muestra(self.resultados))
+        partes = [self._muestra(self.resultados[i::3]) for i in range(3)]
+        with tempfile.TemporaryDirectory() as d:
+            rutas = [os.path.join(d, f"parte{i}.json") for i in range(3)]
+            for parte, ruta in zip(partes, rutas):
+                parte.guardar(ruta)
+            combinada = MuestraEstratificada.cargar(rutas[0])
+            for ruta in rutas[1:]:
+                combinada.combinar(MuestraEstratificada.cargar(ruta))
+        self.assertEqual(self._ids(combinada), base)
+        with self.assertRaises(ValueError):
+            combinada.combinar(self._muestra([], semilla=2))
+
+    def test_ids_repetidos(self):
+        repetidos = self.resultados + [dict(r, revisado=True) for r in self.resultados[:500]]
+        muestra = self._muestra(repetidos, por_estrato=50)
+        ids = [f["id"] for f in muestra.filas()]
+        self.assertEqual(len(ids), len(set(ids)))
+        # Combinar una muestra consigo misma no duplica hogares
+        antes = self._ids(muestra)
+        muestra.combinar(self._muestra(repetidos, por_estrato=50))
+        self.assertEqual([(e, i) for e, i, _ in self._ids(muestra)], [(e, i) for e, i, _ in antes])
+
+    def test_estratos(self):
+        resultado = {"tramo_final": 60, "tramo_ingreso": 60, "tramo_medios": 40, "n_integrantes": 7}
+        self.assertEqual(estrato(resultado), "60|ingreso_define|5+")
+        resultado.update(tramo_medios=90, tramo_final=90, n_integrantes=2)
+        self.assertEqual(estrato(resultado), "90|medios_eleva|2")
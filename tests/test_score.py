@@ -0,0 +1,107 @@
+"""
+Puntos de control de batch.score: un proceso que muere y se reanuda da la
+misma salida que una ejecución sin interrupciones
+"""
+
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import batch.score
+from batch.score import ejecutar, ruta_checkpoint
+from batch.synthetic import escribir_jsonl, generar_hogares
+
+FORMATOS = ("csv", "jsonl", "col", "csv.gz", "jsonl.gz", "col.gz")
+
+
+def _morir_tras_bloques(entrada, salida, bloques, argumentos):
+    """Corre ejecutar en un proceso hijo que muere (sin limpiar nada) al leer cierto bloque."""
+    leer_bloque = batch.score._leer_bloque
+    leidos = []
+
+    def leer_y_morir(archivo, tamano):
+        leidos.append(1)
+        if len(leidos) > bloques:
+            os._exit(17)
+        return leer_bloque(archivo, tamano)
+
+    batch.score._leer_bloque = leer_y_morir
+    with open(os.devnull, "w") as reporte:
+        ejecutar(entrada, salida, reporte=reporte, **argumentos)
+
+
+class TestPuntosControl(unittest.TestCase):
+
+    argumentos = {"tamano_bloque": 40, "checkpoint_cada": 100}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.contexto = multiprocessing.get_context("fork")
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.entrada = self._ruta("hogares.jsonl")
+        with open(self.entrada, "w", encoding="utf-8") as f:
+            escribir_jsonl(generar_hogares(1000, semilla=9), f)
+        self.reporte = open(os.devnull, "w")
+
+    def tearDown(self):
+        self.reporte.close()
+        self.dir.cleanup()
+
+    def _ruta(self, nombre):
+        return os.path.join(self.dir.name, nombre)
+
+    def _leer(self, ruta):
+        with open(ruta, "rb") as f:
+            return f.read()
+
+    def _ejecutar(self, salida, **opciones):
+        return ejecutar(self.entrada, salida, reporte=self.reporte, **self.argumentos, **opciones)
+
+    def _matar(self, salida, bloques):
+        proceso = self.contexto.Process(target=_morir_tras_bloques,
+                                        args=(self.entrada, salida, bloques, self.argumentos))
+        proceso.start()
+        proceso.join()
+        self.assertEqual(proceso.exitcode, 17)
+
+    def test_reanudar_tras_matar(self):
+        for formato in FORMATOS:
+            with self.subTest(formato=formato):
+                completa = self._ruta(f"completa.{formato}")
+                esperadas = self._ejecutar(completa)
+
+                salida = self._ruta(f"salida.{formato}")
+                # Muere después de dos puntos de control y con bloques sin guardar
+                self._matar(salida, 13)
+                self.assertTrue(os.path.exists(ruta_checkpoint(salida)))
+                self.assertFalse(os.path.exists(salida))
+
+                estadisticas = self._ejecutar(salida, reanudar=True)
+                self.assertEqual(self._leer(salida), self._leer(completa))
+                self.assertEqual(estadisticas, esperadas)
+                self.assertFalse(os.path.exists(ruta_checkpoint(salida)))
+
+    def test_sin_reanudar_descarta_punto_de_control(self):
+        completa = self._ruta("completa.csv")
+        self._ejecutar(completa)
+        salida = self._ruta("salida.csv")
+
+        # A muere tras un punto de control; B parte de cero y muere antes del suyo
+        self._matar(salida, 8)
+        self.assertTrue(os.path.exists(ruta_checkpoint(salida)))
+        self._matar(salida, 2)
+        self.assertFalse(os.path.exists(ruta_checkpoint(salida)))
+
+        self._ejecutar(salida, reanudar=True)
+        self.assertEqual(self._leer(salida), self._leer(completa))
+
+    def test_punto_de_control_de_otra_entrada(self):
+        salida = self._ruta("salida.csv")
+        self._matar(salida, 8)
+        otra = self._ruta("otra.jsonl")
+        os.link(self.entrada, otra)
+        with self.assertRaises(ValueError):
+            ejecutar(otra, salida, reanudar=True, reporte=self.reporte)
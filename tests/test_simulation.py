@@ -0,0 +1,69 @@
+"""
+Simulación de incertidumbre de ingresos frente a un cálculo escalar por simulación
+"""
+
+import random
+import unittest
+
+from batch.synthetic import generar_hogares
+from calculator.income import aporte_ingreso, determinar_tramo_por_ingreso
+from calculator.needs_index import calcular_indice_necesidades
+from calculator.simulation import (
+    FUENTES_INGRESO, ModeloErrorLogNormal, ModeloErrorNormal, simular_poblacion,
+)
+from constants import SALARIO_MINIMO
+
+
+def _referencia(hogar, indice, n, modelo, semilla):
+    """Distribución por tramo recorriendo simulación por simulación, con los mismos sorteos."""
+    rng = random.Random(f"{semilla}:{indice}")
+    integrantes = hogar["integrantes"]
+    # Mismo orden de sorteo: integrante, luego fuente con ingreso
+    factores = {}
+    for k, integ in enumerate(integrantes):
+        if integ["edad"] < 18:
+            continue
+        for f, fuente in enumerate(FUENTES_INGRESO):
+            if integ[fuente]:
+                factores[k, f] = modelo.factores(rng, f, n)
+    indice_nec = calcular_indice_necesidades(integrantes)
+    conteo = {}
+    for s in range(n):
+        ingreso_equiv = 0.0
+        for k, integ in enumerate(integrantes):
+            perturbado = dict(integ)
+            for f, fuente in enumerate(FUENTES_INGRESO):
+                if (k, f) in factores:
+                    perturbado[fuente] = integ[fuente] * factores[k, f][s]
+            ingreso_equiv += aporte_ingreso(perturbado, 2 * SALARIO_MINIMO)
+        tramo = determinar_tramo_por_ingreso(ingreso_equiv / indice_nec if indice_nec else 0)
+        conteo[tramo] = conteo.get(tramo, 0) + 1
+    return {t: c / n for t, c in conteo.items()}
+
+
+class TestSimulacion(unittest.TestCase):
+
+    def setUp(self):
+        self.hogares = list(generar_hogares(150, semilla=11))
+
+    def test_igual_a_referencia(self):
+        for modelo in (ModeloErrorLogNormal(), ModeloErrorNormal(0.3)):
+            resultados = list(simular_poblacion(self.hogares, 40, modelo, semilla=5, tamano_bloque=32))
+            for i, (hogar, resultado) in enumerate(zip(self.hogares, resultados)):
+                self.assertEqual(resultado["id"], hogar["id"])
+                esperado = _referencia(hogar, i, 40, modelo, 5)
+                self.assertEqual(resultado["distribucion"].keys(), esperado.keys())
+                for tramo, p in esperado.items():
+                    self.assertAlmostEqual(resultado["distribucion"][tramo], p)
+
+    def test_no_depende_de_bloque_ni_procesos(self):
+        base = list(simular_poblacion(self.hogares, 50, semilla=3, tamano_bloque=1000))
+        self.assertEqual(list(simular_poblacion(self.hogares, 50, semilla=3, tamano_bloque=7)), base)
+        paralelo = simular_poblacion(self.hogares, 50, semilla=3, tamano_bloque=40, procesos=2)
+        self.assertEqual(list(paralelo), base)
+        self.assertNotEqual(list(simular_poblacion(self.hogares, 50, semilla=4)), base)
+
+    def test_sin_error(self):
+        sin_error = ModeloErrorLogNormal(0, 0, 0)
+        for r in simular_poblacion(self.hogares, 10, sin_error):
+            self.assertEqual(r["distribucion"], {r["tramo_calculado"]: 1.0})
@@ -0,0 +1,99 @@
+"""
+Ida y vuelta de los escritores de resultados en todos los formatos
+"""
+
+import os
+import tempfile
+import unittest
+
+from batch.scoring import COLUMNAS_RESULTADO, puntuar_hogar
+from batch.synthetic import generar_hogares
+from batch.writers import (
+    crear_escritor, detectar_formato, indice_columnar, leer_bloques_columnar, leer_resultados,
+)
+
+FORMATOS = ("csv", "jsonl", "col", "csv.gz", "jsonl.gz", "col.gz")
+COLUMNAS = COLUMNAS_RESULTADO + ("comuna",)
+
+
+class TestEscritores(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        comunas = ["Santiago", "Ñuñoa", 'con "comillas", y coma', "dos\nlíneas", ""]
+        self.resultados = []
+        for i, hogar in enumerate(generar_hogares(250, semilla=4)):
+            resultado = puntuar_hogar(hogar)
+            resultado["comuna"] = comunas[i % len(comunas)]
+            self.resultados.append(resultado)
+        # Valores que el formato de texto debe conservar exactos
+        self.resultados[0].update(id="007", ingreso_corregido=0.1 + 0.2, ingreso_equivalente=0)
+        self.resultados[1].update(ingreso_corregido=1e-300, indice_necesidades=123456789.123456789)
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _ruta(self, nombre):
+        return os.path.join(self.dir.name, nombre)
+
+    def _escribir(self, ruta, resultados, **opciones):
+        with crear_escritor(ruta, COLUMNAS, filas_por_bloque=60, **opciones) as escritor:
+            escritor.escribir_muchos(resultados)
+        return escritor
+
+    def test_ida_y_vuelta(self):
+        for formato in FORMATOS:
+            with self.subTest(formato=formato):
+                ruta = self._ruta(f"resultados.{formato}")
+                escritor = self._escribir(ruta, self.resultados)
+                self.assertEqual(escritor.filas, len(self.resultados))
+                self.assertFalse(os.path.exists(ruta + ".part"))
+                self.assertEqual(list(leer_resultados(ruta)), self.resultados)
+
+    def test_gzip_reproducible(self):
+        for formato in ("csv.gz", "col.gz"):
+            with self.subTest(formato=formato):
+                rutas = [self._ruta(f"{n}.{formato}") for n in "ab"]
+                for ruta in rutas:
+                    self._escribir(ruta, self.resultados)
+                with open(rutas[0], "rb") as a, open(rutas[1], "rb") as b:
+                    self.assertEqual(a.read(), b.read())
+
+    def test_punto_control_y_reanudar(self):
+        for formato in FORMATOS:
+            with self.subTest(formato=formato):
+                ruta = self._ruta(f"reanudado.{formato}")
+                escritor = crear_escritor(ruta, COLUMNAS, filas_por_bloque=60)
+                escritor.escribir_muchos(self.resultados[:100])
+                posicion = escritor.punto_control()
+                # Lo escrito después del punto de control se descarta al reanudar
+                escritor.escribir_muchos(self.resultados[100:130])
+                escritor.volcar()
+                escritor.cerrar()
+                self._escribir(ruta, self.resultados[100:], reanudar_en=posicion)
+                self.assertEqual(list(leer_resultados(ruta)), self.resultados)
+
+    def test_bloques_columnar(self):
+        ruta = self._ruta("bloques.col")
+        self._escribir(ruta, self.resultados)
+        bloques = indice_columnar(ruta)
+        self.assertEqual([filas for _, filas in bloques], [60, 60, 60, 60, 10])
+        desde, hasta = bloques[1][0], bloques[3][0]
+        leidos = list(leer_bloques_columnar(ruta, desde, hasta))
+        self.assertEqual(len(leidos), 2)
+        self.assertEqual(leidos[0]["id"], [r["id"] for r in self.resultados[60:120]])
+
+    def test_abortar(self):
+        ruta = self._ruta("abortado.csv")
+        with self.assertRaises(RuntimeError):
+            with crear_escritor(ruta, COLUMNAS) as escritor:
+                escritor.escribir_muchos(self.resultados)
+                raise RuntimeError("falla")
+        self.assertFalse(os.path.exists(ruta))
+        self.assertFalse(os.path.exists(ruta + ".part"))
+
+    def test_detectar_formato(self):
+        self.assertEqual(detectar_formato("x.CSV"), ("csv", None))
+        self.assertEqual(detectar_formato("x.col.gz"), ("columnar", "gzip"))
+        with self.assertRaises(ValueError):
+            detectar_formato("x.parquet")